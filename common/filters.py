@@ -0,0 +1,142 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+import numpy as np
+from scipy.signal import iirfilter, zpk2sos, sosfilt
+
+logger = logging.getLogger(__name__)
+
+FILTER_TYPES = ("bandpass", "lowpass", "highpass")
+
+
+def normalize_filter(filter_type: str, freqmin: float = 0.0, freqmax: float = 0.0) -> Optional[Tuple[str, Tuple[float, ...]]]:
+    """把工具参数规范化为 (滤波类型, 频带)，参数不足或无需滤波时返回 None"""
+    filter_type = (filter_type or "none").lower()
+    freqmin = float(freqmin or 0.0)
+    freqmax = float(freqmax or 0.0)
+    if filter_type == "bandpass" and freqmin > 0 and freqmax > 0:
+        return "bandpass", (freqmin, freqmax)
+    if filter_type == "lowpass" and freqmax > 0:
+        return "lowpass", (freqmax,)
+    if filter_type == "highpass" and freqmin > 0:
+        return "highpass", (freqmin,)
+    return None
+
+
+def describe_filter(spec: Optional[Tuple[str, Tuple[float, ...]]]) -> str:
+    """返回滤波器的中文描述"""
+    if spec is None:
+        return "无滤波"
+    filter_type, band = spec
+    if filter_type == "bandpass":
+        return f"带通滤波({band[0]}-{band[1]}Hz)"
+    if filter_type == "lowpass":
+        return f"低通滤波(<{band[0]}Hz)"
+    return f"高通滤波(>{band[0]}Hz)"
+
+
+class FilterEngine:
+    """可复用的Butterworth滤波引擎
+
+    - 按 (类型, 阶数, 频带, 采样率) 缓存 SOS 设计，避免每次请求重新设计IIR滤波器
+    - 采样率和长度相同的道堆叠成二维数组，一次 sosfilt 调用完成整批零相位滤波
+    - 按 (数据标识, 滤波参数) 缓存滤波结果，重复绘图时直接复用（缓存的 Stream 不应再被修改）
+    """
+
+    def __init__(self, max_products: int = 32):
+        self.max_products = max_products
+        self._sos_cache: Dict[Tuple, np.ndarray] = {}
+        self._products: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"design_hits": 0, "design_misses": 0, "product_hits": 0, "product_misses": 0}
+
+    def design(self, filter_type: str, band: Tuple[float, ...], sampling_rate: float, corners: int = 4) -> np.ndarray:
+        """获取（必要时设计）SOS 滤波器系数，频率越界处理与 ObsPy 保持一致"""
+        key = (filter_type, int(corners), tuple(float(f) for f in band), float(sampling_rate))
+        with self._lock:
+            sos = self._sos_cache.get(key)
+            if sos is not None:
+                self.stats["design_hits"] += 1
+                return sos
+            self.stats["design_misses"] += 1
+
+        fe = 0.5 * sampling_rate
+        if filter_type == "bandpass":
+            low, high = band[0] / fe, band[1] / fe
+            if high - 1.0 > -1e-6:
+                logger.warning(f"带通上限 {band[1]}Hz 超过奈奎斯特频率 {fe}Hz，改用高通滤波")
+                sos = self.design("highpass", (band[0],), sampling_rate, corners)
+                with self._lock:
+                    self._sos_cache[key] = sos
+                return sos
+            if low > 1:
+                raise ValueError(f"带通下限 {band[0]}Hz 超过奈奎斯特频率 {fe}Hz")
+            z, p, k = iirfilter(corners, [low, high], btype='band', ftype='butter', output='zpk')
+        elif filter_type == "lowpass":
+            f = band[0] / fe
+            if f >= 1:
+                # scipy 要求 Wn < 1，取略低于奈奎斯特频率的值
+                logger.warning(f"低通频率 {band[0]}Hz 超过奈奎斯特频率 {fe}Hz，按奈奎斯特频率处理")
+                f = 1.0 - 1e-6
+            z, p, k = iirfilter(corners, f, btype='lowpass', ftype='butter', output='zpk')
+        elif filter_type == "highpass":
+            f = band[0] / fe
+            if f > 1:
+                raise ValueError(f"高通频率 {band[0]}Hz 超过奈奎斯特频率 {fe}Hz")
+            z, p, k = iirfilter(corners, f, btype='highpass', ftype='butter', output='zpk')
+        else:
+            raise ValueError(f"不支持的滤波类型: {filter_type}, 可用类型: {list(FILTER_TYPES)}")
+
+        sos = zpk2sos(z, p, k)
+        with self._lock:
+            self._sos_cache[key] = sos
+        return sos
+
+    def apply(self, st, filter_type: str, band: Tuple[float, ...], corners: int = 4, zerophase: bool = True):
+        """对 Stream 原地滤波，采样率和长度相同的道合并为一次批量计算"""
+        groups: Dict[Tuple[float, int], list] = {}
+        for tr in st:
+            groups.setdefault((float(tr.stats.sampling_rate), int(tr.stats.npts)), []).append(tr)
+
+        for (sampling_rate, npts), traces in groups.items():
+            if npts == 0:
+                continue
+            sos = self.design(filter_type, band, sampling_rate, corners)
+            data = np.empty((len(traces), npts), dtype=np.float64)
+            for i, tr in enumerate(traces):
+                data[i] = tr.data
+            data = sosfilt(sos, data, axis=-1)
+            if zerophase:
+                data = np.ascontiguousarray(sosfilt(sos, data[:, ::-1], axis=-1)[:, ::-1])
+            for i, tr in enumerate(traces):
+                tr.data = data[i]
+                tr.stats.processing = list(tr.stats.get("processing", [])) + [
+                    f"FilterEngine:{filter_type}{band}:corners={corners}:zerophase={zerophase}"
+                ]
+        return st
+
+    def get_product(self, data_key: Any, filter_key: Tuple):
+        """读取已缓存的滤波结果，未命中返回 None"""
+        key = (data_key, filter_key)
+        with self._lock:
+            product = self._products.get(key)
+            if product is None:
+                self.stats["product_misses"] += 1
+                return None
+            self._products.move_to_end(key)
+            self.stats["product_hits"] += 1
+            return product
+
+    def put_product(self, data_key: Any, filter_key: Tuple, product):
+        """缓存滤波结果，超过容量时淘汰最久未使用的结果"""
+        with self._lock:
+            self._products[(data_key, filter_key)] = product
+            self._products.move_to_end((data_key, filter_key))
+            while len(self._products) > self.max_products:
+                self._products.popitem(last=False)
+
+
+# 全局滤波引擎，供绘图与预处理共享
+filter_engine = FilterEngine()
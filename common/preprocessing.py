@@ -0,0 +1,217 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Union
+
+from .filters import filter_engine, FILTER_TYPES
+from .response import response_remover
+
+logger = logging.getLogger(__name__)
+
+# 预处理结果缓存的内存上限(MB)，超出时淘汰最久未使用的结果
+CACHE_BUDGET_ENV = "PREPROCESSING_CACHE_MB"
+DEFAULT_CACHE_BUDGET_MB = 512
+
+# 支持的预处理步骤及其默认参数
+STEP_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "merge": {"method": 0, "fill_value": 0},
+    "detrend": {"type": "linear"},
+    "taper": {"max_percentage": 0.05, "type": "hann"},
+    "resample": {"sampling_rate": None, "method": "resample"},
+    "filter": {"type": "bandpass", "freqmin": 0.0, "freqmax": 0.0, "corners": 4, "zerophase": True},
+    "remove_response": {"output": "VEL", "water_level": 60, "pre_filt": None, "inventory": None},
+}
+
+
+def stream_fingerprint(st) -> str:
+    """计算 Stream 内容哈希（道ID、起始时间、采样率与样本数据）"""
+    h = hashlib.blake2b(digest_size=16)
+    for tr in st:
+        h.update(f"{tr.id}|{tr.stats.starttime}|{tr.stats.sampling_rate}|{tr.data.dtype}|{tr.stats.npts}".encode())
+        data = tr.data if tr.data.flags.c_contiguous else tr.data.copy()
+        h.update(memoryview(data).cast("B"))
+    return h.hexdigest()
+
+
+def stream_nbytes(st) -> int:
+    """Stream 中样本数据占用的字节数"""
+    return sum(tr.data.nbytes for tr in st)
+
+
+class PreprocessingPipeline:
+    """声明式波形预处理流水线
+
+    由步骤列表描述，例如::
+
+        [{"op": "merge"}, {"op": "detrend", "type": "linear"},
+         {"op": "taper", "max_percentage": 0.05},
+         {"op": "resample", "sampling_rate": 100},
+         {"op": "filter", "type": "bandpass", "freqmin": 1, "freqmax": 20}]
+
+    步骤列表可随工具请求以JSON传递。各步骤原地作用于 Stream，
+    输出按 (输入哈希, 流水线指纹) 缓存，条目数不超过 max_cache_entries、样本数据总量
+    不超过 max_cache_bytes（环境变量 PREPROCESSING_CACHE_MB），超出时按LRU淘汰，
+    单个超过预算的结果不缓存。remove_response 步骤使用 inventory 参数指定的响应文件，
+    或由调用方通过 run(st, inventory=...) 提供。
+    """
+
+    _cache: "OrderedDict[tuple, Any]" = OrderedDict()
+    _cache_bytes: Dict[tuple, int] = {}
+    _cache_lock = threading.Lock()
+    max_cache_entries = 16
+    max_cache_bytes = int(float(os.environ.get(CACHE_BUDGET_ENV, DEFAULT_CACHE_BUDGET_MB)) * 1024 * 1024)
+
+    def __init__(self, steps: Optional[List[Dict[str, Any]]] = None):
+        self.steps = [self._normalize_step(step) for step in (steps or [])]
+        self.fingerprint = hashlib.sha1(
+            json.dumps(self.steps, sort_keys=True).encode()
+        ).hexdigest()[:16]
+
+    @classmethod
+    def from_spec(cls, spec: Union[None, str, List, Dict, "PreprocessingPipeline"]) -> Optional["PreprocessingPipeline"]:
+        """从工具参数构建流水线，空参数返回 None
+
+        spec 可以是步骤列表、JSON字符串或 {"steps": [...]} 字典。
+        """
+        if spec is None or isinstance(spec, PreprocessingPipeline):
+            return spec
+        if isinstance(spec, str):
+            if not spec.strip():
+                return None
+            spec = json.loads(spec)
+        if isinstance(spec, dict):
+            spec = spec.get("steps", [])
+        if not spec:
+            return None
+        return cls(list(spec))
+
+    def to_spec(self) -> List[Dict[str, Any]]:
+        """序列化为步骤列表"""
+        return [dict(step) for step in self.steps]
+
+    @property
+    def requires_inventory(self) -> bool:
+        """是否包含需要调用方提供台站响应的 remove_response 步骤"""
+        return any(step["op"] == "remove_response" and not step.get("inventory") for step in self.steps)
+
+    @staticmethod
+    def _normalize_step(step: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+        if isinstance(step, str):
+            step = {"op": step}
+        op = str(step.get("op", "")).lower()
+        if op not in STEP_DEFAULTS:
+            raise ValueError(f"不支持的预处理步骤: {op}, 可用步骤: {list(STEP_DEFAULTS.keys())}")
+        normalized = {"op": op, **STEP_DEFAULTS[op]}
+        normalized.update({k: v for k, v in step.items() if k != "op"})
+        if op == "resample" and not normalized.get("sampling_rate"):
+            raise ValueError("resample 步骤缺少参数：sampling_rate")
+        if op == "remove_response":
+            normalized["output"] = str(normalized["output"]).upper()
+        if op == "filter" and normalized["type"] not in FILTER_TYPES:
+            raise ValueError(f"不支持的滤波类型: {normalized['type']}, 可用类型: {list(FILTER_TYPES)}")
+        return normalized
+
+    def run(self, st, **context):
+        """按顺序原地执行各步骤，返回处理后的 Stream"""
+        for step in self.steps:
+            params = {k: v for k, v in step.items() if k != "op"}
+            st = getattr(self, f"_step_{step['op']}")(st, context=context, **params)
+        return st
+
+    def lookup(self, source_key: str):
+        """按数据来源标识查询缓存结果，未命中返回 None"""
+        key = (source_key, self.fingerprint)
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+        return cached
+
+    def run_cached(self, st, source_key: Optional[str] = None, **context):
+        """带缓存地执行流水线
+
+        缓存键为 (source_key 或输入内容哈希, 流水线指纹)。未命中时原地处理输入并缓存，
+        命中时直接返回缓存的 Stream，调用方不应修改返回值。
+        """
+        input_key = source_key or stream_fingerprint(st)
+        cached = self.lookup(input_key)
+        if cached is not None:
+            logger.info(f"预处理结果命中缓存: {self.fingerprint}")
+            return cached
+
+        st = self.run(st, **context)
+        nbytes = stream_nbytes(st)
+        if nbytes > self.max_cache_bytes:
+            logger.info(f"预处理结果 {nbytes / 1024 / 1024:.1f}MB 超过缓存预算，不缓存")
+            return st
+        key = (input_key, self.fingerprint)
+        with self._cache_lock:
+            self._cache[key] = st
+            self._cache.move_to_end(key)
+            self._cache_bytes[key] = nbytes
+            while len(self._cache) > self.max_cache_entries or \
+                    sum(self._cache_bytes.values()) > self.max_cache_bytes:
+                evicted, _ = self._cache.popitem(last=False)
+                self._cache_bytes.pop(evicted, None)
+        return st
+
+    @classmethod
+    def cache_stats(cls) -> Dict[str, Any]:
+        """返回预处理缓存的条目数与占用"""
+        with cls._cache_lock:
+            return {"entries": len(cls._cache),
+                    "used_mb": round(sum(cls._cache_bytes.values()) / 1024 / 1024, 1),
+                    "budget_mb": round(cls.max_cache_bytes / 1024 / 1024, 1)}
+
+    # ---------- 各预处理步骤 ----------
+
+    @staticmethod
+    def _step_merge(st, method=0, fill_value=0, context=None):
+        st.merge(method=method, fill_value=fill_value)
+        return st
+
+    @staticmethod
+    def _step_detrend(st, type="linear", context=None):
+        st.detrend(type=type)
+        return st
+
+    @staticmethod
+    def _step_taper(st, max_percentage=0.05, type="hann", context=None):
+        st.taper(max_percentage=max_percentage, type=type)
+        return st
+
+    @staticmethod
+    def _step_resample(st, sampling_rate=None, method="resample", context=None):
+        for tr in st:
+            if tr.stats.sampling_rate == sampling_rate:
+                continue
+            if method == "interpolate":
+                tr.interpolate(sampling_rate=sampling_rate)
+            else:
+                tr.resample(sampling_rate)
+        return st
+
+    @staticmethod
+    def _step_filter(st, type="bandpass", freqmin=0.0, freqmax=0.0, corners=4, zerophase=True, context=None):
+        if type == "bandpass":
+            band = (float(freqmin), float(freqmax))
+        elif type == "lowpass":
+            band = (float(freqmax),)
+        else:
+            band = (float(freqmin),)
+        if min(band) <= 0:
+            raise ValueError(f"{type} 滤波步骤的频率参数必须大于0")
+        return filter_engine.apply(st, type, band, corners=corners, zerophase=zerophase)
+
+    @staticmethod
+    def _step_remove_response(st, output="VEL", water_level=60, pre_filt=None, inventory=None, context=None):
+        inv = (context or {}).get("inventory")
+        if inv is None and inventory:
+            inv = response_remover.load_inventory(inventory)
+        if inv is None:
+            raise ValueError("remove_response 步骤缺少台站响应信息：请提供inventory文件路径")
+        response_remover.remove(st, inv, output=output, water_level=water_level, pre_filt=pre_filt)
+        return st
@@ -0,0 +1,245 @@
+import tempfile
+import threading
+import uuid
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Tuple
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+logger = logging.getLogger(__name__)
+
+# 缩略图与全分辨率图的默认DPI
+PREVIEW_DPI = 72
+FULL_DPI = 300
+
+FULL_RESOLUTION_MODES = ("lazy", "background", "immediate")
+
+# 每条曲线绘制的最多点数：全分辨率图宽 15 英寸 x 300 DPI 约 4500 像素，
+# 每像素列保留最小/最大值两个点即与逐点绘制无可见差异
+DEFAULT_PLOT_POINTS = 9000
+
+
+def minmax_indices(data: np.ndarray, max_points: int) -> np.ndarray:
+    """峰值保持降采样：按等长分段保留每段最小值和最大值的样本下标
+
+    返回升序下标（含首尾样本），长度不超过约 max_points。峰值与谷值的位置和数值
+    都原样保留，适合概率曲线和波形的显示与存储。
+    """
+    n = len(data)
+    if n <= max_points:
+        return np.arange(n)
+    bucket = int(np.ceil(n / max(1, max_points // 2)))
+    full = n // bucket
+    blocks = np.asarray(data[:full * bucket]).reshape(full, bucket)
+    offsets = np.arange(full) * bucket
+    picks = [offsets + blocks.argmin(axis=1), offsets + blocks.argmax(axis=1), [0, n - 1]]
+    if full * bucket < n:
+        tail = np.asarray(data[full * bucket:])
+        picks.append([full * bucket + int(tail.argmin()), full * bucket + int(tail.argmax())])
+    return np.unique(np.concatenate(picks))
+
+
+def decimate_trace(trace, offset: float = 0.0,
+                   max_points: int = DEFAULT_PLOT_POINTS) -> Tuple[np.ndarray, np.ndarray]:
+    """返回道数据峰值保持降采样后的 (相对时间, 数值)，供 matplotlib 绘制长曲线
+
+    只为保留的样本计算时间，不生成整条 times() 数组。
+    """
+    idx = minmax_indices(trace.data, max_points)
+    return idx * trace.stats.delta + offset, np.asarray(trace.data)[idx]
+
+
+class FigureRenderer:
+    """两级图像输出：先保存低DPI缩略图立即返回，全分辨率图按需或在后台渲染
+
+    缩略图与全分辨率图共用同一个已绘制好的 Figure 对象，不会重复准备数据。
+    登记时 Figure 即从 pyplot 中移除并改用 Agg 画布，后台线程渲染只使用 Figure 对象本身，
+    不触及非线程安全的 pyplot 全局状态。
+    """
+
+    def __init__(self, preview_dpi: int = PREVIEW_DPI, full_dpi: int = FULL_DPI, max_pending: int = 16,
+                 max_entries: int = 256):
+        self.preview_dpi = preview_dpi
+        self.full_dpi = full_dpi
+        # 最多保留多少个尚未渲染全分辨率图的 Figure，超出后最早的转入后台渲染以释放内存
+        self.max_pending = max_pending
+        # 最多登记多少个渲染ID，超出后淘汰最久未访问的（其全分辨率图不再可取）
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="full-render")
+
+    def save(self, fig, full_resolution: str = "lazy") -> Dict[str, Any]:
+        """保存缩略图并登记全分辨率渲染任务
+
+        Args:
+            fig: 已绘制完成的 matplotlib Figure
+            full_resolution: lazy(按需渲染), background(后台渲染), immediate(立即渲染)
+
+        Returns:
+            包含 plot_path(缩略图)、render_id 和全分辨率状态的字典
+        """
+        mode = (full_resolution or "lazy").lower()
+        if mode not in FULL_RESOLUTION_MODES:
+            logger.warning(f"未知的全分辨率渲染模式: {full_resolution}，使用lazy")
+            mode = "lazy"
+
+        # 在调用线程中把 Figure 从 pyplot 的图形管理器移除，之后只通过 Agg 画布渲染
+        plt.close(fig)
+        FigureCanvasAgg(fig)
+        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as f:
+            fig.savefig(f.name, dpi=self.preview_dpi, bbox_inches='tight')
+            preview_path = f.name
+
+        render_id = str(uuid.uuid4())
+        entry = {
+            "figure": fig,
+            "lock": threading.Lock(),
+            "preview_path": preview_path,
+            "full_path": None,
+            "future": None,
+            "error": None,
+        }
+        with self._lock:
+            self._entries[render_id] = entry
+        self._evict()
+        self._spill_pending()
+
+        if mode == "immediate":
+            self._render(entry)
+        elif mode == "background":
+            self._submit(entry)
+
+        result = {
+            "plot_path": preview_path,
+            "render_id": render_id,
+            "full_resolution_status": self._state(entry),
+        }
+        if entry["full_path"]:
+            result["full_plot_path"] = entry["full_path"]
+        return result
+
+    def status(self, render_id: str) -> str:
+        """返回全分辨率图状态: ready, rendering, pending, failed, unknown"""
+        entry = self._get(render_id)
+        if entry is None:
+            return "unknown"
+        return self._state(entry)
+
+    @staticmethod
+    def _state(entry: Dict[str, Any]) -> str:
+        if entry["full_path"]:
+            return "ready"
+        if entry["error"]:
+            return "failed"
+        if entry["future"] is not None and not entry["future"].done():
+            return "rendering"
+        return "pending"
+
+    def render_full(self, render_id: str, wait: bool = True) -> Dict[str, Any]:
+        """获取全分辨率图，未渲染时立即渲染（wait=False 时转入后台）"""
+        entry = self._get(render_id)
+        if entry is None:
+            return {"status": "error", "message": f"未知的渲染ID: {render_id}"}
+
+        if not entry["full_path"]:
+            if wait:
+                future = entry["future"]
+                if future is not None:
+                    future.result()
+                else:
+                    self._render(entry)
+            elif entry["future"] is None:
+                self._submit(entry)
+
+        state = self._state(entry)
+        result = {
+            "status": "success" if state != "failed" else "error",
+            "render_id": render_id,
+            "plot_path": entry["preview_path"],
+            "full_resolution_status": state,
+        }
+        if entry["full_path"]:
+            result["full_plot_path"] = entry["full_path"]
+            result["message"] = f"全分辨率图像已生成: {entry['full_path']}"
+        elif state == "failed":
+            result["message"] = f"全分辨率图像渲染失败: {entry['error']}"
+        else:
+            result["message"] = "全分辨率图像正在后台渲染"
+        return result
+
+    def _get(self, render_id: str):
+        with self._lock:
+            entry = self._entries.get(render_id)
+            if entry is not None:
+                self._entries.move_to_end(render_id)
+        return entry
+
+    def _submit(self, entry: Dict[str, Any]):
+        if entry["future"] is None and not entry["full_path"]:
+            entry["future"] = self._executor.submit(self._render, entry)
+
+    def _render(self, entry: Dict[str, Any]):
+        with entry["lock"]:
+            if entry["full_path"] or entry["figure"] is None:
+                return entry["full_path"]
+            try:
+                with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as f:
+                    entry["figure"].savefig(f.name, dpi=self.full_dpi, bbox_inches='tight')
+                    entry["full_path"] = f.name
+                logger.info(f"全分辨率图像已生成: {entry['full_path']}")
+            except Exception as e:
+                entry["error"] = str(e)
+                logger.error(f"全分辨率图像渲染失败: {e}")
+            finally:
+                # 渲染后释放 Figure，避免长时间占用内存
+                entry["figure"] = None
+        return entry["full_path"]
+
+    def _evict(self):
+        """超过 max_entries 时淘汰最久未访问的登记项，并释放其未渲染的 Figure"""
+        evicted = []
+        with self._lock:
+            while len(self._entries) > self.max_entries:
+                _, entry = self._entries.popitem(last=False)
+                evicted.append(entry)
+        for entry in evicted:
+            if entry["future"] is not None:
+                entry["future"].cancel()
+            with entry["lock"]:
+                entry["figure"] = None
+
+    def _spill_pending(self):
+        """超过 max_pending 的最早未渲染 Figure 转入后台渲染"""
+        with self._lock:
+            pending = [e for e in self._entries.values() if e["figure"] is not None and e["future"] is None]
+        for entry in pending[:max(0, len(pending) - self.max_pending)]:
+            self._submit(entry)
+
+
+# 全局渲染器，供各工具共享
+figure_renderer = FigureRenderer()
+
+
+def render_full_resolution(render_id: str, wait: bool = True) -> Dict[str, Any]:
+    """获取（必要时渲染）全分辨率图像
+
+    Args:
+        render_id: 绘图工具返回的渲染ID
+        wait: 是否等待渲染完成，False 时在后台渲染并立即返回
+
+    Returns:
+        包含全分辨率图像路径或渲染状态的字典
+    """
+    if not render_id:
+        return {
+            "clarification_needed": True,
+            "missing_params": ["render_id"],
+            "output": "缺少参数：render_id，请补充。"
+        }
+    logger.info(f"调用 render_full_resolution: {render_id}")
+    return figure_renderer.render_full(render_id, wait=wait)
@@ -0,0 +1,158 @@
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+from scipy.fft import rfft, irfft
+from obspy import read_inventory
+from obspy.signal.invsim import cosine_sac_taper, cosine_taper, invert_spectrum
+from obspy.signal.util import _npts2nfft
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_OUTPUTS = ("DISP", "VEL", "ACC")
+
+
+class ResponseRemover:
+    """批量去除仪器响应
+
+    - 每个通道时段(channel epoch)的响应在所需频率网格上只计算一次，
+      按 (通道时段, npts, 采样率, 输出类型, 水位, 预滤波) 缓存反卷积算子
+    - 采样率和长度相同的道堆叠成二维数组，整批只做一次正/反FFT
+    """
+
+    def __init__(self, max_operators: int = 512):
+        self.max_operators = max_operators
+        self._operators: "OrderedDict[Tuple, np.ndarray]" = OrderedDict()
+        self._indexes: Dict[int, Tuple[Any, Dict[str, List]]] = {}
+        self._inventories: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.stats = {"operator_hits": 0, "operator_misses": 0}
+
+    def load_inventory(self, path: str):
+        """读取并缓存台站响应文件(StationXML等)"""
+        with self._lock:
+            inventory = self._inventories.get(path)
+        if inventory is None:
+            inventory = read_inventory(path)
+            with self._lock:
+                self._inventories[path] = inventory
+        return inventory
+
+    def _index(self, inventory) -> Dict[str, List]:
+        """按 SEED ID 建立通道时段索引，每个台站清单只遍历一次"""
+        key = id(inventory)
+        with self._lock:
+            cached = self._indexes.get(key)
+            if cached is not None and cached[0]() is inventory:
+                return cached[1]
+
+        index: Dict[str, List] = {}
+        for net in inventory:
+            for sta in net:
+                for cha in sta:
+                    if cha.response is None:
+                        continue
+                    seed_id = f"{net.code}.{sta.code}.{cha.location_code}.{cha.code}"
+                    index.setdefault(seed_id, []).append((cha.start_date, cha.end_date, cha.response))
+        with self._lock:
+            self._indexes[key] = (weakref.ref(inventory), index)
+        return index
+
+    def _find_epoch(self, index: Dict[str, List], tr):
+        """查找道起始时间所在的通道时段，返回 (时段标识, Response)"""
+        t = tr.stats.starttime
+        for start, end, response in index.get(tr.id, []):
+            if (start is None or start <= t) and (end is None or t <= end):
+                return f"{tr.id}|{start}", response
+        return None, None
+
+    def _operator(self, epoch_key: str, response, npts: int, sampling_rate: float, nfft: int,
+                  output: str, water_level: Optional[float], pre_filt: Optional[Tuple]) -> np.ndarray:
+        """获取（必要时计算）频率域反卷积算子"""
+        key = (epoch_key, npts, float(sampling_rate), output, water_level, pre_filt)
+        with self._lock:
+            op = self._operators.get(key)
+            if op is not None:
+                self._operators.move_to_end(key)
+                self.stats["operator_hits"] += 1
+                return op
+            self.stats["operator_misses"] += 1
+
+        freq_response, freqs = response.get_evalresp_response(1.0 / sampling_rate, nfft, output=output)
+        if water_level is None:
+            freq_response[0] = 0.0
+            freq_response[1:] = 1.0 / freq_response[1:]
+        else:
+            invert_spectrum(freq_response, water_level)
+        if pre_filt:
+            freq_response *= cosine_sac_taper(freqs, flimit=pre_filt)
+
+        with self._lock:
+            self._operators[key] = freq_response
+            while len(self._operators) > self.max_operators:
+                self._operators.popitem(last=False)
+        return freq_response
+
+    def remove(self, st, inventory, output: str = "VEL", water_level: Optional[float] = 60,
+               pre_filt: Optional[List[float]] = None, taper_fraction: float = 0.05,
+               zero_mean: bool = True) -> Dict[str, Any]:
+        """对 Stream 原地去除仪器响应，预处理与 Trace.remove_response 保持一致
+
+        Returns:
+            {"corrected": [...], "missing_response": [...]} 处理摘要
+        """
+        output = output.upper()
+        if output not in RESPONSE_OUTPUTS:
+            raise ValueError(f"不支持的输出类型: {output}, 可用类型: {list(RESPONSE_OUTPUTS)}")
+        pre_filt = tuple(float(f) for f in pre_filt) if pre_filt else None
+        if pre_filt is not None and len(pre_filt) != 4:
+            raise ValueError("pre_filt 需要4个角频率 [f1, f2, f3, f4]")
+
+        index = self._index(inventory)
+        groups: Dict[Tuple[int, float], List] = {}
+        missing = []
+        for tr in st:
+            epoch_key, response = self._find_epoch(index, tr)
+            if response is None:
+                missing.append(tr.id)
+                continue
+            groups.setdefault((int(tr.stats.npts), float(tr.stats.sampling_rate)), []).append((tr, epoch_key, response))
+
+        corrected = []
+        for (npts, sampling_rate), items in groups.items():
+            if npts == 0:
+                continue
+            nfft = _npts2nfft(npts)
+            data = np.empty((len(items), npts), dtype=np.float64)
+            for i, (tr, _, _) in enumerate(items):
+                data[i] = tr.data
+            if zero_mean:
+                data -= data.mean(axis=-1, keepdims=True)
+            if taper_fraction:
+                data *= cosine_taper(npts, taper_fraction, sactaper=True, halfcosine=False)
+
+            spectra = rfft(data, n=nfft, axis=-1)
+            for i, (tr, epoch_key, response) in enumerate(items):
+                spectra[i] *= self._operator(epoch_key, response, npts, sampling_rate, nfft,
+                                             output, water_level, pre_filt)
+            spectra[:, -1] = np.abs(spectra[:, -1]) + 0.0j
+            data = irfft(spectra, n=nfft, axis=-1)[:, :npts]
+            data = np.ascontiguousarray(data)
+
+            for i, (tr, _, _) in enumerate(items):
+                tr.data = data[i]
+                tr.stats.processing = list(tr.stats.get("processing", [])) + [
+                    f"ResponseRemover:output={output}:water_level={water_level}:pre_filt={pre_filt}"
+                ]
+                corrected.append(tr.id)
+
+        if missing:
+            logger.warning(f"以下道缺少仪器响应，未做校正: {missing}")
+        return {"corrected": corrected, "missing_response": missing}
+
+
+# 全局响应去除器，供工具和预处理流水线共享
+response_remover = ResponseRemover()
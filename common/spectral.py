@@ -0,0 +1,132 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+import numpy as np
+from scipy.signal import welch, spectrogram
+
+logger = logging.getLogger(__name__)
+
+SPECTRAL_METHODS = ("welch", "spectrogram")
+
+# 未指定分段长度时的默认值（秒）
+DEFAULT_SEGMENT_SECONDS = {"welch": 20.0, "spectrogram": 2.0}
+
+
+class SpectralAnalyzer:
+    """向量化的 Welch PSD / 短时傅里叶谱图计算
+
+    采样率和长度相同的道堆叠成二维数组，所有道的所有分段在一次 scipy 调用中完成。
+    结果按 (数据标识, 方法, 分段参数) 缓存，更换色标或频率范围重新绘图时不再重新计算。
+    """
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def _nperseg(method: str, sampling_rate: float, npts: int, segment_length: Optional[float]) -> int:
+        seconds = segment_length or DEFAULT_SEGMENT_SECONDS[method]
+        return int(max(8, min(npts, round(seconds * sampling_rate))))
+
+    def lookup(self, data_key: Any, method: str, segment_length: Optional[float] = None,
+               overlap: float = 0.5) -> Optional[Dict[str, Any]]:
+        """查询已缓存的谱计算结果，未命中返回 None"""
+        key = (data_key, method, segment_length, overlap)
+        with self._lock:
+            result = self._cache.get(key)
+            if result is None:
+                return None
+            self._cache.move_to_end(key)
+            self.stats["hits"] += 1
+            return result
+
+    def compute(self, st, data_key: Any, method: str = "welch", segment_length: Optional[float] = None,
+                overlap: float = 0.5) -> Dict[str, Any]:
+        """计算(或读取缓存的) Stream 中所有道的功率谱
+
+        Returns:
+            {"method", "traces": [{"id", "sampling_rate", "starttime", "freqs", "times", "power"}]}
+            welch 的 power 形状为 (nfreq,)，spectrogram 为 (nfreq, ntimes)
+        """
+        method = method.lower()
+        if method not in SPECTRAL_METHODS:
+            raise ValueError(f"不支持的谱分析方法: {method}, 可用方法: {list(SPECTRAL_METHODS)}")
+        if not 0 <= overlap < 1:
+            raise ValueError("overlap 必须在 [0, 1) 范围内")
+
+        cached = self.lookup(data_key, method, segment_length, overlap)
+        if cached is not None:
+            return cached
+        with self._lock:
+            self.stats["misses"] += 1
+
+        groups: Dict[Tuple[float, int], list] = {}
+        for tr in st:
+            groups.setdefault((float(tr.stats.sampling_rate), int(tr.stats.npts)), []).append(tr)
+
+        traces = []
+        for (sampling_rate, npts), group in groups.items():
+            if npts < 8:
+                continue
+            nperseg = self._nperseg(method, sampling_rate, npts, segment_length)
+            noverlap = int(nperseg * overlap)
+            data = np.empty((len(group), npts), dtype=np.float64)
+            for i, tr in enumerate(group):
+                data[i] = tr.data
+
+            times = None
+            if method == "welch":
+                freqs, power = welch(data, fs=sampling_rate, nperseg=nperseg, noverlap=noverlap,
+                                     detrend="constant", axis=-1)
+            else:
+                freqs, times, power = spectrogram(data, fs=sampling_rate, nperseg=nperseg, noverlap=noverlap,
+                                                  detrend="constant", axis=-1)
+            for i, tr in enumerate(group):
+                traces.append({
+                    "id": tr.id,
+                    "sampling_rate": sampling_rate,
+                    "starttime": tr.stats.starttime,
+                    "freqs": freqs,
+                    "times": times,
+                    "power": power[i],
+                })
+
+        result = {"method": method, "segment_length": segment_length, "overlap": overlap, "traces": traces}
+        key = (data_key, method, segment_length, overlap)
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return result
+
+
+def to_db(power: np.ndarray) -> np.ndarray:
+    """功率谱转换为 dB，避免 log10(0)"""
+    return 10.0 * np.log10(np.maximum(power, np.finfo(np.float64).tiny))
+
+
+def band_mask(freqs: np.ndarray, fmin: Optional[float] = None, fmax: Optional[float] = None) -> np.ndarray:
+    """返回 [fmin, fmax] 频率范围的布尔掩码"""
+    mask = np.ones(freqs.shape, dtype=bool)
+    if fmin:
+        mask &= freqs >= fmin
+    if fmax:
+        mask &= freqs <= fmax
+    return mask
+
+
+def empty_band_message(trace_id: str, freqs: np.ndarray, fmin: Optional[float] = None,
+                       fmax: Optional[float] = None) -> str:
+    """频率范围内没有频点时的错误说明，附该道可用的频率范围"""
+    low = fmin if fmin else 0
+    high = fmax if fmax else "奈奎斯特频率"
+    return (f"{trace_id} 在频率范围 {low}-{high} Hz 内没有频点，"
+            f"可用频率范围为 {float(freqs.min()):.3g}-{float(freqs.max()):.3g} Hz")
+
+
+# 全局谱分析器，供绘图工具共享
+spectral_analyzer = SpectralAnalyzer()
@@ -0,0 +1,12 @@
+import os
+
+# 缓存根目录，可通过环境变量覆盖
+CACHE_DIR_ENV = "SEISMIC_AGENT_CACHE_DIR"
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "seismic_agent")
+
+
+def get_cache_dir(*subdirs: str) -> str:
+    """返回（必要时创建）缓存目录"""
+    path = os.path.join(os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR), *subdirs)
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -68,6 +68,9 @@ def get_graph():
     workflow.add_edge("DownloadCatalog", "format_output")
     workflow.add_edge("PlotWaveforms", "format_output")
     workflow.add_edge("DownloadWaveforms", "format_output")
+    workflow.add_edge("RemoveInstrumentResponse", "format_output")
+    workflow.add_edge("ComputeSpectrum", "format_output")
+    workflow.add_edge("PlotSpectrogram", "format_output")
     workflow.add_edge("PlotStations", "format_output")
     workflow.add_edge("DownloadStations", "format_output")
     
@@ -76,7 +79,8 @@ def get_graph():
     for tool_name in tools.keys():
         if tool_name not in ["GetEvents", "GetWaveforms", "GetStations", 
                              "PlotCatalog", "DownloadCatalog", 
-                             "PlotWaveforms", "DownloadWaveforms",
+                             "PlotWaveforms", "DownloadWaveforms", "RemoveInstrumentResponse",
+                             "ComputeSpectrum", "PlotSpectrogram",
                              "PlotStations", "DownloadStations"]:
             workflow.add_edge(tool_name, "llm")
     
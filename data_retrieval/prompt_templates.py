@@ -34,10 +34,10 @@ def create_system_prompt():
     参数: {"network": "网络代码", "station": "台站代码", "location": "位置代码", "channel": "通道代码", "starttime": "开始时间", "endtime": "结束时间"}
 
     4. DownloadWaveforms - 下载波形数据文件
-    参数: {"waveform_data": "network|station|location|channel|starttime|endtime", "format": "MSEED" | "SAC" | "SEGY" | "WAV"}
+    参数: {"waveform_data": "network|station|location|channel|starttime|endtime", "format": "MSEED" | "SAC" | "SEGY" | "WAV", "preprocessing": 预处理步骤列表(可选)}
 
     5. PlotWaveforms - 绘制波形图表
-    参数: {"waveform_data": "network|station|location|channel|starttime|endtime", "filter_type": "none" | "bandpass" | "lowpass" | "highpass", "freqmin": 最小频率, "freqmax": 最大频率}
+    参数: {"waveform_data": "network|station|location|channel|starttime|endtime", "filter_type": "none" | "bandpass" | "lowpass" | "highpass", "freqmin": 最小频率, "freqmax": 最大频率, "preprocessing": 预处理步骤列表(可选)}
 
     6. GetEvents - 获取地震事件数据
     参数: {"starttime": "开始时间", "endtime": "结束时间", "minmagnitude": 最小震级(数字)}
@@ -54,8 +54,20 @@ def create_system_prompt():
     10. DownloadStations - 下载台站数据
     参数: {"station_data": "network|station|starttime|endtime", "format": "STATIONXML" | "CSV" | "JSON"}
 
-    11. PlotStations - 绘制台站分布图
-    参数: {"station_data": "network|station|starttime|endtime", "map_type": "global" | "regional" | "local"}
+    11. PlotStations - 绘制台站分布图（先返回低分辨率缩略图）
+    参数: {"station_data": "network|station|starttime|endtime", "map_type": "global" | "regional" | "local", "full_resolution": "lazy" | "background" | "immediate"}
+
+    12. RemoveInstrumentResponse - 去除仪器响应，将波形转换为位移/速度/加速度并保存为文件
+    参数: {"waveform_data": "network|station|location|channel|starttime|endtime", "output": "DISP" | "VEL" | "ACC", "water_level": 水位(dB), "pre_filt": [f1, f2, f3, f4](可选), "format": "MSEED" | "SAC" | "SEGY" | "WAV"}
+
+    13. RenderFullResolution - 获取绘图结果的全分辨率图像（仅在用户需要高清图时调用）
+    参数: {"render_id": "绘图工具返回的render_id", "wait": true/false}
+
+    14. ComputeSpectrum - 计算并绘制波形功率谱密度（Welch方法），返回各道谱峰频率
+    参数: {"waveform_data": "network|station|location|channel|starttime|endtime", "segment_length": 分段长度(秒,可选), "overlap": 重叠比例(可选), "fmin": 最低频率(可选), "fmax": 最高频率(可选), "preprocessing": 预处理步骤列表(可选), "full_resolution": "lazy" | "background" | "immediate"}
+
+    15. PlotSpectrogram - 绘制波形时频谱图（谱结果会缓存，调整色标或频率范围重新绘图时无需重新计算）
+    参数: {"waveform_data": "network|station|location|channel|starttime|endtime", "segment_length": 窗长(秒,可选), "overlap": 重叠比例(可选), "fmin": 最低频率(可选), "fmax": 最高频率(可选), "vmin": 色标下限dB(可选), "vmax": 色标上限dB(可选), "cmap": "viridis", "log_frequency": true/false, "preprocessing": 预处理步骤列表(可选), "full_resolution": "lazy" | "background" | "immediate"}
     
     你必须始终以JSON格式返回回复，包含action（要执行的操作）和action_input（操作的参数）。
     例如: {"action": "GetEvents", "action_input": {"starttime": "2020-01-01", "endtime": "2020-01-02", "minmagnitude": 5.0}}
@@ -111,6 +123,15 @@ def create_system_prompt():
     - DownloadCatalog: catalog_data (格式: "starttime|endtime|minmagnitude"), format (可选: "QUAKEML", "CSV", "JSON")
     - PlotCatalog: catalog_data (格式: "starttime|endtime|minmagnitude")
     - DownloadCatalog: catalog_data (格式: "starttime|endtime|minmagnitude"), format (可选: "QUAKEML", "CSV", "JSON")
+    - preprocessing (可选，DownloadWaveforms/PlotWaveforms/ComputeSpectrum/PlotSpectrogram): 预处理步骤列表，仅在用户明确要求去趋势、尖灭、合并、重采样或滤波时使用，
+      可用步骤: merge, detrend(type), taper(max_percentage), resample(sampling_rate), filter(type, freqmin, freqmax),
+      remove_response(output, water_level, pre_filt；自动使用对应台站的仪器响应)
+      例如: [{"op": "detrend", "type": "linear"}, {"op": "taper", "max_percentage": 0.05}, {"op": "resample", "sampling_rate": 50}]
+    - RemoveInstrumentResponse: waveform_data, output (可选: "DISP", "VEL", "ACC"), water_level (可选), pre_filt (可选), format (可选)
+    - PlotStations: station_data (格式: "network|station|starttime|endtime"), map_type (可选), full_resolution (可选: "lazy", "background", "immediate")
+    - RenderFullResolution: render_id, wait (可选)
+    - ComputeSpectrum: waveform_data, segment_length (可选), overlap (可选), fmin (可选), fmax (可选), preprocessing (可选), full_resolution (可选)
+    - PlotSpectrogram: waveform_data, segment_length (可选), overlap (可选), fmin (可选), fmax (可选), vmin (可选), vmax (可选), cmap (可选), log_frequency (可选), preprocessing (可选), full_resolution (可选)
     """
 
     # 在系统提示中添加关于工具结果的明确说明
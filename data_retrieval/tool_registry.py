@@ -2,11 +2,13 @@ from typing import Dict, Callable, Any
 from .tools import (
     retrieve_waveforms, retrieve_events, retrieve_stations,
     set_client, get_client_info, plot_catalog, download_catalog_data,
-    download_waveforms, plot_waveforms,
+    download_waveforms, plot_waveforms, remove_instrument_response,
     download_stations, plot_stations,  explain_location_codes, # 添加新工具
     EventParams, SetClientParams, CatalogParam,
     DownloadCatalogParams, WaveformDataParam, DownloadWaveformsParams, PlotWaveformsParams,
-    StationDataParam, DownloadStationsParams, PlotStationsParams  # 添加新参数模型
+    StationDataParam, DownloadStationsParams, PlotStationsParams,  # 添加新参数模型
+    render_full_resolution, RenderFullResolutionParams, RemoveResponseParams,
+    compute_spectrum, plot_spectrogram, ComputeSpectrumParams, PlotSpectrogramParams
 )
 
 def get_tools() -> Dict[str, Callable]:
@@ -23,9 +25,13 @@ def get_tools() -> Dict[str, Callable]:
         "DownloadCatalog": download_catalog_data,
         "DownloadWaveforms": download_waveforms,
         "PlotWaveforms": plot_waveforms,
+        "RemoveInstrumentResponse": remove_instrument_response,
+        "ComputeSpectrum": compute_spectrum,
+        "PlotSpectrogram": plot_spectrogram,
         "DownloadStations": download_stations,  # 新增
         "PlotStations": plot_stations,  # 新增
         "ExplainLocationCodes": explain_location_codes,
+        "RenderFullResolution": render_full_resolution,
     }
 
 def get_tool_descriptions() -> Dict[str, str]:
@@ -40,10 +46,14 @@ def get_tool_descriptions() -> Dict[str, str]:
         "GetStations": "获取台站信息，参数：network, station, starttime, endtime",
         "PlotCatalog": "生成地震事件分布图表，参数：catalog_data",
         "DownloadCatalog": "下载地震目录数据，参数：catalog_data, format",
-        "DownloadWaveforms": "下载波形数据，参数：waveform_data, format",
-        "PlotWaveforms": "绘制波形数据图表，参数：waveform_data, filter_type, freqmin, freqmax",
+        "DownloadWaveforms": "下载波形数据，参数：waveform_data, format, preprocessing",
+        "PlotWaveforms": "绘制波形数据图表，参数：waveform_data, filter_type, freqmin, freqmax, preprocessing",
+        "RemoveInstrumentResponse": "去除仪器响应并保存地面运动波形文件，参数：waveform_data, output, water_level, pre_filt, format",
+        "ComputeSpectrum": "计算并绘制波形功率谱密度(Welch)，参数：waveform_data, segment_length, overlap, fmin, fmax, preprocessing, full_resolution",
+        "PlotSpectrogram": "绘制波形时频谱图，参数：waveform_data, segment_length, overlap, fmin, fmax, vmin, vmax, cmap, log_frequency, preprocessing, full_resolution",
         "DownloadStations": "下载台站数据，参数：station_data, format",  # 新增
-        "PlotStations": "绘制台站分布图，参数：station_data, map_type",  # 新增
+        "PlotStations": "绘制台站分布图（先返回缩略图），参数：station_data, map_type, full_resolution",  # 新增
+        "RenderFullResolution": "获取绘图工具对应的全分辨率图像，参数：render_id, wait",
     }
 
 def get_tool_param_models() -> Dict[str, Any]:
@@ -59,6 +69,10 @@ def get_tool_param_models() -> Dict[str, Any]:
         "DownloadCatalog": DownloadCatalogParams,
         "DownloadWaveforms": DownloadWaveformsParams,
         "PlotWaveforms": PlotWaveformsParams,
+        "RemoveInstrumentResponse": RemoveResponseParams,
+        "ComputeSpectrum": ComputeSpectrumParams,
+        "PlotSpectrogram": PlotSpectrogramParams,
         "DownloadStations": DownloadStationsParams,
         "PlotStations": PlotStationsParams,
+        "RenderFullResolution": RenderFullResolutionParams,
     }
\ No newline at end of file
@@ -6,8 +6,15 @@ import tempfile
 import os
 import sys
 import subprocess
-from typing import Dict, List, Any
+import numpy as np
+import matplotlib.pyplot as plt
+from typing import Dict, List, Any, Optional
 from pydantic import BaseModel, Field
+from common.rendering import figure_renderer, render_full_resolution
+from common.filters import filter_engine, normalize_filter, describe_filter
+from common.preprocessing import PreprocessingPipeline
+from common.response import response_remover
+from common.spectral import spectral_analyzer, to_db, band_mask, empty_band_message
 
 logger = logging.getLogger(__name__)
 
@@ -18,12 +25,43 @@ class WaveformDataParam(BaseModel):
 class DownloadWaveformsParams(BaseModel):
     waveform_data: str = Field(description="波形数据标识符，格式：network|station|location|channel|starttime|endtime")
     format: str = Field(description="数据格式: MSEED, SAC, SEGY, WAV", default="MSEED")
+    preprocessing: Optional[List[Dict[str, Any]]] = Field(description="预处理步骤列表，如[{\"op\": \"detrend\"}, {\"op\": \"resample\", \"sampling_rate\": 100}]", default=None)
 
 class PlotWaveformsParams(BaseModel):
     waveform_data: str = Field(description="波形数据标识符，格式：network|station|location|channel|starttime|endtime")
     filter_type: str = Field(description="滤波类型: none, bandpass, lowpass, highpass", default="none")
     freqmin: float = Field(description="最低频率，用于bandpass和highpass滤波", default=0.0)
     freqmax: float = Field(description="最高频率，用于bandpass和lowpass滤波", default=0.0)
+    preprocessing: Optional[List[Dict[str, Any]]] = Field(description="预处理步骤列表，在滤波之前执行", default=None)
+
+class RemoveResponseParams(BaseModel):
+    waveform_data: str = Field(description="波形数据标识符，格式：network|station|location|channel|starttime|endtime")
+    output: str = Field(description="输出物理量: DISP(位移), VEL(速度), ACC(加速度)", default="VEL")
+    water_level: float = Field(description="反卷积水位(dB)", default=60)
+    pre_filt: Optional[List[float]] = Field(description="频率域预滤波角频率 [f1, f2, f3, f4]", default=None)
+    format: str = Field(description="数据格式: MSEED, SAC, SEGY, WAV", default="MSEED")
+
+class ComputeSpectrumParams(BaseModel):
+    waveform_data: str = Field(description="波形数据标识符，格式：network|station|location|channel|starttime|endtime")
+    segment_length: Optional[float] = Field(description="Welch分段长度(秒)，默认20秒", default=None)
+    overlap: float = Field(description="分段重叠比例，0-1", default=0.5)
+    fmin: Optional[float] = Field(description="显示的最低频率(Hz)", default=None)
+    fmax: Optional[float] = Field(description="显示的最高频率(Hz)", default=None)
+    preprocessing: Optional[List[Dict[str, Any]]] = Field(description="预处理步骤列表", default=None)
+    full_resolution: str = Field(description="全分辨率图渲染方式: lazy(按需), background(后台), immediate(立即)", default="lazy")
+
+class PlotSpectrogramParams(BaseModel):
+    waveform_data: str = Field(description="波形数据标识符，格式：network|station|location|channel|starttime|endtime")
+    segment_length: Optional[float] = Field(description="短时傅里叶变换窗长(秒)，默认2秒", default=None)
+    overlap: float = Field(description="窗口重叠比例，0-1", default=0.5)
+    fmin: Optional[float] = Field(description="显示的最低频率(Hz)", default=None)
+    fmax: Optional[float] = Field(description="显示的最高频率(Hz)", default=None)
+    vmin: Optional[float] = Field(description="色标下限(dB)", default=None)
+    vmax: Optional[float] = Field(description="色标上限(dB)", default=None)
+    cmap: str = Field(description="颜色映射名称", default="viridis")
+    log_frequency: bool = Field(description="频率轴是否使用对数坐标", default=False)
+    preprocessing: Optional[List[Dict[str, Any]]] = Field(description="预处理步骤列表", default=None)
+    full_resolution: str = Field(description="全分辨率图渲染方式: lazy(按需), background(后台), immediate(立即)", default="lazy")
 
 class EventParams(BaseModel):
     starttime: str = Field(description="事件开始时间，ISO8601")
@@ -51,6 +89,11 @@ class DownloadStationsParams(BaseModel):
 class PlotStationsParams(BaseModel):
     station_data: str = Field(description="台站数据标识符，格式：network|station|starttime|endtime")
     map_type: str = Field(description="地图类型: global, regional, local", default="global")
+    full_resolution: str = Field(description="全分辨率图渲染方式: lazy(按需), background(后台), immediate(立即)", default="lazy")
+
+class RenderFullResolutionParams(BaseModel):
+    render_id: str = Field(description="绘图工具返回的渲染ID")
+    wait: bool = Field(description="是否等待全分辨率图渲染完成", default=True)
 
 
 
@@ -148,6 +191,59 @@ def check_required_params(params: dict, required: list):
     missing = [p for p in required if not params.get(p)]
     return missing
 
+# 仪器响应缓存，同一波形标识只下载一次响应信息
+_response_inventories: Dict[str, Any] = {}
+
+def get_response_inventory(waveform_data: str):
+    """获取波形数据对应的台站响应信息(level=response)"""
+    inventory = _response_inventories.get(waveform_data)
+    if inventory is not None:
+        return inventory
+    network, station, location, channel, starttime, endtime = waveform_data.split("|")
+    inventory = client.robust_call(
+        "get_stations",
+        network=network,
+        station=station,
+        location=location,
+        channel=channel,
+        starttime=UTCDateTime(starttime),
+        endtime=UTCDateTime(endtime),
+        level="response"
+    )
+    if isinstance(inventory, dict):
+        raise RuntimeError(inventory.get("message", "获取仪器响应失败"))
+    _response_inventories[waveform_data] = inventory
+    return inventory
+
+def load_waveforms(waveform_data: str, pipeline=None):
+    """按波形标识获取数据并执行预处理(如果指定)，预处理结果按数据标识缓存"""
+    if pipeline is not None:
+        st = pipeline.lookup(waveform_data)
+        if st is not None:
+            return st
+    network, station, location, channel, starttime, endtime = waveform_data.split("|")
+    st = client.robust_call(
+        "get_waveforms",
+        network=network,
+        station=station,
+        location=location,
+        channel=channel,
+        starttime=UTCDateTime(starttime),
+        endtime=UTCDateTime(endtime)
+    )
+    if isinstance(st, dict):
+        raise RuntimeError(st.get("message", "获取波形数据失败"))
+    if pipeline is not None:
+        context = {"inventory": get_response_inventory(waveform_data)} if pipeline.requires_inventory else {}
+        st = pipeline.run_cached(st, source_key=waveform_data, **context)
+    return st
+
+def get_write_format(format: str):
+    """根据波形输出格式返回 (文件扩展名, ObsPy写出格式)，未知格式默认使用MSEED"""
+    formats = {"MSEED": ".mseed", "SAC": ".sac", "SEGY": ".segy", "WAV": ".wav"}
+    write_format = format.upper() if format.upper() in formats else "MSEED"
+    return formats[write_format], write_format
+
 def retrieve_waveforms(network: str, station: str, location: str, channel: str, starttime: str, endtime: str) -> Dict[str, Any]:
     """获取波形数据信息"""
     # 参数校验
@@ -233,12 +329,13 @@ def retrieve_waveforms(network: str, station: str, location: str, channel: str,
         logger.error(f"获取波形数据失败: {e}")
         return {"status": "error", "message": f"获取波形数据失败: {str(e)}"}
 
-def download_waveforms(waveform_data: str, format: str = "MSEED") -> Dict[str, Any]:
+def download_waveforms(waveform_data: str, format: str = "MSEED", preprocessing: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
     """下载波形数据并保存为文件
     
     Args:
         waveform_data: 格式为"network|station|location|channel|starttime|endtime"的字符串
         format: 输出格式，默认为MSEED，可选值：MSEED, SAC, SEGY, WAV
+        preprocessing: 可选的预处理步骤列表，保存前执行
         
     Returns:
         包含下载结果信息的字典
@@ -266,23 +363,14 @@ def download_waveforms(waveform_data: str, format: str = "MSEED") -> Dict[str, A
             endtime=UTCDateTime(endtime)
         )
         
+        # 执行预处理(如果指定)
+        pipeline = PreprocessingPipeline.from_spec(preprocessing)
+        if pipeline is not None:
+            context = {"inventory": get_response_inventory(waveform_data)} if pipeline.requires_inventory else {}
+            st = pipeline.run(st, **context)
+        
         # 根据格式选择文件扩展名
-        if format.upper() == "MSEED":
-            ext = ".mseed"
-            write_format = "MSEED"
-        elif format.upper() == "SAC":
-            ext = ".sac"
-            write_format = "SAC"
-        elif format.upper() == "SEGY":
-            ext = ".segy"
-            write_format = "SEGY"
-        elif format.upper() == "WAV":
-            ext = ".wav"
-            write_format = "WAV"
-        else:
-            # 默认使用MSEED
-            ext = ".mseed"
-            write_format = "MSEED"
+        ext, write_format = get_write_format(format)
         
         # 数据文件保存
         with tempfile.NamedTemporaryFile(suffix=ext, delete=False) as f:
@@ -296,13 +384,15 @@ def download_waveforms(waveform_data: str, format: str = "MSEED") -> Dict[str, A
             "traces_count": int(len(st)),  # 确保是标准Python整数
             "time_range": f"{starttime} 至 {endtime}",
             "network_station": f"{network}.{station}.{location}.{channel}",
+            "preprocessing": pipeline.to_spec() if pipeline else None,
             "message": f"成功下载 {network}.{station}.{location}.{channel} 的波形数据，格式为 {format.upper()}"
         }
     except Exception as e:
         return {"status": "error", "message": f"下载波形数据失败: {str(e)}"}
 
 
-def plot_waveforms(waveform_data: str, filter_type: str = "none", freqmin: float = 0.0, freqmax: float = 0.0) -> Dict[str, Any]:
+def plot_waveforms(waveform_data: str, filter_type: str = "none", freqmin: float = 0.0, freqmax: float = 0.0,
+                   preprocessing: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
     """绘制波形数据图表
     
     Args:
@@ -310,6 +400,7 @@ def plot_waveforms(waveform_data: str, filter_type: str = "none", freqmin: float
         filter_type: 滤波类型，可选值：none, bandpass, lowpass, highpass
         freqmin: 最低频率，用于bandpass和highpass滤波
         freqmax: 最高频率，用于bandpass和lowpass滤波
+        preprocessing: 可选的预处理步骤列表，在滤波之前执行
         
     Returns:
         包含绘图结果信息的字典
@@ -326,32 +417,29 @@ def plot_waveforms(waveform_data: str, filter_type: str = "none", freqmin: float
         # 解析参数
         network, station, location, channel, starttime, endtime = waveform_data.split("|")
         
-        # 获取数据
-        st = client.robust_call(
-            "get_waveforms",
-            network=network,
-            station=station,
-            location=location,
-            channel=channel,
-            starttime=UTCDateTime(starttime),
-            endtime=UTCDateTime(endtime)
-        )
+        # 规范化滤波参数，filter_type为none或频率不足时不滤波
+        spec = normalize_filter(filter_type, freqmin, freqmax)
+        filter_info = describe_filter(spec)
+        pipeline = PreprocessingPipeline.from_spec(preprocessing)
+        data_key = waveform_data if pipeline is None else (waveform_data, pipeline.fingerprint)
         
-        # 应用滤波器(如果指定)
-        if filter_type.lower() != "none" and freqmin > 0 or freqmax > 0:
-            if filter_type.lower() == "bandpass" and freqmin > 0 and freqmax > 0:
-                st.filter('bandpass', freqmin=freqmin, freqmax=freqmax, corners=4)
-                filter_info = f"带通滤波({freqmin}-{freqmax}Hz)"
-            elif filter_type.lower() == "lowpass" and freqmax > 0:
-                st.filter('lowpass', freq=freqmax, corners=4)
-                filter_info = f"低通滤波(<{freqmax}Hz)"
-            elif filter_type.lower() == "highpass" and freqmin > 0:
-                st.filter('highpass', freq=freqmin, corners=4)
-                filter_info = f"高通滤波(>{freqmin}Hz)"
-            else:
-                filter_info = "无滤波"
-        else:
-            filter_info = "无滤波"
+        # 相同数据和滤波参数的结果已缓存时直接复用
+        st = None
+        if spec is not None:
+            filter_key = (spec[0], spec[1], 4, True)
+            st = filter_engine.get_product(data_key, filter_key)
+        
+        if st is None:
+            # 获取数据并执行预处理(如果指定)
+            st = load_waveforms(waveform_data, pipeline)
+            
+            # 应用滤波器(如果指定)，使用缓存的SOS设计批量零相位滤波
+            if spec is not None:
+                if pipeline is not None:
+                    # 预处理结果已被缓存，滤波前复制以免修改缓存
+                    st = st.copy()
+                filter_engine.apply(st, spec[0], spec[1], corners=4, zerophase=True)
+                filter_engine.put_product(data_key, filter_key, st)
         
         # 生成图表
         fig = st.plot(show=False, outfile=None)
@@ -372,6 +460,7 @@ def plot_waveforms(waveform_data: str, filter_type: str = "none", freqmin: float
             "status": "success",
             "plot_path": img_path,
             "filter": filter_info,
+            "preprocessing": pipeline.to_spec() if pipeline else None,
             "traces_count": int(len(st)),  # 确保是标准Python整数
             "time_range": f"{starttime} 至 {endtime}",
             "network_station": f"{network}.{station}.{location}.{channel}",
@@ -381,6 +470,236 @@ def plot_waveforms(waveform_data: str, filter_type: str = "none", freqmin: float
         return {"status": "error", "message": f"绘制波形图失败: {str(e)}"}
 
 
+def remove_instrument_response(waveform_data: str, output: str = "VEL", water_level: float = 60,
+                               pre_filt: Optional[List[float]] = None, format: str = "MSEED") -> Dict[str, Any]:
+    """去除仪器响应，将波形转换为地面运动并保存为文件
+    
+    Args:
+        waveform_data: 格式为"network|station|location|channel|starttime|endtime"的字符串
+        output: 输出物理量，可选值：DISP, VEL, ACC
+        water_level: 反卷积水位(dB)
+        pre_filt: 频率域预滤波角频率 [f1, f2, f3, f4]
+        format: 输出格式，默认为MSEED，可选值：MSEED, SAC, SEGY, WAV
+        
+    Returns:
+        包含校正结果信息的字典
+    """
+    if not waveform_data:
+        return {
+            "clarification_needed": True,
+            "missing_params": ["waveform_data"],
+            "output": "缺少参数：waveform_data，请补充。"
+        }
+    logger.info(f"调用 remove_instrument_response: {waveform_data}, 输出: {output}")
+    try:
+        network, station, location, channel, starttime, endtime = waveform_data.split("|")
+        
+        # 获取波形与仪器响应
+        st = load_waveforms(waveform_data)
+        inventory = get_response_inventory(waveform_data)
+        
+        # 批量去除仪器响应，响应按通道时段缓存
+        summary = response_remover.remove(st, inventory, output=output, water_level=water_level, pre_filt=pre_filt)
+        
+        # 数据文件保存
+        ext, write_format = get_write_format(format)
+        with tempfile.NamedTemporaryFile(suffix=ext, delete=False) as f:
+            st.write(f.name, format=write_format)
+            data_path = f.name
+        
+        message = f"成功去除 {len(summary['corrected'])} 道波形的仪器响应，输出为 {output.upper()}"
+        if summary["missing_response"]:
+            message += f"，{len(summary['missing_response'])} 道缺少响应信息未校正"
+        
+        return {
+            "status": "success",
+            "data_file": data_path,
+            "format": write_format,
+            "response_output": output.upper(),
+            "corrected_count": len(summary["corrected"]),
+            "missing_response": summary["missing_response"],
+            "time_range": f"{starttime} 至 {endtime}",
+            "network_station": f"{network}.{station}.{location}.{channel}",
+            "message": message
+        }
+    except Exception as e:
+        return {"status": "error", "message": f"去除仪器响应失败: {str(e)}"}
+
+
+def _get_spectra(waveform_data: str, method: str, segment_length: Optional[float], overlap: float, preprocessing):
+    """计算或读取缓存的谱结果，缓存命中时不再获取波形"""
+    pipeline = PreprocessingPipeline.from_spec(preprocessing)
+    data_key = waveform_data if pipeline is None else (waveform_data, pipeline.fingerprint)
+    spectra = spectral_analyzer.lookup(data_key, method, segment_length, overlap)
+    if spectra is None:
+        st = load_waveforms(waveform_data, pipeline)
+        spectra = spectral_analyzer.compute(st, data_key, method, segment_length, overlap)
+    return spectra, pipeline
+
+def compute_spectrum(waveform_data: str, segment_length: Optional[float] = None, overlap: float = 0.5,
+                     fmin: Optional[float] = None, fmax: Optional[float] = None,
+                     preprocessing: Optional[List[Dict[str, Any]]] = None,
+                     full_resolution: str = "lazy") -> Dict[str, Any]:
+    """计算波形功率谱密度(Welch方法)并绘制PSD曲线
+    
+    Args:
+        waveform_data: 格式为"network|station|location|channel|starttime|endtime"的字符串
+        segment_length: Welch分段长度(秒)，默认20秒
+        overlap: 分段重叠比例
+        fmin: 显示的最低频率
+        fmax: 显示的最高频率
+        preprocessing: 可选的预处理步骤列表
+        full_resolution: 全分辨率图渲染方式，可选值：lazy, background, immediate
+        
+    Returns:
+        包含各道谱峰信息和绘图结果的字典
+    """
+    if not waveform_data:
+        return {
+            "clarification_needed": True,
+            "missing_params": ["waveform_data"],
+            "output": "缺少参数：waveform_data，请补充。"
+        }
+    logger.info(f"调用 compute_spectrum: {waveform_data}")
+    try:
+        spectra, pipeline = _get_spectra(waveform_data, "welch", segment_length, overlap, preprocessing)
+        if not spectra["traces"]:
+            return {"status": "error", "message": "没有足够长度的波形用于计算功率谱"}
+        
+        # 先检查频率范围，避免空数组进入绘图和 log10
+        masks = []
+        for item in spectra["traces"]:
+            mask = band_mask(item["freqs"], fmin, fmax) & (item["freqs"] > 0)
+            if not mask.any():
+                return {"status": "error", "message": empty_band_message(item["id"], item["freqs"], fmin, fmax)}
+            masks.append(mask)
+        
+        fig, ax = plt.subplots(figsize=(10, 6))
+        traces_info = []
+        for item, mask in zip(spectra["traces"], masks):
+            freqs = item["freqs"][mask]
+            power_db = to_db(item["power"][mask])
+            ax.semilogx(freqs, power_db, label=item["id"])
+            peak = int(np.argmax(power_db))
+            traces_info.append({
+                "id": item["id"],
+                "peak_frequency": float(freqs[peak]),
+                "peak_power_db": float(power_db[peak]),
+                "mean_power_db": float(np.mean(power_db)),
+            })
+        ax.set_xlabel("Frequency (Hz)")
+        ax.set_ylabel("PSD (dB)")
+        ax.set_title("Power Spectral Density (Welch)")
+        ax.grid(True, which="both", alpha=0.3)
+        if traces_info:
+            ax.legend()
+        
+        # 保存缩略图，全分辨率图按需或后台渲染
+        rendered = figure_renderer.save(fig, full_resolution)
+        img_path = rendered["plot_path"]
+        
+        # 在Windows下打开图片
+        if os.name == 'nt':
+            os.startfile(img_path)
+        else:
+            opener = 'open' if sys.platform == 'darwin' else 'xdg-open'
+            subprocess.call([opener, img_path])
+        
+        return {
+            "status": "success",
+            **rendered,
+            "method": "welch",
+            "traces": traces_info,
+            "frequency_range": [fmin, fmax],
+            "preprocessing": pipeline.to_spec() if pipeline else None,
+            "message": f"成功计算 {len(traces_info)} 道波形的功率谱密度"
+        }
+    except Exception as e:
+        return {"status": "error", "message": f"计算功率谱失败: {str(e)}"}
+
+def plot_spectrogram(waveform_data: str, segment_length: Optional[float] = None, overlap: float = 0.5,
+                     fmin: Optional[float] = None, fmax: Optional[float] = None,
+                     vmin: Optional[float] = None, vmax: Optional[float] = None,
+                     cmap: str = "viridis", log_frequency: bool = False,
+                     preprocessing: Optional[List[Dict[str, Any]]] = None,
+                     full_resolution: str = "lazy") -> Dict[str, Any]:
+    """绘制波形时频谱图，谱结果已缓存时只重新绘图
+    
+    Args:
+        waveform_data: 格式为"network|station|location|channel|starttime|endtime"的字符串
+        segment_length: 短时傅里叶变换窗长(秒)，默认2秒
+        overlap: 窗口重叠比例
+        fmin: 显示的最低频率
+        fmax: 显示的最高频率
+        vmin: 色标下限(dB)
+        vmax: 色标上限(dB)
+        cmap: 颜色映射名称
+        log_frequency: 频率轴是否使用对数坐标
+        preprocessing: 可选的预处理步骤列表
+        full_resolution: 全分辨率图渲染方式，可选值：lazy, background, immediate
+        
+    Returns:
+        包含绘图结果信息的字典
+    """
+    if not waveform_data:
+        return {
+            "clarification_needed": True,
+            "missing_params": ["waveform_data"],
+            "output": "缺少参数：waveform_data，请补充。"
+        }
+    logger.info(f"调用 plot_spectrogram: {waveform_data}")
+    try:
+        spectra, pipeline = _get_spectra(waveform_data, "spectrogram", segment_length, overlap, preprocessing)
+        traces = spectra["traces"]
+        if not traces:
+            return {"status": "error", "message": "没有足够长度的波形用于计算谱图"}
+        
+        # 先检查频率范围，避免空数组进入 pcolormesh 和 log10
+        masks = []
+        for item in traces:
+            mask = band_mask(item["freqs"], fmin, fmax)
+            if log_frequency:
+                mask &= item["freqs"] > 0
+            if not mask.any():
+                return {"status": "error", "message": empty_band_message(item["id"], item["freqs"], fmin, fmax)}
+            masks.append(mask)
+        
+        fig, axs = plt.subplots(len(traces), 1, figsize=(12, 3 * len(traces)), squeeze=False)
+        for ax, item, mask in zip(axs[:, 0], traces, masks):
+            mesh = ax.pcolormesh(item["times"], item["freqs"][mask], to_db(item["power"][mask]),
+                                 shading="auto", cmap=cmap, vmin=vmin, vmax=vmax)
+            if log_frequency:
+                ax.set_yscale("log")
+            ax.set_ylabel("Frequency (Hz)")
+            ax.set_title(f"{item['id']} - {item['starttime'].isoformat()}")
+            fig.colorbar(mesh, ax=ax, label="Power (dB)")
+        axs[-1, 0].set_xlabel("Time (seconds)")
+        plt.tight_layout()
+        
+        # 保存缩略图，全分辨率图按需或后台渲染
+        rendered = figure_renderer.save(fig, full_resolution)
+        img_path = rendered["plot_path"]
+        
+        # 在Windows下打开图片
+        if os.name == 'nt':
+            os.startfile(img_path)
+        else:
+            opener = 'open' if sys.platform == 'darwin' else 'xdg-open'
+            subprocess.call([opener, img_path])
+        
+        return {
+            "status": "success",
+            **rendered,
+            "method": "spectrogram",
+            "traces_count": len(traces),
+            "frequency_range": [fmin, fmax],
+            "color_range": [vmin, vmax],
+            "preprocessing": pipeline.to_spec() if pipeline else None,
+            "message": f"成功绘制 {len(traces)} 道波形的时频谱图"
+        }
+    except Exception as e:
+        return {"status": "error", "message": f"绘制时频谱图失败: {str(e)}"}
+
 def retrieve_events(starttime: str, endtime: str, minmagnitude: float) -> Dict[str, Any]:
     """获取地震事件数据"""
     params = {
@@ -731,12 +1050,14 @@ def download_stations(station_data: str, format: str = "STATIONXML") -> Dict[str
     except Exception as e:
         return {"status": "error", "message": f"下载台站数据失败: {str(e)}"}
 
-def plot_stations(station_data: str, map_type: str = "global") -> Dict[str, Any]:
+def plot_stations(station_data: str, map_type: str = "global", full_resolution: str = "lazy") -> Dict[str, Any]:
     """绘制台站分布图
     
     Args:
         station_data: 格式为"network|station|starttime|endtime"的字符串
         map_type: 地图类型，可选值：global, regional, local
+        full_resolution: 全分辨率图渲染方式，可选值：lazy, background, immediate；
+            工具总是先返回低分辨率缩略图
         
     Returns:
         包含绘图结果信息的字典
@@ -769,24 +1090,23 @@ def plot_stations(station_data: str, map_type: str = "global") -> Dict[str, Any]
         else:
             fig = inventory.plot(projection="global", show=False)
         
-        # 保存图片
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as f:
-            fig.savefig(f.name, bbox_inches='tight', dpi=300)
-            img_path = f.name
-            
-            # 在Windows下打开图片
-            if os.name == 'nt':
-                os.startfile(img_path)
-            else:
-                opener = 'open' if sys.platform == 'darwin' else 'xdg-open'
-                subprocess.call([opener, img_path])
+        # 保存缩略图，全分辨率图按需或后台渲染
+        rendered = figure_renderer.save(fig, full_resolution)
+        img_path = rendered["plot_path"]
+        
+        # 在Windows下打开图片
+        if os.name == 'nt':
+            os.startfile(img_path)
+        else:
+            opener = 'open' if sys.platform == 'darwin' else 'xdg-open'
+            subprocess.call([opener, img_path])
             
         # 统计台站数量
         station_count = sum(len(net) for net in inventory)
             
         return {
             "status": "success",
-            "plot_path": img_path,
+            **rendered,
             "map_type": map_type,
             "station_count": station_count,
             "network": network,
@@ -3,6 +3,7 @@ from langgraph.graph import StateGraph, END, START
 from .state import PhaseDetectionState
 from .nodes import llm_node, create_tool_node, output_node
 from .tool_registry import get_tools
+from .tools import model_manager
 
 def get_graph():
     """构建震相拾取与事件检测 LangGraph Agent"""
@@ -43,6 +44,8 @@ def get_graph():
 
 def build_agent():
     """构建震相拾取与事件检测 LangGraph Agent"""
+    # 后台预加载常用模型，首次拾取请求无需等待模型加载
+    model_manager.preload()
     return get_graph().compile()
 
 # 确保导出build_agent函数
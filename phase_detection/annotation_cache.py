@@ -0,0 +1,168 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+from obspy import Stream, Trace, UTCDateTime
+
+from config.paths import get_cache_dir
+
+logger = logging.getLogger(__name__)
+
+# 磁盘缓存上限(MB)，超出时删除最早写入的条目
+DISK_BUDGET_ENV = "PHASE_DETECTION_ANNOTATION_CACHE_MB"
+DEFAULT_DISK_BUDGET_MB = 1024
+
+# 缓存键版本：模型输入的规范化方式（间断合并等）变化时递增，使旧的标注结果失效
+KEY_VERSION = 2
+
+
+def weights_version(model, weights: str) -> str:
+    """预训练权重标识：权重名称 + SeisBench 记录的版本号"""
+    version = getattr(model, "weights_version", None) or getattr(model, "_weights_version", None)
+    if version is None:
+        metadata = getattr(model, "_weights_metadata", None) or {}
+        version = metadata.get("version", "latest")
+    return f"{weights}:{version}"
+
+
+def save_annotations(annotations, path: str):
+    """把标注 Stream 保存为 NPZ：各道概率数组 + JSON 头信息"""
+    header = []
+    arrays = {}
+    for i, tr in enumerate(annotations):
+        header.append({
+            "network": tr.stats.network,
+            "station": tr.stats.station,
+            "location": tr.stats.location,
+            "channel": tr.stats.channel,
+            "starttime": str(tr.stats.starttime),
+            "sampling_rate": float(tr.stats.sampling_rate),
+        })
+        arrays[f"trace_{i}"] = np.asarray(tr.data, dtype=np.float32)
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, header=np.array(json.dumps(header)), **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_annotations(path: str) -> Stream:
+    """读取 save_annotations 保存的标注 Stream"""
+    with np.load(path) as npz:
+        header = json.loads(str(npz["header"]))
+        traces = []
+        for i, stats in enumerate(header):
+            stats = dict(stats, starttime=UTCDateTime(stats["starttime"]))
+            traces.append(Trace(data=npz[f"trace_{i}"], header=stats))
+    return Stream(traces)
+
+
+class AnnotationCache:
+    """模型概率曲线(annotate 输出)缓存
+
+    键为 (波形内容哈希, 模型名称, 预训练权重版本, 预处理指纹)。内存中按LRU保留最近的结果，
+    同时写入磁盘缓存目录，进程重启后或其他工具调用同一数据时可直接复用，不再运行模型。
+    缓存的 Stream 不应被修改。
+    """
+
+    def __init__(self, max_entries: int = 8, cache_dir: Optional[str] = None, disk_budget_mb: Optional[float] = None):
+        self.max_entries = max_entries
+        self._cache_dir = cache_dir
+        if disk_budget_mb is None:
+            disk_budget_mb = float(os.environ.get(DISK_BUDGET_ENV, DEFAULT_DISK_BUDGET_MB))
+        self.disk_budget = int(disk_budget_mb * 1024 * 1024)
+        self._memory: "OrderedDict[str, Stream]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        # 为 False 时不读写缓存（基准测试需要每次都运行模型）
+        self.enabled = True
+
+    @property
+    def cache_dir(self) -> str:
+        if self._cache_dir is None:
+            self._cache_dir = get_cache_dir("annotations")
+        return self._cache_dir
+
+    @staticmethod
+    def make_key(waveform_hash: str, model_name: str, weights: str, preprocessing: Optional[str] = None) -> str:
+        raw = json.dumps([KEY_VERSION, waveform_hash, model_name.lower(), weights, preprocessing or ""])
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, key: str) -> Optional[Stream]:
+        """查询缓存的标注结果，未命中返回 None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            annotations = self._memory.get(key)
+            if annotations is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return annotations
+
+        path = self._path(key)
+        if os.path.exists(path):
+            try:
+                annotations = load_annotations(path)
+            except Exception as e:
+                logger.warning(f"读取标注缓存失败 {path}: {e}")
+            else:
+                with self._lock:
+                    self.stats["disk_hits"] += 1
+                self._remember(key, annotations)
+                return annotations
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, key: str, annotations: Stream):
+        """缓存标注结果（内存 + 磁盘）"""
+        if not self.enabled:
+            return
+        self._remember(key, annotations)
+        try:
+            save_annotations(annotations, self._path(key))
+            self._prune_disk()
+        except Exception as e:
+            logger.warning(f"写入标注缓存失败: {e}")
+
+    def _remember(self, key: str, annotations: Stream):
+        with self._lock:
+            self._memory[key] = annotations
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _prune_disk(self):
+        """磁盘缓存超出预算时删除最早写入的条目"""
+        if self.disk_budget <= 0:
+            return
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npz"):
+                path = os.path.join(self.cache_dir, name)
+                info = os.stat(path)
+                entries.append((info.st_mtime, info.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_budget:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def cache_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "memory_entries": len(self._memory)}
+
+
+# 全局标注缓存，供各拾取工具共享
+annotation_cache = AnnotationCache()
@@ -0,0 +1,433 @@
+import csv
+import logging
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+from obspy import UTCDateTime
+
+logger = logging.getLogger(__name__)
+
+# 均匀速度模型默认值(km/s)
+DEFAULT_VP = 6.0
+DEFAULT_VS = DEFAULT_VP / 1.73
+DEFAULT_DEPTHS_KM = (0.0, 5.0, 10.0, 15.0, 20.0, 30.0)
+
+# 每度纬度对应的距离(km)
+KM_PER_DEGREE = 111.19
+
+PHASE_INDEX = {"P": 0, "S": 1}
+
+# 事件表列名
+EVENT_TABLE_FIELDS = ["event_id", "origin_time", "latitude", "longitude", "depth_km",
+                      "picks_count", "stations_count", "p_count", "s_count", "rms_residual"]
+
+
+def station_coordinates(inventory) -> Dict[str, Tuple[float, float, float]]:
+    """从台站清单提取坐标 (纬度, 经度, 高程m)
+
+    键为 network.station.location（与拾取表 trace_id 一致），同时提供 network.station 作为后备。
+    """
+    coords = {}
+    for net in inventory:
+        for sta in net:
+            station_key = f"{net.code}.{sta.code}"
+            coords.setdefault(station_key, (sta.latitude, sta.longitude, sta.elevation or 0.0))
+            for cha in sta:
+                lat = cha.latitude if cha.latitude is not None else sta.latitude
+                lon = cha.longitude if cha.longitude is not None else sta.longitude
+                elev = cha.elevation if cha.elevation is not None else (sta.elevation or 0.0)
+                coords.setdefault(f"{station_key}.{cha.location_code}", (lat, lon, elev))
+    return coords
+
+
+def read_pick_tables(paths: Sequence[str]) -> List[Dict[str, Any]]:
+    """读取 DetectPhasesBatch / DetectPhasesContinuous 输出的 CSV 拾取表"""
+    picks = []
+    for path in paths:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row.get("phase") not in PHASE_INDEX or not row.get("time"):
+                    continue
+                row["probability"] = float(row.get("probability") or 1.0)
+                picks.append(row)
+    return picks
+
+
+def _distances(points: np.ndarray, stations: np.ndarray) -> np.ndarray:
+    """点到台站的直线距离 (点数, 台站数)"""
+    diff = points[:, None, :] - stations[None, :, :]
+    return np.sqrt(np.einsum("ijk,ijk->ij", diff, diff))
+
+
+class TravelTimeGrid:
+    """台站 x 网格节点的 P/S 走时表（均匀速度模型）
+
+    网格覆盖台站范围并向外扩展 margin_km，水平间距自动放大以保证节点数不超过 max_nodes。
+    走时数组形状为 (节点数, 台站数, 2)，关联时按拾取的台站/震相直接索引。
+    """
+
+    def __init__(self, station_ids: List[str], coords: Dict[str, Tuple[float, float, float]],
+                 vp: float = DEFAULT_VP, vs: float = DEFAULT_VS, spacing_km: float = 5.0,
+                 depths_km: Sequence[float] = DEFAULT_DEPTHS_KM, margin_km: float = 20.0,
+                 max_nodes: int = 3000):
+        if vp <= 0 or vs <= 0:
+            raise ValueError("vp 和 vs 必须大于0")
+        self.station_ids = list(station_ids)
+        self.velocities = np.array([vp, vs], dtype=np.float64)
+        latlon = np.array([coords[s][:2] for s in self.station_ids], dtype=np.float64)
+        self.lat0, self.lon0 = latlon.mean(axis=0)
+        self.km_per_lon = KM_PER_DEGREE * np.cos(np.radians(self.lat0))
+
+        # 台站局部坐标(km)，z 向下为正
+        self.station_xyz = np.column_stack([
+            (latlon[:, 1] - self.lon0) * self.km_per_lon,
+            (latlon[:, 0] - self.lat0) * KM_PER_DEGREE,
+            [-coords[s][2] / 1000.0 for s in self.station_ids],
+        ])
+
+        depths = np.asarray(sorted(depths_km) or [0.0], dtype=np.float64)
+        lo = self.station_xyz[:, :2].min(axis=0) - margin_km
+        hi = self.station_xyz[:, :2].max(axis=0) + margin_km
+        extent = hi - lo
+        max_horizontal = max(1, max_nodes // len(depths))
+        spacing = max(spacing_km, float(np.sqrt(extent[0] * extent[1] / max_horizontal)))
+        xs = np.arange(lo[0], hi[0] + spacing / 2, spacing)
+        ys = np.arange(lo[1], hi[1] + spacing / 2, spacing)
+        gx, gy, gz = np.meshgrid(xs, ys, depths, indexing="ij")
+        self.nodes = np.column_stack([gx.ravel(), gy.ravel(), gz.ravel()])
+        self.spacing_km = spacing
+        self.depth_step_km = float(np.diff(depths).min()) if len(depths) > 1 else 5.0
+        self.tt = self.travel_times(self.nodes).astype(np.float32)
+        self.max_travel_time = float(self.tt.max())
+
+    def travel_times(self, points: np.ndarray, station_idx: Optional[np.ndarray] = None,
+                     phase_idx: Optional[np.ndarray] = None) -> np.ndarray:
+        """计算走时
+
+        未指定 station_idx 时返回 (点数, 台站数, 2)；指定时返回每个点到对应拾取的走时 (点数, 拾取数)。
+        """
+        if station_idx is None:
+            return _distances(points, self.station_xyz)[:, :, None] / self.velocities[None, None, :]
+        return _distances(points, self.station_xyz[station_idx]) / self.velocities[phase_idx][None, :]
+
+    def to_geographic(self, point: np.ndarray) -> Tuple[float, float, float]:
+        """局部坐标转换为 (纬度, 经度, 深度km)"""
+        return (float(self.lat0 + point[1] / KM_PER_DEGREE),
+                float(self.lon0 + point[0] / self.km_per_lon),
+                float(point[2]))
+
+    def refine(self, point: np.ndarray, station_idx: np.ndarray, phase_idx: np.ndarray,
+               times: np.ndarray, refine_levels: int = 4) -> Tuple[np.ndarray, float, float]:
+        """在给定位置周围逐级缩小的细网格上搜索发震时刻离散度最小的位置
+
+        Returns:
+            (位置, 发震时刻, 残差均方根)
+        """
+        best_point = point
+        scale = np.array([self.spacing_km / 2, self.spacing_km / 2, self.depth_step_km / 2])
+        z_min = self.nodes[:, 2].min()
+        # 距离平方按 |p|^2 - 2 p.s + |s|^2 展开，每级只需一次矩阵乘法
+        stations = self.station_xyz[station_idx]
+        station_norm = (stations ** 2).sum(axis=1)
+        slowness = 1.0 / self.velocities[phase_idx]
+        for _ in range(refine_levels):
+            points = best_point + REFINE_OFFSETS * scale
+            points[:, 2] = np.maximum(points[:, 2], z_min)
+            squared = (points ** 2).sum(axis=1)[:, None] - 2.0 * points @ stations.T + station_norm
+            origins = times - np.sqrt(np.maximum(squared, 0.0)) * slowness
+            origins -= origins.mean(axis=1, keepdims=True)
+            best = int(np.argmin(np.einsum("ij,ij->i", origins, origins)))
+            best_point = points[best]
+            scale = scale / 2
+        origins = times - _distances(best_point[None, :], stations)[0] * slowness
+        return best_point, float(origins.mean()), float(origins.std())
+
+
+# 细网格定位的相对偏移（每级 3x3x3 个点，逐级减半）
+REFINE_OFFSETS = np.stack(np.meshgrid(*[np.array([-1.0, 0.0, 1.0])] * 3, indexing="ij"), axis=-1).reshape(-1, 3)
+
+# 每个搜索窗口包含的最大走时个数；窗口越长，预读区间内被重复搜索的事件比例越小
+SEARCH_WINDOWS = 8
+
+# 粗网格节点数为细网格的 1/COARSE_NODE_RATIO，粗网格只用于叠加计数，事件位置在细网格上确定
+COARSE_NODE_RATIO = 8
+
+
+class CoarseStack:
+    """粗网格发震时刻叠加
+
+    每个细网格节点归属最近的粗网格节点，slack 为细节点与其粗节点之间走时差的最大值。
+    粗网格上按 tolerance + slack 的宽窗口计数，保证真实事件所在细节点的全部一致拾取
+    都落入其粗节点的计数窗口；候选 (粗节点, 时刻) 再在邻近的细节点上精确计数。
+    """
+
+    def __init__(self, grid: TravelTimeGrid, coords: Dict[str, Tuple[float, float, float]], tolerance: float,
+                 max_nodes: int):
+        vp, vs = grid.velocities
+        self.coarse = TravelTimeGrid(grid.station_ids, coords, vp=vp, vs=vs, spacing_km=grid.spacing_km * 2,
+                                     depths_km=np.unique(grid.nodes[:, 2]),
+                                     max_nodes=max(1, max_nodes // COARSE_NODE_RATIO))
+        d = ((grid.nodes[:, None, :] - self.coarse.nodes[None, :, :]) ** 2).sum(axis=-1)
+        self.assign = np.argmin(d, axis=1)
+        self.slack = float(np.abs(grid.tt - self.coarse.tt[self.assign]).max())
+        # 求和的直方图格数：中心格两侧各覆盖 tolerance + slack
+        self.width = 2 * int(np.ceil((tolerance + self.slack) / tolerance)) + 1
+        # 相邻粗节点（水平距离不超过 1.5 个粗网格间距，所有深度），候选细节点取自这些粗节点
+        horizontal = self.coarse.nodes[:, None, :2] - self.coarse.nodes[None, :, :2]
+        self.neighbors = np.sqrt((horizontal ** 2).sum(axis=-1)) <= 1.5 * self.coarse.spacing_km + 1e-6
+
+    def fine_nodes(self, coarse_nodes: np.ndarray) -> np.ndarray:
+        """候选粗节点及其相邻粗节点所辖的细节点"""
+        near = self.neighbors[coarse_nodes].any(axis=0)
+        return np.flatnonzero(near[self.assign])
+
+
+def _origin_bins(rel_times, rows, tt_rows, n_bins) -> np.ndarray:
+    """各拾取在各网格节点上反推的发震时刻所在的直方图格（展平为 节点 * n_bins + 格号）
+
+    rel_times 为以 tolerance 为单位、相对窗口起点的拾取时刻；tt_rows 为同单位的走时表，
+    按 (台站 * 2 + 震相, 节点) 存放，rows 为各拾取对应的行号。落在 [0, n_bins) 之外的丢弃。
+    """
+    n_nodes = tt_rows.shape[1]
+    bins = rel_times.astype(np.float32)[:, None] - tt_rows[rows]
+    np.floor(bins, out=bins)
+    valid = (bins >= 0) & (bins < n_bins)
+    bins += np.arange(n_nodes, dtype=np.float32) * n_bins
+    return bins[valid].astype(np.int64)
+
+
+def _window_sums(hist: np.ndarray, width: int) -> np.ndarray:
+    """直方图每行连续 width 格之和"""
+    cumulative = np.zeros((hist.shape[0], hist.shape[1] + 1), dtype=np.int32)
+    np.cumsum(hist, axis=1, out=cumulative[:, 1:])
+    return cumulative[:, width:] - cumulative[:, :-width]
+
+
+def _densest_window(origins: np.ndarray, width: float) -> Tuple[int, float, int]:
+    """找出各节点反推发震时刻中长度为 width 的窗口内拾取最多的 (节点行, 窗口起点, 拾取数)
+
+    origins 形状为 (节点数, 拾取数)。发震时刻按 width / 4 分格，一次 bincount 得到
+    各节点的直方图，连续 4 格求和即为各窗口的计数。
+    """
+    n_nodes = origins.shape[0]
+    step = width / 4
+    low = origins.min()
+    bins = ((origins - low) * (1.0 / step)).astype(np.int32)
+    n_bins = int(bins.max()) + 4
+    bins += (np.arange(n_nodes, dtype=np.int32) * n_bins)[:, None]
+    hist = np.bincount(bins.ravel(), minlength=n_nodes * n_bins).reshape(n_nodes, n_bins)
+    counts = hist[:, :-3] + hist[:, 1:-2] + hist[:, 2:-1] + hist[:, 3:]
+    best = int(np.argmax(counts))
+    row, j = divmod(best, counts.shape[1])
+    return row, float(low + j * step), int(counts.flat[best])
+
+
+def _dedupe(members: np.ndarray, station_idx, phase_idx, residual) -> np.ndarray:
+    """同一台站同一震相只保留残差最小的拾取"""
+    order = members[np.argsort(np.abs(residual[members]))]
+    _, first = np.unique(station_idx[order] * 2 + phase_idx[order], return_index=True)
+    return np.sort(order[first])
+
+
+def parse_pick_times(picks: List[Dict[str, Any]]) -> Tuple[UTCDateTime, np.ndarray]:
+    """把 ISO 格式的拾取时间批量转换为相对最早拾取的秒数"""
+    stamps = np.array([p["time"].rstrip("Z") for p in picks], dtype="datetime64[us]")
+    first = stamps.min()
+    return UTCDateTime(str(first)), (stamps - first).astype(np.float64) / 1e6
+
+
+def associate_picks(picks: List[Dict[str, Any]], coords: Dict[str, Tuple[float, float, float]],
+                    vp: float = DEFAULT_VP, vs: float = DEFAULT_VS, grid_spacing_km: float = 5.0,
+                    depths_km: Optional[Sequence[float]] = None, tolerance: float = 1.0,
+                    min_picks: int = 4, min_stations: int = 3,
+                    max_nodes: int = 3000) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """把多台站拾取关联为地震事件（走时表网格搜索）
+
+    按发震时刻把时间轴划分为长度为 SEARCH_WINDOWS 个最大走时的窗口。每个窗口先在粗网格上对各拾取
+    反推的发震时刻做直方图叠加，取一致拾取最多的 (粗节点, 时刻)；再在其邻近的细网格
+    节点上精确计数、细网格定位，归入残差不超过 tolerance 的拾取，从直方图中减去这些
+    拾取后继续搜索。叠加的计算量为 拾取数 x 粗节点数，每天数十万拾取可在数秒内完成。
+
+    Returns:
+        (事件列表, 统计信息)
+    """
+    if tolerance <= 0:
+        raise ValueError("tolerance 必须大于0")
+
+    stats = {"input_picks": len(picks), "missing_station_picks": 0, "windows": 0}
+    keyed = []
+    for pick in picks:
+        trace_id = pick["trace_id"]
+        key = trace_id if trace_id in coords else ".".join(trace_id.split(".")[:2])
+        if key not in coords:
+            stats["missing_station_picks"] += 1
+            continue
+        keyed.append((key, pick))
+    if not keyed:
+        return [], {**stats, "associated_picks": 0, "unassociated_picks": 0}
+
+    station_ids = sorted({key for key, _ in keyed})
+    station_pos = {key: i for i, key in enumerate(station_ids)}
+    grid = TravelTimeGrid(station_ids, coords, vp=vp, vs=vs, spacing_km=grid_spacing_km,
+                          depths_km=depths_km or DEFAULT_DEPTHS_KM, max_nodes=max_nodes)
+    stack = CoarseStack(grid, coords, tolerance, max_nodes)
+    stats.update({"stations": len(station_ids), "grid_nodes": len(grid.nodes),
+                  "grid_spacing_km": round(grid.spacing_km, 2), "coarse_nodes": len(stack.coarse.nodes)})
+
+    t_ref, times = parse_pick_times([p for _, p in keyed])
+    order = np.argsort(times, kind="stable")
+    keyed = [keyed[i] for i in order]
+    times = times[order]
+    station_idx = np.array([station_pos[key] for key, _ in keyed], dtype=np.int64)
+    phase_idx = np.array([PHASE_INDEX[p["phase"]] for _, p in keyed], dtype=np.int64)
+    rows = station_idx * 2 + phase_idx
+    # 每行为一个 (台站, 震相) 到所有节点的走时，按拾取取行时内存连续
+    n_coarse = len(stack.coarse.nodes)
+    coarse_rows = np.ascontiguousarray((stack.coarse.tt / tolerance).reshape(n_coarse, -1).T, dtype=np.float32)
+    coarse_tt = stack.coarse.tt.reshape(n_coarse, -1)
+    fine_tt = grid.tt.reshape(len(grid.nodes), -1)
+
+    # 发震时刻窗口：每个拾取对应的发震时刻落在 [t - 最大走时, t]，只处理拾取足够的窗口。
+    # 每个窗口长 SEARCH_WINDOWS 个最大走时，另向后多搜索一个最大走时作为预读
+    max_tt = grid.max_travel_time
+    window = max(max_tt, 2 * tolerance)
+    span = SEARCH_WINDOWS * window
+    t0 = -max_tt
+    first = np.floor(times / span).astype(np.int64)
+    last = np.floor((times - t0) / span).astype(np.int64)
+    window_counts = np.bincount(first, minlength=last.max() + 1) + np.bincount(last, minlength=last.max() + 1)
+    candidates = np.flatnonzero(window_counts >= min_picks)
+
+    width = stack.width
+    used = np.zeros(len(times), dtype=bool)
+    events = []
+    for k in candidates:
+        # 同时搜索预读区间 [hi, hi + window) 的发震时刻：若最优事件属于预读区间，
+        # 暂时排除其拾取（由下一窗口关联），避免它的部分拾取在本窗口被误关联为虚假事件
+        lo, hi = t0 + k * span, t0 + (k + 1) * span
+        i0 = np.searchsorted(times, lo)
+        i1 = np.searchsorted(times, hi + window + max_tt + stack.slack + tolerance, side="right")
+        idx = np.arange(i0, i1)[~used[i0:i1]]
+        if len(idx) < min_picks:
+            continue
+        stats["windows"] += 1
+
+        base = lo - (width // 2 + 1) * tolerance
+        n_bins = int(np.ceil((hi + window - base) / tolerance)) + width
+        starts = base + np.arange(n_bins - width + 1) * tolerance
+        centers = starts + width * tolerance / 2
+        hist = np.bincount(_origin_bins((times[idx] - base) / tolerance, rows[idx], coarse_rows, n_bins),
+                           minlength=n_coarse * n_bins).astype(np.int32).reshape(n_coarse, n_bins)
+        counts = _window_sums(hist, width)
+        # 失败的候选在减去其他事件的拾取后只会更少，整个窗口内不再重复尝试
+        rejected = np.zeros(counts.shape, dtype=bool)
+        rejected[:, (centers < lo) | (centers >= hi + window)] = True
+        counts[rejected] = 0
+
+        while len(idx) >= min_picks:
+            found = None
+            while True:
+                best = int(np.argmax(counts))
+                top = counts.flat[best]
+                if top < min_picks:
+                    break
+                j = best % counts.shape[1]
+                tied = counts[:, j] >= top
+                cluster = (tied, slice(max(0, j - width // 2), j + width // 2 + 1))
+                counts[cluster] = 0
+                rejected[cluster] = True
+                # 候选拾取：在并列最高的粗节点上计入该窗口的拾取；候选节点：这些粗节点附近的细节点
+                lo_t, hi_t = starts[j], starts[j] + width * tolerance
+                sub = np.arange(np.searchsorted(times[idx], lo_t), np.searchsorted(times[idx], hi_t + max_tt, "right"))
+                coarse_origins = times[idx][sub][None, :] - coarse_tt[np.ix_(np.flatnonzero(tied), rows[idx][sub])]
+                sub = sub[((coarse_origins >= lo_t) & (coarse_origins < hi_t)).any(axis=0)]
+                if len(sub) < min_picks:
+                    continue
+                # 并列的粗节点中取发震时刻最集中（3 格窗口计数最多）的，在其附近的细节点上精确计数
+                tied_nodes = np.flatnonzero(tied)
+                narrow = _window_sums(hist[tied_nodes, j:j + width], 3).max(axis=1)
+                nodes = stack.fine_nodes(tied_nodes[narrow == narrow.max()])
+                origins = times[idx][sub][None, :] - fine_tt[np.ix_(nodes, rows[idx][sub])]
+                row, origin_start, count = _densest_window(origins, 2 * tolerance)
+                if count < min_picks:
+                    continue
+                node = nodes[row]
+                local = sub[(origins[row] >= origin_start) & (origins[row] <= origin_start + 2 * tolerance)]
+                residual = times[idx] - fine_tt[node, rows[idx]] - (origin_start + tolerance)
+                local = _dedupe(local, station_idx[idx], phase_idx[idx], residual)
+                if len(local) < min_picks:
+                    continue
+                # 在细网格上定位后，把窗口内残差不超过 tolerance 的拾取全部归入该事件
+                point, origin, rms = grid.refine(grid.nodes[node], station_idx[idx][local], phase_idx[idx][local],
+                                                 times[idx][local], refine_levels=3)
+                predicted = grid.travel_times(point[None, :], station_idx[idx], phase_idx[idx])[0]
+                residual = times[idx] - origin - predicted
+                local = _dedupe(np.flatnonzero(np.abs(residual) <= tolerance), station_idx[idx], phase_idx[idx],
+                                residual)
+                if len(local) >= min_picks and len(np.unique(station_idx[idx][local])) >= min_stations:
+                    found = local
+                    break
+            if found is None:
+                break
+
+            # 成功的候选重新参与计数：只更新这些拾取影响到的计数列
+            members = idx[found]
+            node_of, columns = np.divmod(_origin_bins((times[members] - base) / tolerance, rows[members],
+                                                      coarse_rows, n_bins), n_bins)
+            first_col, n_cols = int(columns.min()), int(columns.max() - columns.min()) + 1
+            hist[:, first_col:first_col + n_cols] -= np.bincount(
+                node_of * n_cols + columns - first_col, minlength=n_coarse * n_cols).reshape(n_coarse, n_cols).astype(np.int32)
+            rejected[cluster] = False
+            rejected[:, (centers < lo) | (centers >= hi + window)] = True
+            c0 = max(0, first_col - width + 1)
+            c1 = min(counts.shape[1], first_col + n_cols)
+            counts[:, c0:c1] = _window_sums(hist[:, c0:c1 + width - 1], width)
+            counts[:, c0:c1][rejected[:, c0:c1]] = 0
+            idx = np.delete(idx, found)
+            if origin >= hi:
+                continue
+
+            point, origin, rms = grid.refine(point, station_idx[members], phase_idx[members], times[members])
+            lat, lon, depth = grid.to_geographic(point)
+            predicted = grid.travel_times(point[None, :], station_idx[members], phase_idx[members])[0]
+            event_picks = []
+            for m, residual in zip(members.tolist(), np.round(times[members] - origin - predicted, 3).tolist()):
+                pick = dict(keyed[m][1])
+                pick["residual"] = residual
+                event_picks.append(pick)
+            events.append({
+                "origin_time": (t_ref + origin).isoformat(),
+                "latitude": round(lat, 4),
+                "longitude": round(lon, 4),
+                "depth_km": round(depth, 2),
+                "picks_count": len(members),
+                "stations_count": int(len(np.unique(station_idx[members]))),
+                "p_count": int((phase_idx[members] == 0).sum()),
+                "s_count": int((phase_idx[members] == 1).sum()),
+                "rms_residual": round(rms, 3),
+                "picks": event_picks,
+            })
+            used[members] = True
+
+    events.sort(key=lambda e: e["origin_time"])
+    for i, event in enumerate(events, 1):
+        event["event_id"] = i
+        for pick in event["picks"]:
+            pick["event_id"] = i
+    stats["associated_picks"] = int(used.sum())
+    stats["unassociated_picks"] = int(len(used) - used.sum())
+    return events, stats
+
+
+def write_event_tables(events: List[Dict[str, Any]], events_path: str, picks_path: str):
+    """写出事件表和拾取归属表(CSV)"""
+    with open(events_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=EVENT_TABLE_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(events)
+    pick_fields = ["event_id", "trace_id", "phase", "time", "probability", "residual", "file"]
+    with open(picks_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=pick_fields, extrasaction="ignore")
+        writer.writeheader()
+        for event in events:
+            writer.writerows(event["picks"])
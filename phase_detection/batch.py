@@ -0,0 +1,149 @@
+import os
+import csv
+import glob
+import bisect
+import logging
+from typing import Dict, Any, List, Tuple, Union
+
+from obspy import Stream
+
+logger = logging.getLogger(__name__)
+
+# 单个批次中最多合并的样本数（约3分量100Hz一天的数据量），超过后先执行一次推理
+DEFAULT_MAX_BATCH_SAMPLES = 3 * 100 * 86400
+
+# 拾取表列名
+PICK_TABLE_FIELDS = ["file", "trace_id", "phase", "time", "probability", "start_time", "end_time"]
+
+
+def resolve_waveform_files(waveform_files: Union[str, List[str]]) -> Tuple[List[str], List[str]]:
+    """把文件列表或通配符模式展开为文件路径列表
+
+    Returns:
+        (存在的文件路径列表, 未匹配到任何文件的条目列表)
+    """
+    if isinstance(waveform_files, str):
+        waveform_files = [p.strip() for p in waveform_files.split(",") if p.strip()]
+
+    files, unmatched = [], []
+    seen = set()
+    for entry in waveform_files:
+        matches = sorted(glob.glob(entry)) if glob.has_magic(entry) else ([entry] if os.path.exists(entry) else [])
+        if not matches:
+            unmatched.append(entry)
+        for path in matches:
+            if os.path.isfile(path) and path not in seen:
+                seen.add(path)
+                files.append(path)
+    return files, unmatched
+
+
+def station_key(trace) -> str:
+    """台站仪器标识 network.station.location，与拾取结果的 trace_id 一致"""
+    return f"{trace.stats.network}.{trace.stats.station}.{trace.stats.location}"
+
+
+def group_by_station(st) -> Dict[str, List]:
+    """按台站分组，保持道在 Stream 中的先后顺序"""
+    groups: Dict[str, List] = {}
+    for tr in st:
+        groups.setdefault(station_key(tr), []).append(tr)
+    return groups
+
+
+def channel_spans(st) -> Dict[str, Tuple[float, float]]:
+    """各通道(network.station.location.channel)在 Stream 中覆盖的时间范围（时间戳）"""
+    spans = {}
+    for tr in st:
+        start, end = float(tr.stats.starttime.timestamp), float(tr.stats.endtime.timestamp)
+        if tr.id in spans:
+            start, end = min(start, spans[tr.id][0]), max(end, spans[tr.id][1])
+        spans[tr.id] = (start, end)
+    return spans
+
+
+class PickBatch:
+    """把多个文件、多个台站的波形合并为一次 annotate 调用的批次
+
+    annotate 按台站分组，所有台站的窗口在同一批次中共享模型前向计算。同一台站
+    不同分量的文件（每个分量一个文件）合并为同一台站组；只有同一通道的时间段
+    互相重叠时不能合并（标注会互相覆盖），需先执行当前批次。
+    """
+
+    def __init__(self, max_samples: int = DEFAULT_MAX_BATCH_SAMPLES):
+        self.max_samples = max_samples
+        self.stream = Stream()
+        self.samples = 0
+        self.files = 0
+        # 通道 -> (起始, 结束) 列表，用于检查重叠
+        self._channels: Dict[str, List[Tuple[float, float]]] = {}
+        # 台站 -> 按起始时间排序的 (起始, 结束, 文件) 列表，用于拾取归属
+        self._spans: Dict[str, List[Tuple[float, float, str]]] = {}
+
+    def __len__(self):
+        return self.files
+
+    @property
+    def stations(self) -> List[str]:
+        return sorted(self._spans)
+
+    def can_add(self, st, spans: Dict[str, Tuple[float, float]]) -> bool:
+        if len(self) == 0:
+            return True
+        if self.samples + sum(tr.stats.npts for tr in st) > self.max_samples:
+            return False
+        for channel, (start, end) in spans.items():
+            for other_start, other_end in self._channels.get(channel, []):
+                if start <= other_end and other_start <= end:
+                    return False
+        return True
+
+    def add(self, path: str, st, spans: Dict[str, Tuple[float, float]]):
+        self.stream += st
+        self.samples += sum(tr.stats.npts for tr in st)
+        self.files += 1
+        for channel, (start, end) in spans.items():
+            self._channels.setdefault(channel, []).append((start, end))
+            bisect.insort(self._spans.setdefault(channel.rsplit(".", 1)[0], []), (start, end, path))
+
+    def source_file(self, trace_id: str, timestamp: float) -> str:
+        """查找拾取所属的文件：同一台站中时间范围包含该拾取（或距离最近）的文件"""
+        spans = self._spans.get(trace_id)
+        if not spans:
+            return ""
+        i = bisect.bisect_right(spans, (timestamp, float("inf"), "")) - 1
+        candidates = [spans[j] for j in (i, i + 1) if 0 <= j < len(spans)]
+        best = min(candidates, key=lambda s: 0.0 if s[0] <= timestamp <= s[1]
+                   else min(abs(timestamp - s[0]), abs(timestamp - s[1])))
+        return best[2]
+
+
+class PickTableWriter:
+    """逐批追加写入 CSV 拾取表，每批写入后立即刷新到磁盘"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows_written = 0
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=PICK_TABLE_FIELDS, extrasaction="ignore")
+        self._writer.writeheader()
+
+    def write(self, rows: List[Dict[str, Any]]):
+        self._writer.writerows(rows)
+        self._file.flush()
+        self.rows_written += len(rows)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_pick_table(rows: List[Dict[str, Any]], path: str):
+    """把拾取结果写为 CSV 表"""
+    with PickTableWriter(path) as writer:
+        writer.write(rows)
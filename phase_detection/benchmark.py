@@ -0,0 +1,383 @@
+"""震相拾取性能基准测试
+
+用合成的（或指定的）三分量波形分别测试各模型的单文件拾取(DetectAndPlotPhases)、
+批量拾取(DetectPhasesBatch)和连续分块拾取(DetectPhasesContinuous)，记录吞吐量、
+每个窗口的耗时、峰值内存和模型加载时间，结果追加写入 JSONL 文件，并与相同配置的
+上一次结果比较以发现性能回退。
+
+用法:
+    python -m phase_detection.benchmark --models PhaseNet EQTransformer --duration 3600 --stations 4
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+from obspy import Stream, Trace, UTCDateTime, read
+
+from config.paths import get_cache_dir
+from .annotation_cache import annotation_cache
+from .pick_catalog import pick_catalog
+from .batch import group_by_station
+from .tools import (model_manager, variant_key, inference_variant, detect_and_plot_phases,
+                    detect_phases_batch, detect_phases_continuous)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_PATHS = ("single", "batch", "stream")
+DEFAULT_MODELS = ("PhaseNet", "EQTransformer")
+
+# 吞吐量下降或峰值内存增加超过该比例时视为回退
+DEFAULT_REGRESSION_THRESHOLD = 0.10
+
+
+def default_results_path() -> str:
+    return os.path.join(get_cache_dir("benchmarks"), "phase_detection.jsonl")
+
+
+def synthetic_stream(duration: float, stations: int, sampling_rate: float = 100.0,
+                     events_per_hour: float = 6.0, seed: int = 0,
+                     starttime: UTCDateTime = UTCDateTime(2024, 1, 1)) -> Stream:
+    """生成多台站三分量合成波形：白噪声背景 + 随机事件的 P/S 衰减波列"""
+    rng = np.random.default_rng(seed)
+    npts = int(duration * sampling_rate)
+    n_events = max(1, int(round(duration / 3600.0 * events_per_hour)))
+    origins = rng.uniform(0, max(duration - 120.0, 1.0), n_events)
+    st = Stream()
+    for i in range(stations):
+        distances = rng.uniform(10.0, 150.0, n_events)
+        data = rng.normal(0.0, 1.0, (3, npts)).astype(np.float32)
+        for origin, distance in zip(origins, distances):
+            amplitude = rng.uniform(3.0, 30.0)
+            # P 波以垂直分量为主，S 波以水平分量为主
+            for arrival, weights, decay in ((origin + distance / 6.0, (1.0, 0.3, 0.3), 2.0),
+                                            (origin + distance / 3.5, (0.4, 1.0, 1.0), 4.0)):
+                start = int(arrival * sampling_rate)
+                length = min(int(8 * decay * sampling_rate), npts - start)
+                if length <= 0:
+                    continue
+                envelope = amplitude * np.exp(-np.arange(length) / (decay * sampling_rate))
+                burst = rng.normal(0.0, 1.0, (3, length)) * envelope
+                data[:, start:start + length] += burst * np.asarray(weights)[:, None]
+        for component, samples in zip("ZNE", data):
+            st += Trace(samples, header={"network": "SY", "station": f"S{i:03d}", "channel": f"HH{component}",
+                                         "sampling_rate": sampling_rate, "starttime": starttime})
+    return st
+
+
+def write_inputs(st: Stream, directory: str) -> Tuple[str, List[str]]:
+    """写出测试输入：整体文件（单文件/连续路径）和每台站一个文件（批量路径）"""
+    combined = os.path.join(directory, "combined.mseed")
+    st.write(combined, format="MSEED")
+    per_station = []
+    for key, traces in group_by_station(st).items():
+        path = os.path.join(directory, f"{key.strip('.').replace('.', '_')}.mseed")
+        Stream(traces).write(path, format="MSEED")
+        per_station.append(path)
+    return combined, per_station
+
+
+def count_windows(model, st: Stream) -> Optional[int]:
+    """估算 annotate 的窗口数：各台站按模型采样率、窗口长度和重叠计算"""
+    in_samples = getattr(model, "in_samples", None)
+    sampling_rate = getattr(model, "sampling_rate", None)
+    if not in_samples or not sampling_rate:
+        return None
+    overlap = (getattr(model, "default_args", None) or {}).get("overlap")
+    if overlap is None:
+        overlap = (getattr(model, "_annotate_args", None) or {}).get("overlap", (None, 0))[1]
+    step = max(1, int(in_samples - (overlap or 0)))
+    windows = 0
+    for traces in group_by_station(st).values():
+        start = min(tr.stats.starttime for tr in traces)
+        end = max(tr.stats.endtime for tr in traces)
+        n = int((end - start) * sampling_rate) + 1
+        windows += 1 + int(np.ceil(max(n - in_samples, 0) / step))
+    return windows
+
+
+def reset_peak_rss() -> bool:
+    """重置进程峰值内存统计（仅 Linux 支持），成功时返回 True"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> Optional[float]:
+    """进程峰值常驻内存(MB)：Linux 读取 VmHWM，其他平台使用 getrusage"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 单位为字节，Linux 为 KB
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def host_info() -> Dict[str, Any]:
+    info = {"platform": platform.platform(), "python": platform.python_version(), "cpu_count": os.cpu_count()}
+    try:
+        import torch
+        info["torch"] = torch.__version__
+        info["torch_threads"] = torch.get_num_threads()
+    except (ImportError, AttributeError):
+        pass
+    return info
+
+
+def run_path(path: str, model_name: str, combined: str, per_station: List[str], precision: str,
+             backend: str, chunk_seconds: float) -> Dict[str, Any]:
+    """执行一次某条拾取路径，返回工具结果"""
+    if path == "single":
+        return detect_and_plot_phases(combined, model_name=model_name, precision=precision, backend=backend)
+    if path == "batch":
+        with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as f:
+            output = f.name
+        try:
+            return detect_phases_batch(per_station, model_name=model_name, output_file=output,
+                                       precision=precision, backend=backend)
+        finally:
+            os.remove(output)
+    if path == "stream":
+        with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as f:
+            output = f.name
+        try:
+            return detect_phases_continuous(combined, model_name=model_name, chunk_seconds=chunk_seconds,
+                                            output_file=output, precision=precision, backend=backend)
+        finally:
+            os.remove(output)
+    raise ValueError(f"不支持的测试路径: {path}, 可用路径: {list(BENCHMARK_PATHS)}")
+
+
+def benchmark_model(model_name: str, st: Stream, combined: str, per_station: List[str],
+                    paths: Sequence[str], repeats: int = 3, precision: str = "fp32", backend: str = "torch",
+                    chunk_seconds: float = 600.0) -> List[Dict[str, Any]]:
+    """对一个模型测试各拾取路径，每条路径取 repeats 次中的最短用时"""
+    key = variant_key(model_name.lower(), inference_variant(precision, backend))
+    cold = model_manager.status(model_name, precision, backend) != "warm"
+    model = model_manager.get_model(model_name, precision, backend)
+    load_seconds = model_manager.load_seconds.get(key)
+    samples = sum(tr.stats.npts for tr in st)
+    windows = count_windows(model, st)
+
+    results = []
+    for path in paths:
+        entry = {"model": model_name, "path": path, "precision": precision, "backend": backend,
+                 "load_seconds": round(load_seconds, 3) if load_seconds is not None else None,
+                 "load_cold": cold, "samples": samples, "windows": windows}
+        timings = []
+        rss_tracked = reset_peak_rss()
+        try:
+            for _ in range(repeats):
+                start = time.perf_counter()
+                outcome = run_path(path, model_name, combined, per_station, precision, backend, chunk_seconds)
+                timings.append(time.perf_counter() - start)
+                if outcome.get("status") != "success":
+                    raise RuntimeError(outcome.get("message"))
+        except Exception as e:
+            logger.error(f"{model_name} {path} 测试失败: {e}")
+            results.append({**entry, "status": "failed", "error": str(e)})
+            continue
+
+        seconds = min(timings)
+        entry.update({
+            "status": "success",
+            "seconds": round(seconds, 4),
+            "mean_seconds": round(float(np.mean(timings)), 4),
+            "samples_per_second": round(samples / seconds, 1) if seconds > 0 else None,
+            "ms_per_window": round(seconds * 1000 / windows, 3) if windows and seconds > 0 else None,
+            "peak_rss_mb": peak_rss_mb(),
+            "peak_rss_scope": "path" if rss_tracked else "process",
+            "picks_count": outcome.get("picks_count"),
+        })
+        results.append(entry)
+    return results
+
+
+def result_key(entry: Dict[str, Any]) -> Tuple:
+    return entry["model"], entry["path"], entry["precision"], entry["backend"]
+
+
+def load_previous(results_path: str, config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """读取相同配置的最近一次基准测试记录"""
+    if not os.path.exists(results_path):
+        return None
+    previous = None
+    with open(results_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("config") == config:
+                previous = record
+    return previous
+
+
+def compare_records(current: List[Dict[str, Any]], previous: Optional[Dict[str, Any]],
+                    threshold: float = DEFAULT_REGRESSION_THRESHOLD) -> List[Dict[str, Any]]:
+    """与上一次记录比较吞吐量和峰值内存，返回每项的变化及是否回退"""
+    if previous is None:
+        return []
+    baseline = {result_key(e): e for e in previous.get("results", []) if e.get("status") == "success"}
+    comparisons = []
+    for entry in current:
+        old = baseline.get(result_key(entry))
+        if old is None or entry.get("status") != "success":
+            continue
+        item = {"model": entry["model"], "path": entry["path"], "precision": entry["precision"],
+                "backend": entry["backend"], "regression": False}
+        if old.get("samples_per_second") and entry.get("samples_per_second"):
+            change = entry["samples_per_second"] / old["samples_per_second"] - 1
+            item["throughput_change"] = round(change, 4)
+            item["regression"] |= change < -threshold
+        if old.get("peak_rss_mb") and entry.get("peak_rss_mb"):
+            change = entry["peak_rss_mb"] / old["peak_rss_mb"] - 1
+            item["peak_rss_change"] = round(change, 4)
+            item["regression"] |= change > threshold
+        comparisons.append(item)
+    return comparisons
+
+
+def run_benchmark(models: Sequence[str] = DEFAULT_MODELS, paths: Sequence[str] = BENCHMARK_PATHS,
+                  duration: float = 3600.0, stations: int = 3, sampling_rate: float = 100.0,
+                  waveform_files: Optional[Sequence[str]] = None, repeats: int = 3, precision: str = "fp32",
+                  backend: str = "torch", chunk_seconds: float = 600.0, seed: int = 0,
+                  results_path: Optional[str] = None,
+                  threshold: float = DEFAULT_REGRESSION_THRESHOLD) -> Dict[str, Any]:
+    """执行基准测试并追加保存结果
+
+    waveform_files 指定时使用这些文件（合并后按台站拆分）作为测试数据，否则生成合成波形。
+    测试期间关闭标注缓存（保证每次都运行模型）和拾取目录（不写入测试拾取）。
+    """
+    for path in paths:
+        if path not in BENCHMARK_PATHS:
+            raise ValueError(f"不支持的测试路径: {path}, 可用路径: {list(BENCHMARK_PATHS)}")
+    if repeats < 1:
+        raise ValueError("repeats 必须大于0")
+
+    if waveform_files:
+        st = Stream()
+        for path in waveform_files:
+            st += read(path)
+        config = {"waveform_files": sorted(os.path.basename(p) for p in waveform_files)}
+    else:
+        st = synthetic_stream(duration, stations, sampling_rate, seed=seed)
+        config = {"duration": duration, "stations": stations, "sampling_rate": sampling_rate, "seed": seed}
+    config["chunk_seconds"] = chunk_seconds
+
+    results_path = results_path or default_results_path()
+    workdir = tempfile.mkdtemp(prefix="phase_benchmark_")
+    cache_enabled, catalog_enabled = annotation_cache.enabled, pick_catalog.enabled
+    annotation_cache.enabled = pick_catalog.enabled = False
+    try:
+        combined, per_station = write_inputs(st, workdir)
+        results = []
+        for model_name in models:
+            try:
+                results.extend(benchmark_model(model_name, st, combined, per_station, paths, repeats,
+                                               precision, backend, chunk_seconds))
+            except Exception as e:
+                logger.error(f"模型 {model_name} 测试失败: {e}")
+                results.append({"model": model_name, "path": None, "precision": precision,
+                                "backend": backend, "status": "failed", "error": str(e)})
+    finally:
+        annotation_cache.enabled, pick_catalog.enabled = cache_enabled, catalog_enabled
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    comparisons = compare_records(results, load_previous(results_path, config), threshold)
+    record = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "host": host_info(),
+        "config": config,
+        "results": results,
+    }
+    with open(results_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return {**record, "comparisons": comparisons, "results_path": results_path}
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """把基准测试结果格式化为文本表格"""
+    changes = {(c["model"], c["path"]): c for c in report.get("comparisons", [])}
+    header = f"{'模型':<14}{'路径':<8}{'样本/秒':>14}{'毫秒/窗口':>12}{'峰值内存MB':>12}{'加载s':>8}  对比上次"
+    lines = [header, "-" * len(header)]
+    for e in report["results"]:
+        if e.get("status") != "success":
+            lines.append(f"{e['model']:<14}{str(e.get('path')):<8}失败: {e.get('error')}")
+            continue
+        c = changes.get((e["model"], e["path"]))
+        note = ""
+        if c and "throughput_change" in c:
+            note = f"{c['throughput_change']:+.1%}" + (" 回退" if c["regression"] else "")
+        lines.append(f"{e['model']:<14}{e['path']:<8}{e['samples_per_second'] or 0:>14,.0f}"
+                     f"{e['ms_per_window'] if e['ms_per_window'] is not None else '-':>12}"
+                     f"{e['peak_rss_mb'] if e['peak_rss_mb'] is not None else '-':>12}"
+                     f"{e['load_seconds'] if e['load_seconds'] is not None else '-':>8}  {note}")
+    lines.append(f"结果已保存: {report['results_path']}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="震相拾取性能基准测试")
+    parser.add_argument("--models", nargs="+", default=list(DEFAULT_MODELS), help="要测试的模型")
+    parser.add_argument("--paths", nargs="+", default=list(BENCHMARK_PATHS), choices=BENCHMARK_PATHS,
+                        help="要测试的拾取路径")
+    parser.add_argument("--duration", type=float, default=3600.0, help="合成波形时长(秒)")
+    parser.add_argument("--stations", type=int, default=3, help="合成波形台站数")
+    parser.add_argument("--sampling-rate", type=float, default=100.0, help="合成波形采样率(Hz)")
+    parser.add_argument("--waveform", nargs="+", default=None, help="使用指定波形文件代替合成波形")
+    parser.add_argument("--repeats", type=int, default=3, help="每条路径的重复次数(取最短用时)")
+    parser.add_argument("--precision", default="fp32", help="推理精度 fp32/bf16/int8")
+    parser.add_argument("--backend", default="torch", help="推理后端 torch/onnx")
+    parser.add_argument("--chunk-seconds", type=float, default=600.0, help="连续拾取分块时长(秒)")
+    parser.add_argument("--seed", type=int, default=0, help="合成波形随机种子")
+    parser.add_argument("--output", default=None, help="结果 JSONL 文件，默认写入缓存目录下的 benchmarks/")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help="判定回退的相对变化阈值")
+    parser.add_argument("--fail-on-regression", action="store_true", help="发现回退时返回非零退出码")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    report = run_benchmark(models=args.models, paths=args.paths, duration=args.duration, stations=args.stations,
+                           sampling_rate=args.sampling_rate, waveform_files=args.waveform, repeats=args.repeats,
+                           precision=args.precision, backend=args.backend, chunk_seconds=args.chunk_seconds,
+                           seed=args.seed, results_path=args.output, threshold=args.threshold)
+    print(format_report(report))
+    regressed = [c for c in report["comparisons"] if c["regression"]]
+    return 1 if regressed and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
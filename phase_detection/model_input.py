@@ -0,0 +1,177 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+import seisbench.models as sbm
+from obspy import Stream, Trace
+
+from .batch import group_by_station
+
+logger = logging.getLogger(__name__)
+
+# 同一通道相邻段的间断不超过该时长(秒)时补值合并为一道，更长的间断保持分段
+DEFAULT_MAX_GAP_SECONDS = 60.0
+
+
+def readonly_view(data: np.ndarray) -> np.ndarray:
+    """共享样本缓冲区的只读视图，误写入时报错而不是悄悄修改原数据"""
+    view = data.view()
+    view.flags.writeable = False
+    return view
+
+
+def expand_single_channel(st):
+    """只有一个通道的台站补齐为三个通道，以满足三分量模型的输入要求
+
+    补出的 N/E 分量是原通道样本数组的只读视图（只复制道头），不占用额外内存。
+    多台站 Stream 按台站分别判断，已有多个分量的台站保持不变。
+    """
+    groups = group_by_station(st)
+    single = [key for key, traces in groups.items() if len({tr.stats.channel for tr in traces}) == 1]
+    if not single:
+        return st
+    new_st = Stream()
+    for key, traces in groups.items():
+        new_st.extend(traces)
+        if key not in single:
+            continue
+        for original_trace in traces:
+            channel = original_trace.stats.channel
+            for suffix in ['N', 'E']:
+                header = original_trace.stats.copy()
+                header.channel = channel[:-1] + suffix if len(channel) >= 3 else channel + suffix
+                new_st += Trace(data=readonly_view(original_trace.data), header=header)
+    logger.info(f"单通道台站扩展为三分量: {single}")
+    return new_st
+
+
+def _contiguous_runs(traces: List, max_gap: float) -> List[List]:
+    """把按开始时间排序的段分成若干组，组内相邻段的间断不超过 max_gap 秒"""
+    runs = [[traces[0]]]
+    end = traces[0].stats.endtime
+    for tr in traces[1:]:
+        if tr.stats.starttime - end > max_gap:
+            runs.append([tr])
+        else:
+            runs[-1].append(tr)
+        end = max(end, tr.stats.endtime)
+    return runs
+
+
+def _merge_run(traces: List, fill_value: float) -> Trace:
+    """合并一组段：按总时间范围分配一次数组，各段直接写入，重叠处以开始较早的段为准"""
+    sampling_rate = traces[0].stats.sampling_rate
+    start = traces[0].stats.starttime
+    offsets = [int(round((tr.stats.starttime - start) * sampling_rate)) for tr in traces]
+    npts = max(offset + tr.stats.npts for offset, tr in zip(offsets, traces))
+    data = np.full(npts, fill_value, dtype=np.result_type(*[tr.data.dtype for tr in traces]))
+    # 倒序写入，重叠处由开始较早的段覆盖
+    for offset, tr in reversed(list(zip(offsets, traces))):
+        data[offset:offset + tr.stats.npts] = np.ma.filled(tr.data, fill_value)
+    header = traces[0].stats.copy()
+    header.npts = npts
+    return Trace(data=data, header=header)
+
+
+def merge_channels(st, fill_value: float = 0.0, max_gap: float = DEFAULT_MAX_GAP_SECONDS) -> Stream:
+    """合并同一通道的间断/重叠段
+
+    间断不超过 max_gap 秒的段合并为一道，间断处填充 fill_value；更长的间断保持分段，
+    避免为相隔很远的数据分配大数组。只有一段的通道原样保留（不复制）。
+    采样率不一致的通道无法合并，保持原样。
+    """
+    channels: Dict[str, List] = {}
+    for tr in st:
+        channels.setdefault(tr.id, []).append(tr)
+    if all(len(traces) == 1 for traces in channels.values()):
+        return st
+
+    merged = Stream()
+    for channel_id, traces in channels.items():
+        if len(traces) == 1:
+            merged.extend(traces)
+            continue
+        if len({tr.stats.sampling_rate for tr in traces}) > 1:
+            logger.warning(f"通道 {channel_id} 各段采样率不一致，不合并")
+            merged.extend(traces)
+            continue
+        runs = _contiguous_runs(sorted(traces, key=lambda tr: tr.stats.starttime), max_gap)
+        for run in runs:
+            merged += run[0] if len(run) == 1 else _merge_run(run, fill_value)
+        if len(runs) < len(traces):
+            logger.info(f"通道 {channel_id} 的 {len(traces)} 段合并为 {len(runs)} 段")
+    return merged
+
+
+def normalize_stream(st, fill_value: float = 0.0) -> Stream:
+    """模型输入规范化：合并间断/重叠的通道，单通道台站补齐三分量（只读视图）
+
+    不产生中间 Stream 副本：无间断的通道和已有三分量的台站直接沿用原数组。
+    """
+    return expand_single_channel(merge_channels(st, fill_value))
+
+
+def stream_views(st) -> Stream:
+    """返回与输入共享样本数组的新 Stream（只复制道头），调用方不应原地修改数据"""
+    return Stream([Trace(data=tr.data, header=tr.stats.copy()) for tr in st])
+
+
+class SharedModelInput:
+    """多个模型共享的输入波形
+
+    同一 Stream 按目标采样率只做一次单通道扩展、重采样和 float32 转换，
+    各模型拿到共享样本数组的视图。重采样使用 SeisBench 自身的规则，
+    annotate 检测到采样率一致后不再重采样，结果与直接输入原始波形一致。
+    窗口归一化方式因模型而异，仍由各模型在 annotate 中完成。
+    """
+
+    def __init__(self, max_entries: int = 4):
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[Tuple[str, float], Stream]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Tuple[str, float], threading.Lock] = {}
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def prepare(st, sampling_rate: float) -> Stream:
+        """合并间断 + 重采样到 sampling_rate + 转为连续 float32 数组 + 单通道扩展
+
+        重采样在只复制道头的视图上进行（ObsPy 重采样生成新数组，不修改原数据）；
+        单通道扩展放在最后，补出的分量与转换后的 float32 数组共享内存。
+        """
+        st = merge_channels(st)
+        if any(tr.stats.sampling_rate != sampling_rate for tr in st):
+            st = stream_views(st)
+            sbm.WaveformModel.resample(st, sampling_rate)
+        prepared = Stream()
+        for tr in st:
+            prepared += Trace(data=np.ascontiguousarray(tr.data, dtype=np.float32), header=tr.stats.copy())
+        return expand_single_channel(prepared)
+
+    def get(self, st, source_key: str, sampling_rate: float) -> Stream:
+        """返回预处理后输入的视图；同一 (数据标识, 采样率) 并发请求只计算一次"""
+        key = (source_key, float(sampling_rate))
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                prepared = self._cache.get(key)
+                if prepared is not None:
+                    self._cache.move_to_end(key)
+                    self.stats["hits"] += 1
+                else:
+                    self.stats["misses"] += 1
+            if prepared is None:
+                prepared = self.prepare(st, sampling_rate)
+                with self._lock:
+                    self._cache[key] = prepared
+                    while len(self._cache) > self.max_entries:
+                        evicted, _ = self._cache.popitem(last=False)
+                        self._key_locks.pop(evicted, None)
+        return stream_views(prepared)
+
+
+# 全局共享输入缓存，供多模型对比使用
+shared_model_input = SharedModelInput()
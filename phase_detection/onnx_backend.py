@@ -0,0 +1,96 @@
+import os
+import re
+import logging
+from typing import Optional
+
+import numpy as np
+import torch
+
+from config.paths import get_cache_dir
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+logger = logging.getLogger(__name__)
+
+# 推理后端：torch 为 SeisBench 原生前向计算；onnx 使用导出的计算图在 ONNX Runtime CPU 上执行
+BACKENDS = ("torch", "onnx")
+
+# 输入长度固定、可直接导出的模型
+ONNX_MODELS = ("phasenet", "eqtransformer")
+
+ONNX_OPSET = 17
+
+
+def validate_backend(backend: Optional[str]) -> str:
+    """规范化推理后端参数"""
+    backend = (backend or "torch").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"不支持的推理后端: {backend}, 可用后端: {list(BACKENDS)}")
+    return backend
+
+
+def onnx_available() -> bool:
+    """是否安装了 onnxruntime"""
+    return ort is not None
+
+
+def onnx_path(model_name: str, weights: str) -> str:
+    """导出计算图的缓存路径，按模型名和权重版本区分"""
+    tag = re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{model_name}_{weights}")
+    return os.path.join(get_cache_dir("onnx"), f"{tag}.onnx")
+
+
+def export_onnx(model, path: str):
+    """把 SeisBench 模型导出为 ONNX，批大小维度可变"""
+    dummy = torch.zeros(1, len(model.component_order), model.in_samples, dtype=torch.float32)
+    tmp_path = path + ".tmp"
+    model.eval()
+    with torch.no_grad():
+        torch.onnx.export(model, dummy, tmp_path, opset_version=ONNX_OPSET,
+                          input_names=["input"], dynamic_axes={"input": {0: "batch"}})
+    os.replace(tmp_path, path)
+    logger.info(f"模型已导出为 ONNX: {path}")
+
+
+class OnnxForward:
+    """用 ONNX Runtime 会话替代模型的 forward，输入输出仍为 torch 张量"""
+
+    def __init__(self, path: str, num_threads: int = 0):
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x, *args, **kwargs):
+        data = np.ascontiguousarray(x.detach().cpu().numpy(), dtype=np.float32)
+        outputs = [torch.from_numpy(o) for o in self.session.run(None, {self.input_name: data})]
+        return outputs[0] if len(outputs) == 1 else tuple(outputs)
+
+
+def attach_onnx(model, model_name: str, weights: str):
+    """让已加载的模型改用 ONNX Runtime 执行前向计算
+
+    首次使用时导出计算图并缓存到磁盘，之后直接加载。annotate/classify 的窗口划分与
+    后处理仍由 SeisBench 完成，因此输出与 torch 后端一致；导出后释放 torch 权重。
+    """
+    if not onnx_available():
+        raise ValueError("ONNX 后端需要安装 onnxruntime")
+    if model_name not in ONNX_MODELS:
+        raise ValueError(f"ONNX 后端暂不支持模型 {model_name}, 可用模型: {list(ONNX_MODELS)}")
+
+    path = onnx_path(model_name, weights)
+    if not os.path.exists(path):
+        export_onnx(model, path)
+
+    model.eval()
+    model.forward = OnnxForward(path)
+    # 权重已包含在 ONNX 计算图中，只保留空张量以便 SeisBench 读取设备与数据类型
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        tensor.data = torch.empty(0, dtype=tensor.dtype)
+    model.backend = "onnx"
+    model.onnx_bytes = os.path.getsize(path)
+    return model
@@ -0,0 +1,296 @@
+import os
+import csv
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+from obspy import UTCDateTime
+
+from config.paths import get_cache_dir
+from .batch import PICK_TABLE_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# 拾取目录数据库路径，默认位于缓存目录 pick_catalog/picks.sqlite
+CATALOG_PATH_ENV = "PHASE_DETECTION_PICK_CATALOG"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    tool TEXT NOT NULL,
+    model TEXT,
+    precision TEXT,
+    backend TEXT,
+    source TEXT,
+    picks_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS picks (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    network TEXT NOT NULL,
+    station TEXT NOT NULL,
+    location TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    time REAL NOT NULL,
+    probability REAL,
+    start_time REAL,
+    end_time REAL,
+    model TEXT NOT NULL COLLATE NOCASE,
+    precision TEXT NOT NULL DEFAULT '',
+    backend TEXT NOT NULL DEFAULT '',
+    source_file TEXT,
+    UNIQUE (network, station, location, phase, time, model, precision, backend)
+);
+CREATE INDEX IF NOT EXISTS idx_picks_station ON picks (station, network, phase, time);
+CREATE INDEX IF NOT EXISTS idx_picks_time ON picks (time);
+CREATE INDEX IF NOT EXISTS idx_picks_probability ON picks (probability);
+"""
+
+PICK_COLUMNS = ["network", "station", "location", "phase", "time", "probability",
+                "start_time", "end_time", "model", "precision", "backend", "source_file", "run_id"]
+
+# 旧版 picks 表（唯一键不含推理精度和后端）迁移到当前结构时复制的列
+LEGACY_PICK_COLUMNS = ["id", "run_id", "network", "station", "location", "phase", "time", "probability",
+                       "start_time", "end_time", "model", "source_file"]
+
+
+def default_catalog_path() -> str:
+    return os.environ.get(CATALOG_PATH_ENV) or os.path.join(get_cache_dir("pick_catalog"), "picks.sqlite")
+
+
+def iso_to_epoch(values: List[Optional[str]]) -> np.ndarray:
+    """批量把 ISO 时间字符串转换为时间戳（秒），缺失值为 NaN"""
+    times = np.array([v.rstrip("Z") if v else "NaT" for v in values], dtype="datetime64[us]")
+    epoch = times.astype(np.int64) / 1e6
+    epoch[np.isnat(times)] = np.nan
+    return epoch
+
+
+def epoch_to_iso(values: List[Optional[float]]) -> List[Optional[str]]:
+    """批量把时间戳转换为 ISO 时间字符串（微秒精度，与拾取表一致）"""
+    epoch = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    missing = np.isnan(epoch)
+    times = np.round(np.where(missing, 0, epoch) * 1e6).astype(np.int64).astype("datetime64[us]")
+    return [None if m else t for m, t in zip(missing.tolist(), np.datetime_as_string(times, unit="us").tolist())]
+
+
+def parse_station(station: Optional[str]) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """把 "IU.ANMO"、"IU.ANMO.00" 或 "ANMO" 拆分为 (network, station, location)"""
+    if not station:
+        return None, None, None
+    parts = station.split(".")
+    if len(parts) == 1:
+        return None, parts[0], None
+    if len(parts) == 2:
+        return parts[0] or None, parts[1], None
+    return parts[0] or None, parts[1], parts[2]
+
+
+class PickCatalog:
+    """跨运行持久保存拾取结果的 SQLite 目录
+
+    每次检测工具运行记为一个 run；拾取按 (台站, 震相, 到时, 模型, 推理精度, 推理后端) 去重，
+    同一数据用同一模型变体重复拾取时保留最新一次的结果，不同精度/后端（如 fp32 与 int8、
+    PyTorch 与 ONNX）的拾取分别保存。台站、震相、时间和概率均有索引，查询不需要读取波形。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self._path = path
+        self.enabled = True
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return self._path or default_catalog_path()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._migrate(conn)
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection):
+        """旧版 picks 表缺少 precision/backend 列：重建表并按所属运行的精度和后端补齐"""
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(picks)")]
+        if not columns or "precision" in columns:
+            return
+        logger.info("拾取目录升级：唯一键加入推理精度和后端")
+        legacy = ", ".join(LEGACY_PICK_COLUMNS)
+        with conn:
+            conn.execute("ALTER TABLE picks RENAME TO picks_legacy")
+            for index in ("idx_picks_station", "idx_picks_time", "idx_picks_probability"):
+                conn.execute(f"DROP INDEX IF EXISTS {index}")
+        conn.executescript(SCHEMA)
+        with conn:
+            conn.execute(
+                f"INSERT INTO picks ({legacy}, precision, backend) "
+                f"SELECT {', '.join('p.' + c for c in LEGACY_PICK_COLUMNS)}, "
+                "COALESCE(r.precision, ''), COALESCE(r.backend, '') "
+                "FROM picks_legacy p LEFT JOIN runs r ON r.id = p.run_id")
+            conn.execute("DROP TABLE picks_legacy")
+
+    def start_run(self, tool: str, model: Optional[str] = None, precision: Optional[str] = None,
+                  backend: Optional[str] = None, source: Optional[str] = None) -> Optional[int]:
+        """登记一次检测运行，返回 run_id；目录关闭或写入失败时返回 None（不影响检测本身）"""
+        if not self.enabled:
+            return None
+        try:
+            with self._lock:
+                conn = self._connection()
+                with conn:
+                    cursor = conn.execute(
+                        "INSERT INTO runs (created_at, tool, model, precision, backend, source) VALUES (?, ?, ?, ?, ?, ?)",
+                        (time.time(), tool, model, precision, backend, source))
+                return cursor.lastrowid
+        except sqlite3.Error as e:
+            logger.warning(f"拾取目录登记运行失败 {self.path}: {e}")
+            return None
+
+    def add_picks(self, run_id: Optional[int], picks: List[Dict[str, Any]], model: str,
+                  source_file: Optional[str] = None) -> int:
+        """写入一批拾取（extract_picks 的字典形式），拾取自带 file 时优先作为来源文件
+
+        推理精度和后端取自 run_id 对应的运行记录。
+        """
+        if run_id is None or not picks:
+            return 0
+        times = iso_to_epoch([p["time"] for p in picks])
+        starts = iso_to_epoch([p.get("start_time") for p in picks])
+        ends = iso_to_epoch([p.get("end_time") for p in picks])
+        rows = []
+        precision = backend = ""
+        for pick, t, start, end in zip(picks, times.tolist(), starts.tolist(), ends.tolist()):
+            network, station, location = (pick.get("trace_id", "").split(".") + ["", "", ""])[:3]
+            probability = pick.get("probability")
+            rows.append((run_id, network, station, location, pick["phase"], t,
+                         None if probability is None else float(probability),
+                         None if start != start else start, None if end != end else end,
+                         model, pick.get("file") or source_file))
+        try:
+            with self._lock:
+                conn = self._connection()
+                variant = conn.execute("SELECT precision, backend FROM runs WHERE id = ?", (run_id,)).fetchone()
+                if variant is not None:
+                    precision, backend = variant[0] or "", variant[1] or ""
+                rows = [row + (precision, backend) for row in rows]
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO picks (run_id, network, station, location, phase, time, probability, "
+                        "start_time, end_time, model, source_file, precision, backend) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                    conn.execute("UPDATE runs SET picks_count = picks_count + ? WHERE id = ?", (len(rows), run_id))
+            return len(rows)
+        except sqlite3.Error as e:
+            logger.warning(f"拾取写入目录失败 {self.path}: {e}")
+            return 0
+
+    def record(self, tool: str, picks: List[Dict[str, Any]], model: str, precision: Optional[str] = None,
+               backend: Optional[str] = None, source: Optional[str] = None) -> Optional[int]:
+        """登记一次运行并写入其全部拾取，返回 run_id"""
+        run_id = self.start_run(tool, model, precision, backend, source)
+        self.add_picks(run_id, picks, model, source)
+        return run_id
+
+    @staticmethod
+    def _where(station: Optional[str] = None, phase: Optional[str] = None, start_time: Optional[str] = None,
+               end_time: Optional[str] = None, min_probability: Optional[float] = None,
+               max_probability: Optional[float] = None, model: Optional[str] = None, precision: Optional[str] = None,
+               backend: Optional[str] = None, source_file: Optional[str] = None,
+               run_id: Optional[int] = None) -> Tuple[str, List[Any]]:
+        network, station, location = parse_station(station)
+        clauses, params = [], []
+        for column, value in (("network", network), ("station", station), ("location", location),
+                              ("model", model), ("precision", precision), ("backend", backend),
+                              ("source_file", source_file), ("run_id", run_id)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if phase:
+            clauses.append("phase = ?")
+            params.append(phase.upper())
+        if start_time:
+            clauses.append("time >= ?")
+            params.append(UTCDateTime(start_time).timestamp)
+        if end_time:
+            clauses.append("time <= ?")
+            params.append(UTCDateTime(end_time).timestamp)
+        if min_probability is not None:
+            clauses.append("probability >= ?")
+            params.append(min_probability)
+        if max_probability is not None:
+            clauses.append("probability <= ?")
+            params.append(max_probability)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, limit: Optional[int] = None, **filters) -> List[Dict[str, Any]]:
+        """按台站、震相、时间范围、概率、模型、推理精度和后端等条件查询拾取，按到时排序
+
+        station 可为 "IU.ANMO"、"IU.ANMO.00" 或 "ANMO"；时间为 ISO 字符串。
+        返回字段与拾取表一致（trace_id、phase、time 等），另含 model、precision、backend、run_id。
+        """
+        where, params = self._where(**filters)
+        sql = f"SELECT {', '.join(PICK_COLUMNS)} FROM picks{where} ORDER BY time"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        with self._lock:
+            rows = self._connection().execute(sql, params).fetchall()
+        if not rows:
+            return []
+        columns = dict(zip(PICK_COLUMNS, zip(*rows)))
+        for name in ("time", "start_time", "end_time"):
+            columns[name] = epoch_to_iso(columns[name])
+        return [{
+            "trace_id": f"{network}.{station}.{location}",
+            "phase": phase,
+            "time": t,
+            "probability": probability,
+            "start_time": start,
+            "end_time": end,
+            "model": model,
+            "precision": precision,
+            "backend": backend,
+            "file": source_file,
+            "run_id": run_id,
+        } for network, station, location, phase, t, probability, start, end, model, precision, backend, source_file,
+            run_id in zip(*(columns[name] for name in PICK_COLUMNS))]
+
+    def summary(self, **filters) -> Dict[str, Any]:
+        """统计满足条件的拾取：总数、时间范围及各台站各震相的数量"""
+        where, params = self._where(**filters)
+        with self._lock:
+            conn = self._connection()
+            total, first, last = conn.execute(f"SELECT COUNT(*), MIN(time), MAX(time) FROM picks{where}",
+                                              params).fetchone()
+            groups = conn.execute(
+                f"SELECT network, station, location, phase, COUNT(*) FROM picks{where} "
+                "GROUP BY network, station, location, phase ORDER BY network, station, location, phase",
+                params).fetchall()
+        by_station: Dict[str, Dict[str, int]] = {}
+        for network, station, location, phase, count in groups:
+            by_station.setdefault(f"{network}.{station}.{location}", {})[phase] = count
+        first, last = epoch_to_iso([first, last]) if total else (None, None)
+        return {"total": total, "first_time": first, "last_time": last, "by_station": by_station}
+
+    def export(self, path: str, **filters) -> int:
+        """把满足条件的全部拾取写为 CSV 拾取表（可直接用于 AssociatePhases）"""
+        picks = self.query(**filters)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=PICK_TABLE_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(picks)
+        return len(picks)
+
+
+# 全局拾取目录
+pick_catalog = PickCatalog()
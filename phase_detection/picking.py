@@ -0,0 +1,199 @@
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 推理模式：single_pass 只运行一次 annotate 并从概率曲线提取拾取；
+# classify 额外调用 model.classify（模型会再推理一次），保留作为对照
+INFERENCE_MODES = ("single_pass", "classify")
+
+# 标注道通道名后缀（SeisBench 命名为 "<模型名>_<标签>"）
+PHASE_LABELS = ("P", "S")
+DETECTION_LABEL = "Detection"
+
+# 拾取表与事件检测表的结构化类型，时间为纳秒精度的 UTC 时刻
+PICK_DTYPE = np.dtype([
+    ("phase", "U8"),
+    ("time", "datetime64[ns]"),
+    ("start_time", "datetime64[ns]"),
+    ("end_time", "datetime64[ns]"),
+    ("trace_id", "U32"),
+    ("probability", "f4"),
+])
+DETECTION_DTYPE = np.dtype([
+    ("start_time", "datetime64[ns]"),
+    ("end_time", "datetime64[ns]"),
+    ("probability", "f4"),
+    ("trace_id", "U32"),
+])
+
+# classify 输出的事件检测缺少结束时间时假定的持续时间(秒)
+DEFAULT_DETECTION_SECONDS = 30
+
+
+def annotation_label(trace) -> str:
+    """返回标注道的标签，例如 PhaseNet_P -> P"""
+    return trace.stats.channel.rsplit("_", 1)[-1]
+
+
+def select_label(annotations, label: str) -> List:
+    """按标签精确选出标注道（Stream.select 的通配符不区分大小写，"*N" 会误匹配 *_Detection）"""
+    return [trace for trace in annotations if annotation_label(trace) == label]
+
+
+def threshold_runs(data: np.ndarray, threshold: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """找出概率曲线中连续超过阈值的区段及各区段峰值位置
+
+    Returns:
+        (starts, ends, peaks)，ends 为区段最后一个样本的下标，peaks 为区段内最大值下标
+    """
+    mask = np.asarray(data) > threshold
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1)
+    if len(starts) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+
+    # 按区段编号+概率降序排序，每个区段的第一个元素即峰值（相同峰值取最早样本）
+    idx = np.flatnonzero(mask)
+    lengths = stops - starts
+    labels = np.repeat(np.arange(len(starts)), lengths)
+    order = np.lexsort((-data[idx], labels))
+    first = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    peaks = idx[order[first]]
+    return starts, stops - 1, peaks
+
+
+def _trace_id(trace) -> str:
+    return f"{trace.stats.network}.{trace.stats.station}.{trace.stats.location}"
+
+
+def _sample_times(trace, samples: np.ndarray) -> np.ndarray:
+    """样本下标转换为 datetime64[ns] 时刻"""
+    offsets = np.round(samples * (trace.stats.delta * 1e9)).astype(np.int64)
+    return (np.int64(trace.stats.starttime.ns) + offsets).astype("datetime64[ns]")
+
+
+def _ns(t) -> np.datetime64:
+    """UTCDateTime 转换为 datetime64[ns]，None 转换为 NaT"""
+    return np.datetime64("NaT", "ns") if t is None else np.datetime64(t.ns, "ns")
+
+
+def pick_table(annotations, thresholds: Dict[str, float]) -> np.ndarray:
+    """从标注 Stream 中提取震相拾取表（PICK_DTYPE 结构化数组，按到时排序）
+
+    Args:
+        annotations: model.annotate 返回的概率曲线 Stream
+        thresholds: 各震相的概率阈值，例如 {"P": 0.5, "S": 0.5}
+    """
+    parts = []
+    for trace in annotations:
+        phase = annotation_label(trace)
+        if phase not in thresholds:
+            continue
+        starts, ends, peaks = threshold_runs(trace.data, thresholds[phase])
+        part = np.empty(len(peaks), dtype=PICK_DTYPE)
+        part["phase"] = phase
+        part["time"] = _sample_times(trace, peaks)
+        part["start_time"] = _sample_times(trace, starts)
+        part["end_time"] = _sample_times(trace, ends)
+        part["trace_id"] = _trace_id(trace)
+        part["probability"] = trace.data[peaks]
+        parts.append(part)
+    table = np.concatenate(parts) if parts else np.empty(0, dtype=PICK_DTYPE)
+    return table[np.argsort(table["time"], kind="stable")]
+
+
+def detection_table(annotations, threshold: float) -> np.ndarray:
+    """从标注 Stream 的 Detection 道提取事件检测表（DETECTION_DTYPE，按开始时间排序）"""
+    parts = []
+    for trace in annotations:
+        if annotation_label(trace) != DETECTION_LABEL:
+            continue
+        starts, ends, peaks = threshold_runs(trace.data, threshold)
+        part = np.empty(len(peaks), dtype=DETECTION_DTYPE)
+        part["start_time"] = _sample_times(trace, starts)
+        part["end_time"] = _sample_times(trace, ends)
+        part["probability"] = trace.data[peaks]
+        part["trace_id"] = _trace_id(trace)
+        parts.append(part)
+    table = np.concatenate(parts) if parts else np.empty(0, dtype=DETECTION_DTYPE)
+    return table[np.argsort(table["start_time"], kind="stable")]
+
+
+def classify_pick_table(output) -> np.ndarray:
+    """把 model.classify 输出的拾取(SeisBench Pick)转换为拾取表
+
+    到时取 peak_time，缺失时取 start_time；概率取 peak_value，缺失时为 NaN。
+    """
+    picks = list(getattr(output, "picks", None) or [])
+    table = np.empty(len(picks), dtype=PICK_DTYPE)
+    if not picks:
+        return table
+    table["phase"] = [p.phase or "" for p in picks]
+    table["start_time"] = [_ns(p.start_time) for p in picks]
+    table["end_time"] = [_ns(p.end_time) for p in picks]
+    table["time"] = [_ns(p.peak_time if p.peak_time is not None else p.start_time) for p in picks]
+    table["trace_id"] = [p.trace_id for p in picks]
+    table["probability"] = [np.nan if p.peak_value is None else p.peak_value for p in picks]
+    return table[np.argsort(table["time"], kind="stable")]
+
+
+def classify_detection_table(output) -> np.ndarray:
+    """把 model.classify 输出的事件检测(SeisBench Detection)转换为事件检测表"""
+    detections = list(getattr(output, "detections", None) or [])
+    table = np.empty(len(detections), dtype=DETECTION_DTYPE)
+    if not detections:
+        return table
+    table["start_time"] = [_ns(d.start_time) for d in detections]
+    table["end_time"] = [_ns(d.end_time) for d in detections]
+    missing_end = np.isnat(table["end_time"])
+    table["end_time"][missing_end] = table["start_time"][missing_end] + np.timedelta64(DEFAULT_DETECTION_SECONDS, "s")
+    table["trace_id"] = [d.trace_id for d in detections]
+    table["probability"] = [np.nan if d.peak_value is None else d.peak_value for d in detections]
+    return table[np.argsort(table["start_time"], kind="stable")]
+
+
+def table_records(table: np.ndarray) -> List[Dict[str, Any]]:
+    """把拾取表/事件检测表转换为字典列表（时间为 ISO 字符串，与 UTCDateTime.isoformat 一致）"""
+    columns = {}
+    for name in table.dtype.names:
+        column = table[name]
+        if column.dtype.kind == "M":
+            column = np.datetime_as_string(column.astype("datetime64[us]"), unit="us")
+            columns[name] = [None if t == "NaT" else t for t in column.tolist()]
+        elif column.dtype.kind == "f":
+            columns[name] = [None if v != v else v for v in column.astype(np.float64).tolist()]
+        else:
+            columns[name] = column.tolist()
+    names = table.dtype.names
+    return [dict(zip(names, row)) for row in zip(*(columns[name] for name in names))]
+
+
+def extract_picks(annotations, thresholds: Dict[str, float]) -> List[Dict[str, Any]]:
+    """从标注 Stream 中提取震相拾取，结果按到时排序（字典形式的 pick_table）"""
+    return table_records(pick_table(annotations, thresholds))
+
+
+def extract_detections(annotations, threshold: float) -> List[Dict[str, Any]]:
+    """从标注 Stream 的 Detection 道提取事件检测（仅 EQTransformer 等带检测输出的模型）"""
+    return table_records(detection_table(annotations, threshold))
+
+
+def group_by_trace_id(items: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """把拾取或事件检测结果按台站(trace_id)分组，组内保持原有顺序"""
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for item in items:
+        groups.setdefault(item.get("trace_id", ""), []).append(item)
+    return dict(sorted(groups.items()))
+
+
+def validate_inference_mode(mode: Optional[str]) -> str:
+    """规范化推理模式参数"""
+    mode = (mode or "single_pass").lower()
+    if mode not in INFERENCE_MODES:
+        raise ValueError(f"不支持的推理模式: {mode}, 可用模式: {list(INFERENCE_MODES)}")
+    return mode
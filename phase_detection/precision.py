@@ -0,0 +1,128 @@
+import logging
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+import torch
+from obspy import UTCDateTime
+
+from .picking import annotation_label
+
+logger = logging.getLogger(__name__)
+
+# 推理精度：fp32 为原始模型；bf16 在 autocast 下以 bfloat16 计算；
+# int8 对 Linear/LSTM/GRU 层做动态量化（卷积层保持 fp32）
+PRECISIONS = ("fp32", "bf16", "int8")
+
+# 动态量化支持的层类型
+QUANTIZABLE_MODULES = {torch.nn.Linear, torch.nn.LSTM, torch.nn.GRU}
+
+
+def validate_precision(precision: Optional[str]) -> str:
+    """规范化推理精度参数"""
+    precision = (precision or "fp32").lower()
+    if precision not in PRECISIONS:
+        raise ValueError(f"不支持的推理精度: {precision}, 可用精度: {list(PRECISIONS)}")
+    return precision
+
+
+def precision_supported(precision: str) -> bool:
+    """当前 CPU / torch 构建是否支持该精度"""
+    if precision == "int8":
+        return any(engine != "none" for engine in torch.backends.quantized.supported_engines)
+    if precision == "bf16":
+        # 没有原生 bfloat16 指令时 autocast 仍可运行，但会比 fp32 更慢
+        check = getattr(torch.cpu, "_is_avx512_bf16_supported", None)
+        return bool(check()) if check is not None else True
+    return True
+
+
+def _to_float32(output):
+    """把 bf16 的前向输出转换回 float32，SeisBench 的后处理按 float32 处理"""
+    if isinstance(output, torch.Tensor):
+        return output.float()
+    if isinstance(output, (tuple, list)):
+        return type(output)(_to_float32(o) for o in output)
+    return output
+
+
+def apply_precision(model, precision: str):
+    """把已加载的 fp32 模型转换为指定精度的推理变体
+
+    所有变体的前向计算都在 torch.inference_mode 下执行；bf16 变体额外启用
+    CPU autocast，输出转换回 float32，因此 annotate/classify 的用法不变。
+    """
+    precision = validate_precision(precision)
+    if not precision_supported(precision):
+        raise ValueError(f"当前环境不支持 {precision} 推理")
+
+    model.eval()
+    if precision == "int8":
+        model = torch.ao.quantization.quantize_dynamic(model, QUANTIZABLE_MODULES, dtype=torch.qint8)
+
+    forward = model.forward
+
+    def inference_forward(*args, **kwargs):
+        with torch.inference_mode():
+            if precision == "bf16":
+                with torch.autocast("cpu", dtype=torch.bfloat16):
+                    return _to_float32(forward(*args, **kwargs))
+            return forward(*args, **kwargs)
+
+    model.forward = inference_forward
+    model.precision = precision
+    return model
+
+
+def probability_differences(reference, candidate) -> Dict[str, Dict[str, float]]:
+    """逐标签比较两组标注的概率曲线，返回最大/平均绝对误差"""
+    def by_key(annotations):
+        return {(tr.id.rsplit(".", 1)[0], annotation_label(tr)): tr for tr in annotations}
+
+    ref, cand = by_key(reference), by_key(candidate)
+    errors: Dict[str, List[np.ndarray]] = {}
+    for key, ref_trace in ref.items():
+        cand_trace = cand.get(key)
+        if cand_trace is None:
+            continue
+        n = min(len(ref_trace.data), len(cand_trace.data))
+        diff = np.abs(np.asarray(ref_trace.data[:n], dtype=np.float32) - np.asarray(cand_trace.data[:n], dtype=np.float32))
+        errors.setdefault(key[1], []).append(diff)
+
+    result = {}
+    for label, diffs in errors.items():
+        diff = np.concatenate(diffs)
+        if diff.size:
+            result[label] = {"max_abs_error": float(diff.max()), "mean_abs_error": float(diff.mean())}
+    return result
+
+
+def pick_agreement(reference: List[Dict[str, Any]], candidate: List[Dict[str, Any]],
+                   tolerance: float = 0.1) -> Dict[str, Any]:
+    """统计候选拾取与参考拾取的一致性
+
+    同一台站、同一震相且到时相差不超过 tolerance 秒视为匹配，每个参考拾取最多匹配一次。
+    """
+    pool: Dict[tuple, List[float]] = {}
+    for pick in candidate:
+        pool.setdefault((pick["trace_id"], pick["phase"]), []).append(UTCDateTime(pick["time"]).timestamp)
+
+    matched, offsets = 0, []
+    for pick in reference:
+        times = pool.get((pick["trace_id"], pick["phase"]))
+        if not times:
+            continue
+        t = UTCDateTime(pick["time"]).timestamp
+        i = int(np.argmin(np.abs(np.asarray(times) - t)))
+        if abs(times[i] - t) <= tolerance:
+            offsets.append(abs(times[i] - t))
+            times.pop(i)
+            matched += 1
+
+    return {
+        "reference_picks": len(reference),
+        "candidate_picks": len(candidate),
+        "matched": matched,
+        "recall": round(matched / len(reference), 4) if reference else None,
+        "precision": round(matched / len(candidate), 4) if candidate else None,
+        "mean_time_offset": round(float(np.mean(offsets)), 4) if offsets else None,
+    }
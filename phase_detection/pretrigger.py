@@ -0,0 +1,160 @@
+import logging
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+import numpy as np
+from obspy import Stream, UTCDateTime
+from obspy.signal.trigger import classic_sta_lta
+
+from .batch import group_by_station
+
+logger = logging.getLogger(__name__)
+
+# STA/LTA 预触发默认参数：窗口长度(秒)、触发/解除阈值、触发段两侧的补充时长(秒)。
+# 阈值低于常规触发设置（3~4），宁可多送模型一些窗口，也不漏掉弱事件
+PRETRIGGER_DEFAULTS = {
+    "sta": 1.0,
+    "lta": 20.0,
+    "on": 2.5,
+    "off": 1.2,
+    "pad": 30.0,
+}
+
+
+def pretrigger_config(spec: Union[bool, Dict[str, Any], None]) -> Optional[Dict[str, float]]:
+    """规范化预触发参数：False/None 表示关闭，True 使用默认值，字典覆盖部分默认值"""
+    if not spec:
+        return None
+    config = dict(PRETRIGGER_DEFAULTS)
+    if isinstance(spec, dict):
+        unknown = set(spec) - set(config)
+        if unknown:
+            raise ValueError(f"不支持的预触发参数: {sorted(unknown)}, 可用参数: {list(config)}")
+        config.update({k: float(v) for k, v in spec.items()})
+    if not 0 < config["sta"] < config["lta"]:
+        raise ValueError("预触发参数需满足 0 < sta < lta")
+    if config["off"] > config["on"]:
+        raise ValueError("预触发解除阈值 off 不能大于触发阈值 on")
+    if config["pad"] < 0:
+        raise ValueError("预触发补充时长 pad 不能为负")
+    return config
+
+
+def pretrigger_fingerprint(config: Optional[Dict[str, float]]) -> str:
+    """预触发参数的稳定标识，参与概率曲线缓存的键"""
+    if config is None:
+        return ""
+    return "pretrigger:" + ",".join(f"{k}={config[k]:g}" for k in sorted(config))
+
+
+def trigger_mask(data: np.ndarray, sampling_rate: float, config: Dict[str, float]) -> np.ndarray:
+    """STA/LTA 触发的样本掩码
+
+    特征函数超过 off 的连续区段中，只要有样本超过 on 即整段视为触发（迟滞）。
+    LTA 尚未稳定的前 lta 秒无法判断，按触发处理。
+    """
+    nsta = max(1, int(round(config["sta"] * sampling_rate)))
+    nlta = max(nsta + 1, int(round(config["lta"] * sampling_rate)))
+    n = len(data)
+    if n <= nlta:
+        return np.ones(n, dtype=bool)
+
+    data = np.asarray(data, dtype=np.float64)
+    cft = classic_sta_lta(data - data.mean(), nsta, nlta)
+    above = cft > config["off"]
+    edges = np.diff(np.concatenate(([0], above.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1)
+    mask = np.zeros(n, dtype=bool)
+    if len(starts):
+        triggered = np.maximum.reduceat(cft, starts) > config["on"]
+        # 用差分累加一次性标记所有触发区段
+        marks = np.zeros(n + 1, dtype=np.int32)
+        marks[starts[triggered]] += 1
+        marks[stops[triggered]] -= 1
+        mask = np.cumsum(marks[:-1]) > 0
+    mask[:nlta] = True
+    return mask
+
+
+def _mask_intervals(mask: np.ndarray, t0: float, delta: float) -> List[Tuple[float, float]]:
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1)
+    return list(zip((t0 + starts * delta).tolist(), (t0 + (stops - 1) * delta).tolist()))
+
+
+def _merge(intervals: List[Tuple[float, float]], pad: float, min_length: float,
+           bounds: Tuple[float, float]) -> List[Tuple[float, float]]:
+    """两侧补充 pad 秒、不足 min_length 的区间对称扩展，再合并重叠区间（限制在数据范围内）"""
+    widened = []
+    for start, end in intervals:
+        start, end = start - pad, end + pad
+        if end - start < min_length:
+            extra = (min_length - (end - start)) / 2
+            start, end = start - extra, end + extra
+        widened.append((max(start, bounds[0]), min(end, bounds[1])))
+    widened.sort()
+    merged = []
+    for start, end in widened:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def apply_pretrigger(st, config: Dict[str, float], window_seconds: float) -> Tuple[Stream, Dict[str, Any]]:
+    """只保留 STA/LTA 触发的时间段（及两侧 pad 秒）送入深度学习模型
+
+    同一台站任一分量触发即保留该台站所有分量的对应时段，每段至少一个模型窗口长。
+    返回的 Stream 与原数据共享样本数组（slice 不复制）。
+
+    Returns:
+        (触发段 Stream, 统计信息)
+    """
+    kept = Stream()
+    total_seconds = kept_seconds = 0.0
+    windows_total = windows_kept = segments = 0
+    for station, traces in group_by_station(st).items():
+        intervals = []
+        for tr in traces:
+            mask = trigger_mask(tr.data, tr.stats.sampling_rate, config)
+            intervals.extend(_mask_intervals(mask, tr.stats.starttime.timestamp, tr.stats.delta))
+        start = min(tr.stats.starttime.timestamp for tr in traces)
+        end = max(tr.stats.endtime.timestamp for tr in traces)
+        merged = _merge(intervals, config["pad"], window_seconds, (start, end))
+
+        total_seconds += end - start
+        windows_total += int(np.ceil((end - start) / window_seconds))
+        for seg_start, seg_end in merged:
+            segments += 1
+            kept_seconds += seg_end - seg_start
+            windows_kept += int(np.ceil((seg_end - seg_start) / window_seconds))
+            for tr in traces:
+                piece = tr.slice(UTCDateTime(seg_start), UTCDateTime(seg_end))
+                if piece.stats.npts:
+                    kept += piece
+
+    report = {
+        **config,
+        "segments": segments,
+        "total_seconds": round(total_seconds, 1),
+        "kept_seconds": round(kept_seconds, 1),
+        "windows_total": windows_total,
+        "windows_skipped": max(0, windows_total - windows_kept),
+        "skipped_fraction": round(1 - kept_seconds / total_seconds, 4) if total_seconds > 0 else 0.0,
+    }
+    logger.info(f"STA/LTA 预触发保留 {segments} 段，跳过 {report['skipped_fraction']:.1%} 的数据")
+    return kept, report
+
+
+def merge_reports(reports: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """汇总多个分块的预触发统计"""
+    if not reports:
+        return None
+    merged = {k: reports[0][k] for k in PRETRIGGER_DEFAULTS}
+    for key in ("segments", "total_seconds", "kept_seconds", "windows_total", "windows_skipped"):
+        merged[key] = round(sum(r[key] for r in reports), 1) if key.endswith("seconds") else sum(r[key] for r in reports)
+    total = merged["total_seconds"]
+    merged["skipped_fraction"] = round(1 - merged["kept_seconds"] / total, 4) if total > 0 else 0.0
+    return merged
@@ -28,17 +28,44 @@ def create_system_prompt():
         "p_threshold": P波阈值(0-1), 
         "s_threshold": S波阈值(0-1), 
         "detection_threshold": 事件检测阈值(0-1),
-        "show_probability": true/false
+        "show_probability": true/false,
+        "full_resolution": "lazy" | "background" | "immediate",
+        "preprocessing": 预处理步骤列表(可选),
+        "inference_mode": "single_pass" | "classify",
+        "precision": "fp32" | "bf16" | "int8",
+        "backend": "torch" | "onnx",
+        "pretrigger": false
     }
 
     2. EvaluateDetectionQuality - 评估震相拾取和事件检测质量
-    参数: {"detection_result": "检测结果ID或文件路径"}
+    参数: {"detection_result": "DetectAndPlotPhases返回的data_cache目录路径"}
 
-    3. ListAvailableModels - 列出可用的震相拾取与事件检测模型
+    3. ListAvailableModels - 列出可用的震相拾取与事件检测模型及其加载状态（warm_models为已预热、可立即使用的模型，model_cache为模型内存占用与淘汰统计）
     参数: {}
 
     4. CompareModels - 比较多个模型的震相拾取结果
-    参数: {"waveform_file": "波形文件路径", "models": ["PhaseNet", "EQTransformer", "GPD", "BasicPhaseAE"]}
+    参数: {"waveform_file": "波形文件路径", "models": ["PhaseNet", "EQTransformer", "GPD", "BasicPhaseAE"], "preprocessing": 预处理步骤列表(可选), "inference_mode": "single_pass" | "classify", "parallel": true}
+
+    5. RenderFullResolution - 获取绘图结果的全分辨率图像（绘图工具默认只返回缩略图，仅在用户需要高清图时调用）
+    参数: {"render_id": "绘图工具返回的render_id", "wait": true/false}
+
+    6. DetectPhasesBatch - 对多个波形文件批量进行震相拾取，默认不绘图，结果写入一个汇总拾取表(CSV)
+    参数: {"waveform_files": "文件路径列表或通配符模式", "model_name": "模型名称", "p_threshold": P波阈值, "s_threshold": S波阈值, "output_file": "拾取表路径(可选)", "plot": false}
+
+    7. DetectPhasesContinuous - 对长时间(数小时至数月)连续波形分块拾取震相，不绘图，拾取逐块写入拾取表(CSV)
+    参数: {"waveform_file": "连续波形文件路径", "model_name": "模型名称", "p_threshold": P波阈值, "s_threshold": S波阈值, "chunk_seconds": 分块时长(秒), "output_file": "拾取表路径(可选)", "pretrigger": false}
+
+    8. ComparePrecisions - 比较同一模型 fp32、bf16、int8 推理精度及 ONNX 后端的延迟、吞吐量和与fp32结果的一致性
+    参数: {"waveform_file": "波形文件路径", "model_name": "模型名称", "precisions": ["fp32", "bf16", "int8", "onnx"], "repeats": 计时次数}
+
+    9. AssociatePhases - 把多个台站的拾取表关联为地震事件，给出发震时刻、震源位置和各事件包含的拾取
+    参数: {"pick_tables": "拾取表路径列表或通配符模式", "inventory": "台站清单(StationXML)路径", "tolerance": 走时残差容差(秒), "min_picks": 最少拾取数, "min_stations": 最少台站数, "output_file": "事件表路径(可选)"}
+
+    10. QueryPicks - 查询以往检测保存在拾取目录中的拾取，不需要波形文件，也不会重新运行模型
+    参数: {"station": "台站(如IU.ANMO)", "phase": "P或S", "start_time": "起始时间", "end_time": "结束时间", "min_probability": 最小概率, "model_name": "模型名称", "precision": "推理精度(可选)", "backend": "推理后端(可选)", "output_file": "导出拾取表路径(可选)"}
+
+    11. TemplateMatching - 模板匹配(匹配滤波)检测：用已知事件的波形在连续数据中搜索相似的小地震
+    参数: {"waveform_file": "连续波形文件路径", "template_picks": "模板拾取表路径", "template_waveforms": "模板事件波形文件路径", "template_bank": "模板库路径(可选)", "threshold": MAD倍数阈值, "output_file": "检测表路径(可选)"}
 
     你必须始终以JSON格式返回回复，包含action（要执行的操作）和action_input（操作的参数）。
     例如: {"action": "DetectAndPlotPhases", "action_input": {"waveform_file": "/path/to/waveform.mseed", "model_name": "PhaseNet", "p_threshold": 0.5, "s_threshold": 0.5}}
@@ -99,8 +126,29 @@ def create_system_prompt():
     - p_threshold：P波拾取概率阈值，范围0-1，推荐0.3-0.7
     - s_threshold：S波拾取概率阈值，范围0-1，推荐0.3-0.7
     - detection_threshold：事件检测概率阈值，范围0-1，推荐0.3-0.5
-    - detection_result：检测结果的唯一标识符，从DetectPhases工具的返回结果中获取
+    - detection_result：检测结果目录，取DetectAndPlotPhases返回结果中的data_cache
     - show_probability：布尔值，是否在图表中显示概率曲线
+    - full_resolution：全分辨率图渲染方式，lazy(按需)、background(后台)或immediate(立即)，默认lazy
+    - waveform_files：批量拾取的文件列表或通配符模式(如"/data/events/*.mseed")，用户需要处理多个文件时使用DetectPhasesBatch，不要逐个调用DetectAndPlotPhases
+    - 多台站：DetectAndPlotPhases的波形文件可包含多个台站，返回的picks_by_station为各台站的拾取；同一台站各分量分别存放的文件用DetectPhasesBatch一起传入即可合并处理
+    - chunk_seconds：连续拾取的分块时长(秒)，默认3600；记录超过数小时的连续数据应使用DetectPhasesContinuous
+    - inference_mode：推理模式，默认single_pass(模型只推理一次，直接从概率曲线提取拾取)，classify为沿用模型classify结果(需再推理一次)
+    - parallel：CompareModels是否并行执行各模型，默认true；返回结果包含各模型用时(elapsed_seconds)和总用时(wall_seconds)
+    - precision：推理精度，默认fp32；bf16和int8在CPU上更快但概率略有偏差，用户要求加速或大批量处理时可使用，先用ComparePrecisions确认精度损失
+    - backend：推理后端，默认torch；onnx使用ONNX Runtime推理(仅PhaseNet和EQTransformer，仅fp32)，结果与torch一致，首次使用时导出模型
+    - pick_tables：AssociatePhases的输入拾取表，取DetectPhasesBatch或DetectPhasesContinuous返回的pick_table，多个台站的拾取表可一起传入
+    - inventory：台站清单文件路径，AssociatePhases用其中的台站坐标计算走时
+    - vp、vs：AssociatePhases使用的均匀速度模型(km/s)，默认6.0和3.47
+    - tolerance：AssociatePhases的走时残差容差(秒)，默认1.0；台站间距大或速度模型粗略时可适当放宽
+    - QueryPicks：用户询问以前拾取过的结果(如"上周IU.ANMO的所有P波拾取")时使用，start_time和end_time用ISO格式的绝对时间；DetectAndPlotPhases、DetectPhasesBatch、DetectPhasesContinuous的拾取会自动写入拾取目录；output_file导出的拾取表可直接用于AssociatePhases
+    - template_picks、template_waveforms：TemplateMatching的模板来源，拾取表优先使用AssociatePhases返回的event_picks_table(同一事件的拾取组成多台站模板)，模板波形为包含这些事件的波形文件；返回的template_bank可在处理其他时段数据时直接传入，不再需要模板拾取和波形
+    - threshold：TemplateMatching的检测阈值为网络平均互相关的MAD倍数，默认8；误检多时提高，漏检多时降低
+    - pretrigger：STA/LTA预触发，默认false；长时间且大部分时段安静的连续数据可设为true，只把触发段(两侧各补30秒)送入模型以节省推理时间，结果中的pretrigger.skipped_fraction为跳过的数据比例；弱小事件较多时保持关闭或降低on阈值
+    - render_id：绘图工具返回的渲染ID，用于RenderFullResolution获取高清图
+    - preprocessing：可选的预处理步骤列表，仅在用户要求去趋势、尖灭、合并、重采样或滤波时使用，
+      可用步骤: merge, detrend(type), taper(max_percentage), resample(sampling_rate), filter(type, freqmin, freqmax)，
+      remove_response(output, water_level, pre_filt, inventory：StationXML响应文件路径)，
+      例如: [{"op": "detrend", "type": "linear"}, {"op": "filter", "type": "bandpass", "freqmin": 1, "freqmax": 20}]
     """
     
     # 添加模型说明
@@ -0,0 +1,122 @@
+import os
+import json
+import tempfile
+import logging
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from common.rendering import minmax_indices
+from .picking import annotation_label
+
+logger = logging.getLogger(__name__)
+
+HEADER_FILE = "header.json"
+
+# 概率曲线存储精度：float16 足以表示 [0, 1] 范围的概率，体积为 float32 的一半
+PROBABILITY_DTYPES = {"float16": np.float16, "float32": np.float32}
+
+# 每个概率通道最多保存的样本数，超过时峰值保持降采样（约 2 万个最小/最大值对）
+DEFAULT_STORE_POINTS = 40000
+
+
+def save_detection_result(annotations, path: Optional[str] = None, dtype: str = "float16",
+                          max_points: Optional[int] = DEFAULT_STORE_POINTS, **metadata) -> str:
+    """把检测结果保存为紧凑的列式存储目录
+
+    目录包含 header.json（各道头信息、拾取结果等元数据）和每个概率通道一个 .npy 文件，
+    读取时按需内存映射，不需要反序列化波形或整个结果。超过 max_points 个样本的通道
+    以峰值保持方式降采样，另存保留样本的下标，峰值与谷值的数值和时刻不变；
+    拾取结果在降采样前已提取，保存在头信息中。max_points 为 None 时保存全部样本。
+
+    Returns:
+        结果目录路径
+    """
+    if dtype not in PROBABILITY_DTYPES:
+        raise ValueError(f"不支持的存储精度: {dtype}, 可用精度: {list(PROBABILITY_DTYPES.keys())}")
+    if path is None:
+        path = tempfile.mkdtemp(prefix="detection_")
+    os.makedirs(path, exist_ok=True)
+
+    channels = []
+    for i, tr in enumerate(annotations):
+        filename = f"channel_{i}.npy"
+        data = np.asarray(tr.data)
+        entry = {}
+        if max_points is not None and len(data) > max_points:
+            idx = minmax_indices(data, max_points)
+            data = data[idx]
+            entry["index_file"] = f"channel_{i}_index.npy"
+            np.save(os.path.join(path, entry["index_file"]), idx.astype(np.uint32))
+        np.save(os.path.join(path, filename), data.astype(PROBABILITY_DTYPES[dtype]))
+        channels.append({
+            **entry,
+            "file": filename,
+            "label": annotation_label(tr),
+            "channel": tr.stats.channel,
+            "trace_id": f"{tr.stats.network}.{tr.stats.station}.{tr.stats.location}",
+            "starttime": str(tr.stats.starttime),
+            "sampling_rate": float(tr.stats.sampling_rate),
+            "npts": int(tr.stats.npts),
+        })
+
+    header = {"format_version": 2, "dtype": dtype, "channels": channels, **metadata}
+    with open(os.path.join(path, HEADER_FILE), "w", encoding="utf-8") as f:
+        json.dump(header, f, ensure_ascii=False)
+    return path
+
+
+class DetectionResult:
+    """按需读取 save_detection_result 保存的检测结果
+
+    只读取 header.json；概率通道在访问时才以内存映射方式打开。
+    """
+
+    def __init__(self, path: str):
+        if not os.path.isdir(path) or not os.path.exists(os.path.join(path, HEADER_FILE)):
+            raise FileNotFoundError(f"检测结果不存在或格式不正确: {path}")
+        self.path = path
+        with open(os.path.join(path, HEADER_FILE), encoding="utf-8") as f:
+            self.header = json.load(f)
+
+    def labels(self) -> List[str]:
+        return sorted({ch["label"] for ch in self.header["channels"]})
+
+    def arrays(self, label: str) -> List[np.ndarray]:
+        """返回某一标签（P/S/N/Detection）所有道的概率数组（内存映射，只读）"""
+        return [np.load(os.path.join(self.path, ch["file"]), mmap_mode="r")
+                for ch in self.header["channels"] if ch["label"] == label]
+
+    def curves(self, label: str) -> List[Dict[str, Any]]:
+        """返回某一标签各道的曲线：trace_id、starttime、相对起始时刻的秒数 times 和概率 values
+
+        降采样保存的通道只包含保留的样本，times 为这些样本的实际时刻。
+        """
+        curves = []
+        for ch in self.header["channels"]:
+            if ch["label"] != label:
+                continue
+            values = np.load(os.path.join(self.path, ch["file"]), mmap_mode="r")
+            if "index_file" in ch:
+                idx = np.load(os.path.join(self.path, ch["index_file"]), mmap_mode="r")
+            else:
+                idx = np.arange(len(values))
+            curves.append({"trace_id": ch["trace_id"], "starttime": ch["starttime"],
+                           "times": idx / ch["sampling_rate"], "values": values})
+        return curves
+
+    def max_probability(self, label: str) -> Optional[float]:
+        arrays = [a for a in self.arrays(label) if a.size]
+        if not arrays:
+            return None
+        return float(max(a.max() for a in arrays))
+
+    def min_probability(self, label: str) -> Optional[float]:
+        arrays = [a for a in self.arrays(label) if a.size]
+        if not arrays:
+            return None
+        return float(min(a.min() for a in arrays))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """读取头信息中的元数据（picks、detections、model 等）"""
+        return self.header.get(key, default)
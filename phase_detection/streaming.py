@@ -0,0 +1,79 @@
+import logging
+from typing import Iterator, Tuple
+
+from obspy import read, UTCDateTime
+
+logger = logging.getLogger(__name__)
+
+# 默认每个分块的核心时长（秒）
+DEFAULT_CHUNK_SECONDS = 3600.0
+
+# 读取时能按 starttime/endtime 只解码所需记录的格式；其他格式 ObsPy 会先读入整个文件再裁剪
+WINDOWED_READ_FORMATS = {"MSEED"}
+
+
+def file_header(path: str) -> Tuple[UTCDateTime, UTCDateTime, str]:
+    """只读取头信息获取文件覆盖的时间范围和文件格式（如 MSEED、SAC）"""
+    st = read(path, headonly=True)
+    if len(st) == 0:
+        raise ValueError(f"文件中没有波形数据: {path}")
+    fmt = str(st[0].stats.get("_format", "")).upper()
+    return min(tr.stats.starttime for tr in st), max(tr.stats.endtime for tr in st), fmt
+
+
+def file_time_span(path: str) -> Tuple[UTCDateTime, UTCDateTime]:
+    """只读取头信息获取文件覆盖的时间范围"""
+    start, end, _ = file_header(path)
+    return start, end
+
+
+def model_margin(model, default: float = 60.0) -> float:
+    """分块两侧的重叠时长：取模型一个输入窗口的长度
+
+    分块边缘的窗口堆叠次数不足且受尖灭影响，加一个窗口长度的余量后，
+    核心区间内的概率与整段处理时一致。
+    """
+    in_samples = getattr(model, "in_samples", None)
+    sampling_rate = getattr(model, "sampling_rate", None)
+    if in_samples and sampling_rate:
+        return float(in_samples) / float(sampling_rate)
+    return default
+
+
+def iter_chunks(path: str, chunk_seconds: float = DEFAULT_CHUNK_SECONDS,
+                margin: float = 60.0) -> Iterator[Tuple[UTCDateTime, UTCDateTime, bool, object]]:
+    """按时间分块读取波形文件
+
+    MiniSEED 每次只读取 [核心起点 - margin, 核心终点 + margin] 范围的记录，内存占用与记录总长度无关；
+    其他格式（SAC 等）不支持按时间窗读取，整个文件只读入一次，再按同样的范围切片，
+    波形本身仍常驻内存，只有逐块推理的内存与记录长度无关。
+
+    Yields:
+        (核心起点, 核心终点, 是否最后一块, Stream)
+    """
+    start, end, fmt = file_header(path)
+    whole = None
+    if fmt not in WINDOWED_READ_FORMATS:
+        logger.info(f"{path} 不支持按时间窗读取，整体读入后分块切片")
+        whole = read(path)
+    core_start = start
+    while core_start < end:
+        core_end = min(core_start + chunk_seconds, end)
+        is_last = core_end >= end
+        if whole is None:
+            st = read(path, starttime=core_start - margin, endtime=core_end + margin)
+        else:
+            st = whole.slice(core_start - margin, core_end + margin)
+        if len(st):
+            yield core_start, core_end, is_last, st
+        core_start = core_end
+
+
+def in_core(time_str: str, core_start: UTCDateTime, core_end: UTCDateTime, is_last: bool = False) -> bool:
+    """判断拾取时间是否落在分块核心区间内（最后一块包含终点）
+
+    相邻分块的重叠区会产生同一震相的两份拾取，只保留峰值落在核心区间的一份。
+    """
+    t = UTCDateTime(time_str)
+    return core_start <= t < core_end or (is_last and t == core_end)
+
@@ -0,0 +1,358 @@
+import csv
+import bisect
+import json
+import logging
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import fft as sp_fft
+from obspy import Stream, UTCDateTime
+
+logger = logging.getLogger(__name__)
+
+# 模板与连续数据的默认带通滤波(Hz)、模板起点相对拾取的提前量(秒)和模板长度(秒)
+DEFAULT_FREQMIN = 2.0
+DEFAULT_FREQMAX = 8.0
+DEFAULT_PRE_PICK = 0.5
+DEFAULT_TEMPLATE_LENGTH = 3.0
+
+# 检测阈值：网络平均互相关超过 threshold x MAD(中位绝对值) 时触发
+DEFAULT_MAD_THRESHOLD = 8.0
+
+# 互相关计算的内存预算(MB)，决定重叠保留法每段的长度
+DEFAULT_MEMORY_MB = 1024
+
+# 估计 MAD 时每个模板最多使用的样本数（在整个分块上等间隔抽样），避免保存和排序整条叠加曲线
+MAD_SAMPLES = 8192
+
+# 模板匹配检测表列名
+MATCH_TABLE_FIELDS = ["template", "time", "cc", "threshold", "mad", "channels"]
+
+
+def preprocess(st: Stream, freqmin: float = DEFAULT_FREQMIN, freqmax: float = DEFAULT_FREQMAX,
+               sampling_rate: Optional[float] = None) -> Stream:
+    """模板和连续数据使用相同的预处理：合并(间断补零)、去均值、带通滤波、重采样（原地修改）"""
+    st.merge(method=1, fill_value=0)
+    st.detrend("demean")
+    st.filter("bandpass", freqmin=freqmin, freqmax=freqmax, corners=4, zerophase=True)
+    if sampling_rate is not None:
+        for tr in st:
+            if tr.stats.sampling_rate != sampling_rate:
+                tr.resample(sampling_rate)
+    return st
+
+
+def _phase_channels(traces: List, phase: str) -> List:
+    """P 波模板取垂直分量，S 波模板取水平分量；缺少对应分量时使用全部分量"""
+    is_vertical = [tr.stats.channel[-1:] in ("Z", "3") for tr in traces]
+    chosen = [tr for tr, vertical in zip(traces, is_vertical) if vertical == (phase == "P")]
+    return chosen or traces
+
+
+class TemplateBank:
+    """模板库：各模板在各通道上的归一化波形及相对模板参考时刻的时移
+
+    按通道组织，同一通道上的所有模板在互相关时一次批量计算；模板频谱按 FFT 长度缓存，
+    在连续数据的各分段、各分块间复用。
+    """
+
+    def __init__(self, names: Sequence[str], reference_times: Sequence[str], sampling_rate: float,
+                 length: int, pre_pick: float, entries: List[Tuple[int, str, int, np.ndarray]],
+                 bandpass: Optional[Tuple[float, float]] = None):
+        if not entries:
+            raise ValueError("没有可用的模板波形：检查拾取表与模板波形文件的台站和时间是否对应")
+        self.names = list(names)
+        self.reference_times = list(reference_times)
+        self.sampling_rate = float(sampling_rate)
+        self.length = int(length)
+        self.pre_pick = float(pre_pick)
+        # 模板使用的带通滤波 (freqmin, freqmax)，连续数据须使用相同的滤波
+        self.bandpass = tuple(bandpass) if bandpass else None
+        grouped: Dict[str, List[Tuple[int, int, np.ndarray]]] = {}
+        for index, channel, offset, data in entries:
+            grouped.setdefault(channel, []).append((index, offset, data))
+        self.channels: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        for channel, items in sorted(grouped.items()):
+            self.channels[channel] = (np.array([i for i, _, _ in items], dtype=np.int64),
+                                      np.array([o for _, o, _ in items], dtype=np.int64),
+                                      np.stack([d for _, _, d in items]).astype(np.float32))
+        self.max_offset = int(max(offsets.max() for _, offsets, _ in self.channels.values()))
+        self._spectra: Dict[str, np.ndarray] = {}
+        self._nfft = None
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def entries(self) -> int:
+        """模板-通道组合数"""
+        return sum(len(index) for index, _, _ in self.channels.values())
+
+    @property
+    def duration(self) -> float:
+        """模板覆盖的总时长(秒)：最大时移 + 模板长度"""
+        return (self.max_offset + self.length) / self.sampling_rate
+
+    def spectra(self, channel: str, nfft: int) -> np.ndarray:
+        """通道上各模板（时间反转）的频谱，FFT 长度变化时重新计算"""
+        if nfft != self._nfft:
+            self._spectra.clear()
+            self._nfft = nfft
+        spectrum = self._spectra.get(channel)
+        if spectrum is None:
+            data = self.channels[channel][2]
+            spectrum = sp_fft.rfft(data[:, ::-1], nfft, axis=1, workers=-1).astype(np.complex64)
+            self._spectra[channel] = spectrum
+        return spectrum
+
+    def save(self, path: str):
+        """保存模板库(NPZ)，可在处理其他时段的连续数据时直接加载"""
+        arrays = {}
+        header = {"names": self.names, "reference_times": self.reference_times,
+                  "sampling_rate": self.sampling_rate, "length": self.length, "pre_pick": self.pre_pick,
+                  "bandpass": self.bandpass, "channels": list(self.channels)}
+        for i, (index, offsets, data) in enumerate(self.channels.values()):
+            arrays[f"index_{i}"], arrays[f"offsets_{i}"], arrays[f"data_{i}"] = index, offsets, data
+        np.savez(path, header=np.array(json.dumps(header)), **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "TemplateBank":
+        with np.load(path) as npz:
+            header = json.loads(str(npz["header"]))
+            entries = []
+            for i, channel in enumerate(header["channels"]):
+                for index, offset, data in zip(npz[f"index_{i}"], npz[f"offsets_{i}"], npz[f"data_{i}"]):
+                    entries.append((int(index), channel, int(offset), data))
+        return cls(header["names"], header["reference_times"], header["sampling_rate"], header["length"],
+                   header["pre_pick"], entries, header.get("bandpass"))
+
+
+def build_templates(picks: List[Dict[str, Any]], st: Stream, pre_pick: float = DEFAULT_PRE_PICK,
+                    length: float = DEFAULT_TEMPLATE_LENGTH,
+                    bandpass: Optional[Tuple[float, float]] = None) -> TemplateBank:
+    """从拾取和（已预处理的）模板波形截取模板，bandpass 记录预处理使用的滤波频带
+
+    拾取带 event_id（AssociatePhases 的拾取归属表）时同一事件的所有拾取组成一个多台站模板，
+    否则每个拾取单独作为一个模板。模板参考时刻为事件最早拾取前 pre_pick 秒。
+    """
+    if not len(st):
+        raise ValueError("模板波形为空")
+    sampling_rate = st[0].stats.sampling_rate
+    if any(tr.stats.sampling_rate != sampling_rate for tr in st):
+        raise ValueError("模板波形各通道的采样率不一致")
+    npts = int(round(length * sampling_rate))
+    if npts < 2:
+        raise ValueError("模板长度过短")
+
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for pick in picks:
+        key = pick.get("event_id") or f"{pick['trace_id']}.{pick['phase']}.{pick['time']}"
+        groups.setdefault(key, []).append(pick)
+
+    stations: Dict[str, List] = {}
+    for tr in st:
+        stations.setdefault(f"{tr.stats.network}.{tr.stats.station}.{tr.stats.location}", []).append(tr)
+
+    names, reference_times, entries = [], [], []
+    for name, group in groups.items():
+        reference = min(UTCDateTime(p["time"]) for p in group) - pre_pick
+        template_entries = []
+        for pick in group:
+            start = UTCDateTime(pick["time"]) - pre_pick
+            for tr in _phase_channels(stations.get(pick["trace_id"], []), pick["phase"]):
+                i0 = int(round((start - tr.stats.starttime) * sampling_rate))
+                if i0 < 0 or i0 + npts > tr.stats.npts:
+                    continue
+                data = np.asarray(tr.data[i0:i0 + npts], dtype=np.float64)
+                data = data - data.mean()
+                norm = np.linalg.norm(data)
+                if norm == 0:
+                    continue
+                offset = int(round((start - reference) * sampling_rate))
+                template_entries.append((len(names), tr.id, offset, data / norm))
+        if template_entries:
+            names.append(name)
+            reference_times.append(reference.isoformat())
+            entries.extend(template_entries)
+    logger.info(f"从 {len(groups)} 组拾取中截取 {len(names)} 个模板，共 {len(entries)} 个模板通道")
+    return TemplateBank(names, reference_times, sampling_rate, npts, pre_pick, entries, bandpass)
+
+
+def _aligned_channels(bank: TemplateBank, st: Stream) -> Tuple[UTCDateTime, int, Dict[str, np.ndarray]]:
+    """把连续数据中模板用到的通道放到同一时间轴上（缺数据处为 0）"""
+    traces = [tr for tr in st if tr.id in bank.channels]
+    if not traces:
+        return None, 0, {}
+    for tr in traces:
+        if tr.stats.sampling_rate != bank.sampling_rate:
+            raise ValueError(f"连续数据 {tr.id} 采样率 {tr.stats.sampling_rate}Hz 与模板 {bank.sampling_rate}Hz 不一致")
+    t0 = min(tr.stats.starttime for tr in traces)
+    offsets = [int(round((tr.stats.starttime - t0) * bank.sampling_rate)) for tr in traces]
+    n = max(o + tr.stats.npts for o, tr in zip(offsets, traces))
+    channels = {}
+    for offset, tr in zip(offsets, traces):
+        data = channels.setdefault(tr.id, np.zeros(n, dtype=np.float32))
+        data[offset:offset + tr.stats.npts] = tr.data
+    return t0, n, channels
+
+
+def _normalized_correlation(bank: TemplateBank, channel: str, x: np.ndarray, nfft: int) -> np.ndarray:
+    """一个通道上全部模板与数据段的归一化互相关 (模板数, 滞后数)
+
+    分子用一次 rfft + 批量 irfft（重叠保留法中的一段）计算；数据的滑动标准差由累加和得到。
+    """
+    m = bank.length
+    lags = len(x) - m + 1
+    spectrum = sp_fft.rfft(x, nfft)
+    cc = sp_fft.irfft(bank.spectra(channel, nfft) * spectrum, nfft, axis=1, workers=-1)[:, m - 1:m - 1 + lags]
+
+    x64 = x.astype(np.float64)
+    c1 = np.concatenate(([0.0], np.cumsum(x64)))
+    c2 = np.concatenate(([0.0], np.cumsum(x64 * x64)))
+    mean = (c1[m:] - c1[:-m]) / m
+    var = (c2[m:] - c2[:-m]) / m - mean * mean
+    # 补零的间断段方差为 0（累加误差可能留下极小值），互相关置 0
+    valid = var > max(var.max(), 0.0) * 1e-10
+    scale = np.zeros(lags, dtype=np.float64)
+    scale[valid] = 1.0 / np.sqrt(var[valid] * m)
+    cc *= scale.astype(np.float32)
+    return cc
+
+
+def decluster(positions: np.ndarray, values: np.ndarray, min_separation: float) -> np.ndarray:
+    """同一模板的检测去重：按互相关从高到低保留，与已保留检测的间隔小于 min_separation 的丢弃
+
+    Returns:
+        保留的下标（按位置排序）
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    kept: List[int] = []
+    kept_positions: List[float] = []
+    for i in np.argsort(-np.asarray(values), kind="stable").tolist():
+        pos = positions[i]
+        j = bisect.bisect_left(kept_positions, pos)
+        if (j < len(kept_positions) and kept_positions[j] - pos < min_separation) or \
+                (j > 0 and pos - kept_positions[j - 1] < min_separation):
+            continue
+        kept_positions.insert(j, pos)
+        kept.insert(j, i)
+    return np.array(kept, dtype=np.int64)
+
+
+def decluster_detections(detections: List[Dict[str, Any]], min_separation: float) -> List[Dict[str, Any]]:
+    """对检测列表按模板去重（min_separation 秒内只保留互相关最高的一次），用于合并各分块的结果"""
+    by_template: Dict[str, List[Dict[str, Any]]] = {}
+    for d in detections:
+        by_template.setdefault(d["template"], []).append(d)
+    kept = []
+    for items in by_template.values():
+        times = [UTCDateTime(d["time"]).timestamp for d in items]
+        kept.extend(items[i] for i in decluster(times, [d["cc"] for d in items], min_separation).tolist())
+    kept.sort(key=lambda d: d["time"])
+    return kept
+
+
+def match_templates(bank: TemplateBank, st: Stream, threshold: float = DEFAULT_MAD_THRESHOLD,
+                    min_channels: int = 1, memory_mb: float = DEFAULT_MEMORY_MB) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """在（已预处理的）连续数据上做模板匹配
+
+    每个模板在各通道上的归一化互相关按时移对齐后取平均（网络叠加），超过
+    threshold x 中位绝对值(MAD) 的峰值为检测，同一模板一个模板长度内只保留最高的一次
+    （相当于 EQcorrscan 的 trig_int）。连续数据按内存预算分段、每段用重叠保留法计算；
+    MAD 在整段数据上抽样统计，每个模板长度的区块只保留最大值，结果与分段长度无关。
+
+    Returns:
+        (按时间排序的检测列表, 统计信息)
+    """
+    t0, n, data = _aligned_channels(bank, st)
+    m = bank.length
+    stats = {"templates": len(bank), "template_channels": bank.entries, "segments": 0, "active_templates": 0}
+    if n < m:
+        return [], stats
+
+    counts = np.zeros(len(bank), dtype=np.int64)
+    for channel in data:
+        np.add.at(counts, bank.channels[channel][0], 1)
+    active = np.flatnonzero(counts >= max(1, min_channels))
+    stats["active_templates"] = len(active)
+    if not len(active):
+        return [], stats
+
+    # 每段的长度：模板频谱(复数) + 各通道互相关输出 + 叠加结果不超过内存预算；取模板长度的整数倍，
+    # 使区块不跨段
+    entries = sum(len(bank.channels[c][0]) for c in data)
+    widest = max(len(bank.channels[c][0]) for c in data)
+    extra = bank.max_offset + m - 1
+    budget = memory_mb * 1024 * 1024
+    segment = int(budget / (4 * entries + 8 * widest + 4 * len(bank))) - extra
+    total_lags = n - m + 1
+    if segment < m:
+        logger.warning("模板数量较多，内存预算不足，分段长度取模板长度")
+        segment = m
+    # 先取快速 FFT 长度，再在其中放入尽量多的整区块（补零部分不影响重叠保留的结果）
+    full = int(np.ceil(total_lags / m)) * m
+    nfft = sp_fft.next_fast_len(min(segment, full) + extra)
+    segment = min(max(m, (nfft - extra) // m * m), full)
+
+    # 各模板每 m 个滞后的最大值及其位置，以及整段上等间隔抽取的 |cc| 样本（用于 MAD）
+    blocks = int(np.ceil(total_lags / m))
+    block_max = np.full((len(bank), blocks), -np.inf, dtype=np.float32)
+    block_pos = np.zeros((len(bank), blocks), dtype=np.int64)
+    mad_index = np.arange(0, total_lags, max(1, total_lags // MAD_SAMPLES))
+    mad_samples = np.zeros((len(bank), len(mad_index)), dtype=np.float32)
+    scale = (1.0 / np.maximum(counts, 1)).astype(np.float32)[:, None]
+
+    for seg_start in range(0, total_lags, segment):
+        seg_len = min(segment, total_lags - seg_start)
+        seg_blocks = int(np.ceil(seg_len / m))
+        stack = np.zeros((len(bank), seg_blocks * m), dtype=np.float32)
+        for channel, x in data.items():
+            index, offsets, _ = bank.channels[channel]
+            cc = _normalized_correlation(bank, channel, x[seg_start:seg_start + segment + extra], nfft)
+            available = cc.shape[1]
+            for row, (k, offset) in enumerate(zip(index.tolist(), offsets.tolist())):
+                span = min(seg_len, available - offset)
+                if span > 0:
+                    stack[k, :span] += cc[row, offset:offset + span]
+        stats["segments"] += 1
+        stack *= scale
+        stack[:, seg_len:] = -np.inf
+
+        b0 = seg_start // m
+        blocked = stack.reshape(len(bank), seg_blocks, m)
+        arg = blocked.argmax(axis=2)
+        block_max[:, b0:b0 + seg_blocks] = np.take_along_axis(blocked, arg[:, :, None], axis=2)[:, :, 0]
+        block_pos[:, b0:b0 + seg_blocks] = seg_start + np.arange(seg_blocks) * m + arg
+        in_segment = (mad_index >= seg_start) & (mad_index < seg_start + seg_len)
+        mad_samples[:, in_segment] = np.abs(stack[:, mad_index[in_segment] - seg_start])
+
+    detections = []
+    delta = 1.0 / bank.sampling_rate
+    for k in active.tolist():
+        mad = float(np.median(mad_samples[k]))
+        if mad == 0:
+            continue
+        level = threshold * mad
+        candidates = np.flatnonzero(block_max[k] > level)
+        if not len(candidates):
+            continue
+        positions, values = block_pos[k, candidates], block_max[k, candidates]
+        for i in decluster(positions, values, m).tolist():
+            detections.append({
+                "template": bank.names[k],
+                "time": (t0 + int(positions[i]) * delta + bank.pre_pick).isoformat(),
+                "cc": round(float(values[i]), 4),
+                "threshold": round(level, 4),
+                "mad": round(mad, 5),
+                "channels": int(counts[k]),
+            })
+    detections.sort(key=lambda d: d["time"])
+    return detections, stats
+
+
+def write_match_table(detections: List[Dict[str, Any]], path: str):
+    """把模板匹配检测写为 CSV 表"""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=MATCH_TABLE_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(detections)
@@ -1,8 +1,10 @@
-from typing import Dict, Callable, Any
+from typing import Dict, Callable, Any, List, Optional, Union
 from .tools import (
     detect_and_plot_phases,  # 添加这个导入
     evaluate_detection_quality,
-    list_available_models, compare_models
+    list_available_models, compare_models,
+    render_full_resolution, detect_phases_batch, detect_phases_continuous,
+    compare_precisions, associate_phases, query_picks, detect_by_template_matching
 )
 from pydantic import BaseModel, Field
 
@@ -15,6 +17,99 @@ class DetectAndPlotPhasesParams(BaseModel):
     s_threshold: float = Field(description="S波识别概率阈值", default=0.5)
     detection_threshold: float = Field(description="事件检测阈值", default=0.3)
     show_probability: bool = Field(description="是否显示概率曲线", default=True)
+    full_resolution: str = Field(description="全分辨率图渲染方式: lazy(按需), background(后台), immediate(立即)", default="lazy")
+    preprocessing: Optional[List[Dict[str, Any]]] = Field(description="预处理步骤列表，如[{\"op\": \"detrend\"}, {\"op\": \"filter\", \"type\": \"bandpass\", \"freqmin\": 1, \"freqmax\": 20}]", default=None)
+    inference_mode: str = Field(description="推理模式: single_pass(只推理一次，从概率曲线提取拾取) 或 classify(额外调用模型classify)", default="single_pass")
+    precision: str = Field(description="推理精度: fp32(默认), bf16(bfloat16 autocast) 或 int8(动态量化)", default="fp32")
+    backend: str = Field(description="推理后端: torch(默认) 或 onnx(ONNX Runtime CPU，仅支持PhaseNet和EQTransformer)", default="torch")
+    pretrigger: Union[bool, Dict[str, Any]] = Field(description="STA/LTA预触发: true使用默认参数，或参数字典如{\"sta\": 1, \"lta\": 20, \"on\": 2.5, \"off\": 1.2, \"pad\": 30}；只把触发段送入模型", default=False)
+
+class DetectPhasesBatchParams(BaseModel):
+    """批量震相拾取参数定义"""
+    waveform_files: Union[str, List[str]] = Field(description="波形文件路径列表或通配符模式，如\"/data/events/*.mseed\"")
+    model_name: str = Field(description="模型名称: PhaseNet, EQTransformer, GPD等", default="PhaseNet")
+    p_threshold: float = Field(description="P波识别概率阈值", default=0.5)
+    s_threshold: float = Field(description="S波识别概率阈值", default=0.5)
+    detection_threshold: float = Field(description="事件检测阈值", default=0.3)
+    preprocessing: Optional[List[Dict[str, Any]]] = Field(description="预处理步骤列表，对每个文件分别执行", default=None)
+    output_file: Optional[str] = Field(description="汇总拾取表(CSV)输出路径，默认写入临时文件", default=None)
+    batch_size: int = Field(description="模型推理的窗口批大小", default=256)
+    plot: bool = Field(description="是否绘制拾取时间分布汇总图", default=False)
+    full_resolution: str = Field(description="全分辨率图渲染方式: lazy(按需), background(后台), immediate(立即)", default="lazy")
+    precision: str = Field(description="推理精度: fp32(默认), bf16(bfloat16 autocast) 或 int8(动态量化)", default="fp32")
+    backend: str = Field(description="推理后端: torch(默认) 或 onnx(ONNX Runtime CPU，仅支持PhaseNet和EQTransformer)", default="torch")
+
+class DetectPhasesContinuousParams(BaseModel):
+    """长时间连续波形分块拾取参数定义"""
+    waveform_file: str = Field(description="连续波形文件路径")
+    model_name: str = Field(description="模型名称: PhaseNet, EQTransformer, GPD等", default="PhaseNet")
+    p_threshold: float = Field(description="P波识别概率阈值", default=0.5)
+    s_threshold: float = Field(description="S波识别概率阈值", default=0.5)
+    detection_threshold: float = Field(description="事件检测阈值", default=0.3)
+    chunk_seconds: float = Field(description="每个分块的时长(秒)", default=3600.0)
+    preprocessing: Optional[List[Dict[str, Any]]] = Field(description="预处理步骤列表，对每个分块执行", default=None)
+    output_file: Optional[str] = Field(description="拾取表(CSV)输出路径，默认写入临时文件", default=None)
+    batch_size: int = Field(description="模型推理的窗口批大小", default=256)
+    precision: str = Field(description="推理精度: fp32(默认), bf16(bfloat16 autocast) 或 int8(动态量化)", default="fp32")
+    backend: str = Field(description="推理后端: torch(默认) 或 onnx(ONNX Runtime CPU，仅支持PhaseNet和EQTransformer)", default="torch")
+    pretrigger: Union[bool, Dict[str, Any]] = Field(description="STA/LTA预触发: true使用默认参数，或参数字典如{\"sta\": 1, \"lta\": 20, \"on\": 2.5, \"off\": 1.2, \"pad\": 30}；只把触发段送入模型", default=False)
+
+class ComparePrecisionsParams(BaseModel):
+    """推理精度速度/精度对比参数定义"""
+    waveform_file: str = Field(description="波形数据文件路径")
+    model_name: str = Field(description="模型名称: PhaseNet, EQTransformer, GPD等", default="PhaseNet")
+    precisions: Optional[List[str]] = Field(description="要比较的推理变体列表，可选 fp32, bf16, int8, onnx，默认全部精度", default=None)
+    p_threshold: float = Field(description="P波识别概率阈值", default=0.5)
+    s_threshold: float = Field(description="S波识别概率阈值", default=0.5)
+    preprocessing: Optional[List[Dict[str, Any]]] = Field(description="预处理步骤列表", default=None)
+    repeats: int = Field(description="每种精度的计时次数", default=3)
+    tolerance: float = Field(description="与fp32拾取匹配的到时容差(秒)", default=0.1)
+
+class AssociatePhasesParams(BaseModel):
+    """多台站震相关联参数定义"""
+    pick_tables: Union[str, List[str]] = Field(description="拾取表(CSV)路径列表或通配符模式，来自DetectPhasesBatch或DetectPhasesContinuous")
+    inventory: str = Field(description="台站清单文件路径(StationXML等)，提供台站坐标")
+    vp: float = Field(description="P波速度(km/s)", default=6.0)
+    vs: float = Field(description="S波速度(km/s)", default=6.0 / 1.73)
+    grid_spacing_km: float = Field(description="搜索网格水平间距(km)", default=5.0)
+    depths_km: Optional[List[float]] = Field(description="搜索深度列表(km)，默认 0-30km", default=None)
+    tolerance: float = Field(description="走时残差容差(秒)", default=1.0)
+    min_picks: int = Field(description="一个事件至少包含的拾取数", default=4)
+    min_stations: int = Field(description="一个事件至少包含的台站数", default=3)
+    output_file: Optional[str] = Field(description="事件表(CSV)输出路径，默认写入临时文件", default=None)
+
+class QueryPicksParams(BaseModel):
+    """拾取目录查询参数定义"""
+    station: Optional[str] = Field(description="台站，如 IU.ANMO、IU.ANMO.00 或 ANMO", default=None)
+    phase: Optional[str] = Field(description="震相 P 或 S", default=None)
+    start_time: Optional[str] = Field(description="起始时间(ISO格式)", default=None)
+    end_time: Optional[str] = Field(description="结束时间(ISO格式)", default=None)
+    min_probability: Optional[float] = Field(description="最小拾取概率", default=None)
+    model_name: Optional[str] = Field(description="拾取所用模型", default=None)
+    precision: Optional[str] = Field(description="拾取所用推理精度: fp32, bf16 或 int8(不填则不限)", default=None)
+    backend: Optional[str] = Field(description="拾取所用推理后端: torch 或 onnx(不填则不限)", default=None)
+    limit: int = Field(description="返回的拾取条数上限", default=100)
+    output_file: Optional[str] = Field(description="把全部匹配拾取导出为CSV拾取表的路径(可选)", default=None)
+
+class TemplateMatchingParams(BaseModel):
+    """模板匹配检测参数定义"""
+    waveform_file: str = Field(description="连续波形文件路径")
+    template_picks: Optional[Union[str, List[str]]] = Field(description="模板拾取表(CSV)路径列表或通配符模式，可用AssociatePhases的拾取归属表", default=None)
+    template_waveforms: Optional[Union[str, List[str]]] = Field(description="包含模板事件的波形文件路径列表或通配符模式", default=None)
+    template_bank: Optional[str] = Field(description="模板库文件(NPZ)，存在时直接加载，否则保存新建的模板库", default=None)
+    freqmin: float = Field(description="带通滤波下限(Hz)", default=2.0)
+    freqmax: float = Field(description="带通滤波上限(Hz)", default=8.0)
+    pre_pick: float = Field(description="模板起点相对拾取的提前量(秒)", default=0.5)
+    template_length: float = Field(description="模板长度(秒)", default=3.0)
+    threshold: float = Field(description="检测阈值(网络平均互相关的MAD倍数)", default=8.0)
+    min_channels: int = Field(description="参与检测的模板至少需要的通道数", default=1)
+    chunk_seconds: float = Field(description="连续数据分块时长(秒)", default=3600.0)
+    output_file: Optional[str] = Field(description="检测表(CSV)输出路径，默认写入临时文件", default=None)
+
+class RenderFullResolutionParams(BaseModel):
+    """全分辨率图像渲染参数定义"""
+    render_id: str = Field(description="绘图工具返回的渲染ID")
+    wait: bool = Field(description="是否等待全分辨率图渲染完成", default=True)
 
 def get_tools() -> Dict[str, Callable]:
     """
@@ -25,6 +120,13 @@ def get_tools() -> Dict[str, Callable]:
         "EvaluateDetectionQuality": evaluate_detection_quality,
         "ListAvailableModels": list_available_models,
         "CompareModels": compare_models,
+        "DetectPhasesBatch": detect_phases_batch,
+        "DetectPhasesContinuous": detect_phases_continuous,
+        "ComparePrecisions": compare_precisions,
+        "AssociatePhases": associate_phases,
+        "QueryPicks": query_picks,
+        "TemplateMatching": detect_by_template_matching,
+        "RenderFullResolution": render_full_resolution,
         # 可以保留原有工具或注释掉
         # "DetectPhases": detect_phases, 
         # "PlotDetectionResult": plot_detection_result,
@@ -35,10 +137,17 @@ def get_tool_descriptions() -> Dict[str, str]:
     返回工具描述字典，供 LLMNode 提示词使用
     """
     return {
-        "DetectAndPlotPhases": "使用深度学习模型进行震相拾取并直接绘制结果，参数：waveform_file, model_name, p_threshold, s_threshold, detection_threshold, show_probability",
+        "DetectAndPlotPhases": "使用深度学习模型进行震相拾取并直接绘制结果（先返回缩略图，多台站波形一次推理并按台站返回拾取），参数：waveform_file, model_name, p_threshold, s_threshold, detection_threshold, show_probability, full_resolution, preprocessing, inference_mode, precision, backend, pretrigger",
         "EvaluateDetectionQuality": "评估震相拾取和事件检测质量，参数：detection_result",
-        "ListAvailableModels": "列出可用的震相拾取与事件检测模型，无参数",
-        "CompareModels": "比较多个模型的震相拾取结果，参数：waveform_file, models",
+        "ListAvailableModels": "列出可用的震相拾取与事件检测模型及加载状态，无参数",
+        "CompareModels": "比较多个模型的震相拾取结果（默认多线程并行执行各模型），参数：waveform_file, models, full_resolution, preprocessing, inference_mode, parallel",
+        "DetectPhasesBatch": "对多个波形文件批量进行震相拾取并输出汇总拾取表(CSV)，多文件多台站合并推理并统计各台站拾取数，参数：waveform_files, model_name, p_threshold, s_threshold, detection_threshold, preprocessing, output_file, batch_size, plot, full_resolution, precision, backend",
+        "DetectPhasesContinuous": "对长时间连续波形分块拾取震相（MiniSEED按时间窗读取，内存占用固定），拾取逐块写入拾取表(CSV)，参数：waveform_file, model_name, p_threshold, s_threshold, detection_threshold, chunk_seconds, preprocessing, output_file, batch_size, precision, backend, pretrigger",
+        "ComparePrecisions": "比较同一模型 fp32/bf16/int8 推理精度及 ONNX 后端的延迟、吞吐量与拾取一致性，参数：waveform_file, model_name, precisions, p_threshold, s_threshold, preprocessing, repeats, tolerance",
+        "AssociatePhases": "把多个台站的拾取表关联为地震事件（走时表网格搜索定位），输出事件表和拾取归属表(CSV)，参数：pick_tables, inventory, vp, vs, grid_spacing_km, depths_km, tolerance, min_picks, min_stations, output_file",
+        "QueryPicks": "查询拾取目录中历次检测保存的拾取(按台站、震相、时间范围、概率、模型、推理精度和后端筛选)，不读取波形、不运行模型，参数：station, phase, start_time, end_time, min_probability, model_name, precision, backend, limit, output_file",
+        "TemplateMatching": "模板匹配(匹配滤波)检测：用已知事件波形与连续数据做基于FFT的归一化互相关，检测相似事件，输出检测表(CSV)，参数：waveform_file, template_picks, template_waveforms, template_bank, freqmin, freqmax, pre_pick, template_length, threshold, min_channels, chunk_seconds, output_file",
+        "RenderFullResolution": "获取绘图工具对应的全分辨率图像，参数：render_id, wait",
     }
 
 def get_tool_param_models() -> Dict[str, Any]:
@@ -47,4 +156,11 @@ def get_tool_param_models() -> Dict[str, Any]:
     """
     return {
         "DetectAndPlotPhases": DetectAndPlotPhasesParams,
+        "DetectPhasesBatch": DetectPhasesBatchParams,
+        "DetectPhasesContinuous": DetectPhasesContinuousParams,
+        "ComparePrecisions": ComparePrecisionsParams,
+        "AssociatePhases": AssociatePhasesParams,
+        "QueryPicks": QueryPicksParams,
+        "TemplateMatching": TemplateMatchingParams,
+        "RenderFullResolution": RenderFullResolutionParams,
     }
\ No newline at end of file
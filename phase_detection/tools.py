@@ -3,47 +3,336 @@ import numpy as np
 import matplotlib.pyplot as plt
 import tempfile
 import logging
-from typing import Dict, Any, List
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Union
 from pydantic import BaseModel, Field
+import torch
 import seisbench.models as sbm
 from obspy import Stream, read, UTCDateTime
+from common.rendering import figure_renderer, render_full_resolution, decimate_trace
+from common.preprocessing import PreprocessingPipeline, stream_fingerprint
+from .picking import (extract_picks, extract_detections, validate_inference_mode, annotation_label,
+                      select_label, group_by_trace_id, classify_pick_table, classify_detection_table, table_records)
+from .batch import (PickBatch, PickTableWriter, channel_spans, group_by_station, resolve_waveform_files, station_key,
+                    write_pick_table)
+from .streaming import DEFAULT_CHUNK_SECONDS, iter_chunks, in_core, model_margin
+from .annotation_cache import AnnotationCache, annotation_cache, weights_version
+from .result_store import save_detection_result, DetectionResult
+from .precision import (PRECISIONS, apply_precision, pick_agreement, precision_supported,
+                        probability_differences, validate_precision)
+from .onnx_backend import BACKENDS, attach_onnx, onnx_available, validate_backend
+from .model_input import merge_channels, normalize_stream, shared_model_input
+from .pretrigger import apply_pretrigger, merge_reports, pretrigger_config, pretrigger_fingerprint
+from .pick_catalog import pick_catalog
+from .association import (DEFAULT_VP, DEFAULT_VS, associate_picks, read_pick_tables, station_coordinates,
+                          write_event_tables)
+from .template_matching import (DEFAULT_FREQMAX, DEFAULT_FREQMIN, DEFAULT_MAD_THRESHOLD, DEFAULT_PRE_PICK,
+                                DEFAULT_TEMPLATE_LENGTH, TemplateBank, build_templates, decluster_detections,
+                                match_templates,
+                                preprocess as template_preprocess, write_match_table)
+from common.response import response_remover
 
 logger = logging.getLogger(__name__)
 
+# 可用模型: 名称 -> (SeisBench 模型类名, 预训练权重)
+MODEL_SPECS = {
+    "phasenet": ("PhaseNet", "original"),
+    "eqtransformer": ("EQTransformer", "stead"),
+    "gpd": ("GPD", "instance"),
+    "basicphaseae": ("BasicPhaseAE", "stead"),
+}
+
+# 智能体构建时后台预加载的模型，逗号分隔；设为空或 none 关闭预加载
+PRELOAD_ENV = "PHASE_DETECTION_PRELOAD_MODELS"
+DEFAULT_PRELOAD_MODELS = "phasenet"
+
+# 已加载模型的内存预算(MB)，超出时按最近最少使用淘汰；设为 0 表示不限制
+MEMORY_BUDGET_ENV = "PHASE_DETECTION_MODEL_MEMORY_MB"
+DEFAULT_MEMORY_BUDGET_MB = 1024
+
+
+def model_footprint(model) -> int:
+    """估算模型占用内存（参数与缓冲区字节数）"""
+    total = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+def variant_key(model_name: str, variant: str = "fp32") -> str:
+    """模型缓存键：fp32 为模型名本身，其他推理变体为 "模型名@变体"，各变体分别缓存"""
+    return model_name if variant == "fp32" else f"{model_name}@{variant}"
+
+def inference_variant(precision: str = "fp32", backend: str = "torch") -> str:
+    """由推理精度和后端确定推理变体：fp32、bf16、int8 或 onnx"""
+    precision, backend = validate_precision(precision), validate_backend(backend)
+    if backend == "onnx":
+        if precision != "fp32":
+            raise ValueError("ONNX 后端仅支持 fp32 精度")
+        return "onnx"
+    return precision
+
 # 模型管理器 - 负责加载和管理模型
 class ModelManager:
-    def __init__(self):
-        self.models = {}
-        self.available_models = {
-            "phasenet": "PhaseNet",
-            "eqtransformer": "EQTransformer",
-            "gpd": "GPD",
-            "basicphaseae": "BasicPhaseAE"
-        }
+    """加载并缓存 SeisBench 模型
+
+    模型可在智能体构建时由后台线程预加载（见 preload），请求到来时若模型
+    正在加载则等待同一次加载完成，不会重复加载。模型状态: warm(已加载)、
+    loading(加载中)、cold(未加载或已被淘汰)、failed(加载失败)。
+
+    已加载模型按最近使用顺序保存，总占用超过内存预算时淘汰最久未使用的模型。
+    工具通过 acquire/release（或 lease 上下文）登记正在使用的模型，持有租约的模型和
+    刚加载的模型不会被淘汰；租约全部释放后再按预算淘汰。get_model 不登记租约。
+
+    每个模型可按 fp32、bf16、int8 精度加载（见 precision.apply_precision），
+    或以 ONNX Runtime 后端加载（见 onnx_backend.attach_onnx），
+    不同推理变体以 variant_key 分别缓存、统计和淘汰。
+    """
+
+    def __init__(self, memory_budget_mb: Optional[float] = None):
+        if memory_budget_mb is None:
+            memory_budget_mb = float(os.environ.get(MEMORY_BUDGET_ENV, DEFAULT_MEMORY_BUDGET_MB))
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.models = OrderedDict()
+        self.footprints = {}
+        # 各模型变体当前的租约数（正在使用的调用方个数）
+        self.leases = {}
+        self.stats = {"hits": 0, "misses": 0, "loads": 0, "evictions": 0, "evicted_bytes": 0}
+        self._lock = threading.Lock()
+        self.available_models = {name: spec[0] for name, spec in MODEL_SPECS.items()}
+        self._status = {name: "cold" for name in MODEL_SPECS}
+        self.errors = {}
+        self.load_seconds = {}
+        self._load_locks = {}
+        self._executor = None
+        self._executor_lock = threading.Lock()
     
-    def get_model(self, model_name: str):
-        """获取或加载模型"""
+    def _normalize(self, model_name: str) -> str:
         model_name = model_name.lower()
         if model_name not in self.available_models:
             raise ValueError(f"不支持的模型: {model_name}, 可用模型: {list(self.available_models.keys())}")
+        return model_name
+    
+    def _load(self, model_name: str, variant: str = "fp32", lease: bool = False):
+        """加载模型，同一模型同一推理变体的并发加载只执行一次"""
+        key = variant_key(model_name, variant)
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            with self._lock:
+                model = self.models.get(key)
+                if model is not None:
+                    if lease:
+                        self.leases[key] = self.leases.get(key, 0) + 1
+                    return model
+            
+            class_name, weights = MODEL_SPECS[model_name]
+            logger.info(f"加载模型: {key} ({class_name}.from_pretrained('{weights}'))")
+            self._status[key] = "loading"
+            start = time.perf_counter()
+            try:
+                model = getattr(sbm, class_name).from_pretrained(weights)
+                if variant == "onnx":
+                    model = attach_onnx(model, model_name, weights_version(model, weights))
+                else:
+                    model = apply_precision(model, variant)
+            except Exception as e:
+                self._status[key] = "failed"
+                self.errors[key] = str(e)
+                raise
+            self.load_seconds[key] = time.perf_counter() - start
+            footprint = model_footprint(model) + getattr(model, "onnx_bytes", 0)
+            with self._lock:
+                self.models[key] = model
+                self.footprints[key] = footprint
+                self.stats["loads"] += 1
+                self._status[key] = "warm"
+                self.errors.pop(key, None)
+                if lease:
+                    self.leases[key] = self.leases.get(key, 0) + 1
+                self._evict(keep=key)
+            logger.info(f"模型 {key} 加载完成，用时 {self.load_seconds[key]:.2f}s，"
+                        f"占用 {footprint / 1024 / 1024:.1f}MB")
+            return model
+    
+    def _evict(self, keep: Optional[str] = None):
+        """超出内存预算时按LRU顺序淘汰未被租用的模型（调用方需持有 _lock）"""
+        if self.memory_budget <= 0:
+            return
+        while self.used_bytes() > self.memory_budget:
+            victim = next((name for name in self.models if name != keep and not self.leases.get(name)), None)
+            if victim is None:
+                break
+            self.models.pop(victim)
+            freed = self.footprints.pop(victim, 0)
+            self._status[victim] = "cold"
+            self.stats["evictions"] += 1
+            self.stats["evicted_bytes"] += freed
+            logger.info(f"内存预算不足，淘汰模型 {victim}，释放 {freed / 1024 / 1024:.1f}MB")
+    
+    def used_bytes(self) -> int:
+        """已加载模型的总占用"""
+        return sum(self.footprints.get(name, 0) for name in self.models)
+    
+    def get_model(self, model_name: str, precision: str = "fp32", backend: str = "torch", lease: bool = False):
+        """获取或加载模型
+
+        Args:
+            model_name: 模型名称
+            precision: 推理精度 fp32、bf16 或 int8
+            backend: 推理后端 torch 或 onnx
+            lease: 是否同时登记租约（须用 release 释放），见 acquire
+        """
+        model_name = self._normalize(model_name)
+        variant = inference_variant(precision, backend)
+        key = variant_key(model_name, variant)
+        with self._lock:
+            model = self.models.get(key)
+            if model is not None:
+                self.models.move_to_end(key)
+                self.stats["hits"] += 1
+                if lease:
+                    self.leases[key] = self.leases.get(key, 0) + 1
+                return model
+            self.stats["misses"] += 1
+        return self._load(model_name, variant, lease)
+
+    def acquire(self, model_name: str, precision: str = "fp32", backend: str = "torch"):
+        """获取模型并登记租约，使用期间不会被淘汰；用完后以相同参数调用 release"""
+        return self.get_model(model_name, precision, backend, lease=True)
+
+    def release(self, model_name: str, precision: str = "fp32", backend: str = "torch"):
+        """释放 acquire 登记的租约，并按内存预算淘汰此前因租约保留的模型"""
+        key = variant_key(self._normalize(model_name), inference_variant(precision, backend))
+        with self._lock:
+            count = self.leases.get(key, 0) - 1
+            if count > 0:
+                self.leases[key] = count
+            else:
+                self.leases.pop(key, None)
+            self._evict()
+
+    @contextmanager
+    def lease(self, model_name: str, precision: str = "fp32", backend: str = "torch"):
+        """在 with 块内租用模型"""
+        model = self.acquire(model_name, precision, backend)
+        try:
+            yield model
+        finally:
+            self.release(model_name, precision, backend)
+    
+    def _preload_one(self, model_name: str):
+        try:
+            self._load(model_name)
+        except Exception as e:
+            logger.error(f"预加载模型 {model_name} 失败: {e}")
+    
+    def preload(self, model_names: Optional[List[str]] = None) -> Dict[str, str]:
+        """在后台线程中预加载模型，立即返回各模型状态
+
+        Args:
+            model_names: 要预加载的模型，默认读取环境变量 PHASE_DETECTION_PRELOAD_MODELS
+        """
+        if model_names is None:
+            model_names = configured_preload_models()
         
-        if model_name not in self.models:
-            # 加载模型
-            logger.info(f"加载模型: {model_name}")
-            if model_name == "phasenet":
-                self.models[model_name] = sbm.PhaseNet.from_pretrained("original")
-            elif model_name == "eqtransformer":
-                self.models[model_name] = sbm.EQTransformer.from_pretrained("stead")
-            elif model_name == "gpd":
-                self.models[model_name] = sbm.GPD.from_pretrained("instance")
-            elif model_name == "basicphaseae":
-                self.models[model_name] = sbm.BasicPhaseAE.from_pretrained("stead")
+        with self._executor_lock:
+            if self._executor is None and model_names:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-preload")
         
-        return self.models[model_name]
+        for name in model_names:
+            try:
+                name = self._normalize(name)
+            except ValueError as e:
+                logger.warning(f"忽略预加载配置: {e}")
+                continue
+            if self._status[name] in ("warm", "loading"):
+                continue
+            self._status[name] = "loading"
+            self._executor.submit(self._preload_one, name)
+        return self.status()
+    
+    def status(self, model_name: Optional[str] = None, precision: str = "fp32", backend: str = "torch"):
+        """返回单个模型(指定精度和后端)或全部模型变体的状态"""
+        if model_name is not None:
+            key = variant_key(self._normalize(model_name), inference_variant(precision, backend))
+            return self._status.get(key, "cold")
+        return dict(self._status)
+    
+    def warm_models(self) -> List[str]:
+        """返回 fp32 变体已加载完成的模型名称"""
+        return [name for name in MODEL_SPECS if self._status.get(name) == "warm"]
+    
+    def warm_variants(self) -> List[str]:
+        """返回已加载完成的其他推理变体，如 phasenet@int8、phasenet@onnx"""
+        return [key for key, state in self._status.items() if state == "warm" and "@" in key]
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """返回模型缓存的占用与命中/淘汰统计"""
+        with self._lock:
+            return {
+                **self.stats,
+                "memory_budget_mb": round(self.memory_budget / 1024 / 1024, 1),
+                "used_mb": round(self.used_bytes() / 1024 / 1024, 1),
+                "loaded_models": list(self.models.keys()),
+                "leased_models": dict(self.leases),
+            }
+
+def configured_preload_models() -> List[str]:
+    """读取预加载模型配置"""
+    value = os.environ.get(PRELOAD_ENV, DEFAULT_PRELOAD_MODELS)
+    if value.strip().lower() in ("", "none"):
+        return []
+    return [name.strip() for name in value.split(",") if name.strip()]
 
 # 实例化模型管理器
 model_manager = ModelManager()
 
+def annotate_cached(model, model_name: str, st, waveform_hash: str, preprocessing_fingerprint: Optional[str] = None,
+                    variant: str = "fp32"):
+    """运行 model.annotate，结果按 (波形哈希, 模型, 权重版本与推理变体, 预处理) 缓存
+
+    Returns:
+        (标注 Stream, 是否命中缓存)
+    """
+    weights = variant_key(weights_version(model, MODEL_SPECS[model_name.lower()][1]), variant)
+    key = AnnotationCache.make_key(waveform_hash, model_name, weights, preprocessing_fingerprint)
+    annotations = annotation_cache.get(key)
+    if annotations is not None:
+        logger.info(f"{model_name} 标注结果命中缓存")
+        return annotations, True
+    annotations = model.annotate(st)
+    annotation_cache.put(key, annotations)
+    return annotations, False
+
+_torch_threads_lock = threading.Lock()
+_torch_threads_state = {"users": 0, "previous": None}
+
+@contextmanager
+def parallel_torch_threads(num_threads: int):
+    """CompareModels 并行执行各模型期间减少 torch 算子内部线程数，避免超额订阅CPU
+
+    torch 线程数是进程级设置，期间同一进程中其他工具的推理也只能使用较少的线程，
+    因此只用于 CompareModels 的并行路径。并发的调用方不互相等待，共用其中最小的线程数，
+    最后一个退出时恢复原值。
+    """
+    with _torch_threads_lock:
+        if _torch_threads_state["users"] == 0:
+            _torch_threads_state["previous"] = torch.get_num_threads()
+        _torch_threads_state["users"] += 1
+        if num_threads < torch.get_num_threads():
+            torch.set_num_threads(num_threads)
+    try:
+        yield
+    finally:
+        with _torch_threads_lock:
+            _torch_threads_state["users"] -= 1
+            if _torch_threads_state["users"] == 0:
+                torch.set_num_threads(_torch_threads_state["previous"])
+
 def check_required_params(params: dict, required: list):
     """检查必需参数是否齐全，返回缺失项列表"""
     missing = [p for p in required if not params.get(p)]
@@ -55,9 +344,27 @@ def detect_and_plot_phases(
     p_threshold: float = 0.5, 
     s_threshold: float = 0.5,
     detection_threshold: float = 0.3,
-    show_probability: bool = True
+    show_probability: bool = True,
+    full_resolution: str = "lazy",
+    preprocessing: Optional[List[Dict[str, Any]]] = None,
+    inference_mode: str = "single_pass",
+    precision: str = "fp32",
+    backend: str = "torch",
+    pretrigger: Union[bool, Dict[str, Any]] = False
 ) -> Dict[str, Any]:
-    """使用深度学习模型进行震相拾取并直接绘制结果"""
+    """使用深度学习模型进行震相拾取并直接绘制结果
+
+    图像先以低分辨率缩略图返回，全分辨率图由 full_resolution 控制
+    (lazy/background/immediate)，可通过 RenderFullResolution 工具获取。
+    preprocessing 为可选的预处理步骤列表，在送入模型前执行。
+    inference_mode 为 single_pass 时模型只推理一次，拾取直接从概率曲线提取；
+    为 classify 时沿用 model.classify 的结果（模型会再推理一次）。
+    precision 选择推理精度 fp32、bf16 或 int8（见 ComparePrecisions 的精度/速度对比），
+    backend 为 onnx 时使用导出的 ONNX 计算图在 ONNX Runtime 上推理。
+    多台站波形在一次 annotate 中完成推理，拾取按台站分组返回(picks_by_station)，图中显示第一个台站。
+    pretrigger 为 True(或参数字典 sta/lta/on/off/pad)时先做 STA/LTA 预触发，
+    只把触发段送入模型，返回结果的 pretrigger 字段给出跳过的数据比例。
+    """
     # 参数校验
     params = {"waveform_file": waveform_file}
     missing = check_required_params(params, ["waveform_file"])
@@ -68,12 +375,6 @@ def detect_and_plot_phases(
             "output": f"缺少参数：{', '.join(missing)}，请补充。"
         }
     
-    import os
-    import pickle
-    import numpy as np
-    import matplotlib.pyplot as plt
-    import re
-    
     logger.info(f"使用{model_name}进行震相拾取并绘图: {waveform_file}")
     
     def convert_numpy_types(obj):
@@ -90,165 +391,88 @@ def detect_and_plot_phases(
             return [convert_numpy_types(item) for item in obj]
         return obj
     
+    model = None
     try:
-        # 第1步：读取波形数据
+        # 第1步：读取波形数据并执行预处理(如果指定)
+        pipeline = PreprocessingPipeline.from_spec(preprocessing)
         st = read(waveform_file)
+        waveform_hash = stream_fingerprint(st)
+        if pipeline is not None:
+            st = pipeline.run_cached(st, source_key=waveform_hash)
         
-        # 检查并处理单通道情况
-        if len(st) == 1:
-            logger.info(f"检测到单通道数据，进行通道扩展处理")
-            original_trace = st[0]
-            
-            # 通道复制
-            from obspy import Stream
-            new_st = Stream()
-            new_st += original_trace
-            
-            # 复制两个通道并修改通道名
-            for suffix in ['N', 'E']:
-                trace_copy = original_trace.copy()
-                # 尝试保留原始通道名格式
-                if len(original_trace.stats.channel) >= 3:
-                    trace_copy.stats.channel = original_trace.stats.channel[:-1] + suffix
-                else:
-                    trace_copy.stats.channel = original_trace.stats.channel + suffix
-                new_st += trace_copy
-            
-            st = new_st
-            logger.info(f"扩展后通道: {[tr.stats.channel for tr in st]}")
+        # 合并间断/重叠的通道，单通道数据补齐为三分量（只读视图，不复制）
+        st = normalize_stream(st)
         
         # 第2步：获取模型并执行震相拾取
         try:
-            model = model_manager.get_model(model_name.lower())
+            inference_mode = validate_inference_mode(inference_mode)
+            variant = inference_variant(precision, backend)
+            trigger_config = pretrigger_config(pretrigger)
+            model = model_manager.acquire(model_name.lower(), precision, backend)
         except ValueError as e:
             return {"status": "error", "message": str(e)}
         
-        annotations = model.annotate(st)
-        output = model.classify(st, P_threshold=p_threshold, S_threshold=s_threshold)
+        # STA/LTA 预触发：安静时段不送入模型
+        model_st, trigger_report = st, None
+        if trigger_config is not None:
+            model_st, trigger_report = apply_pretrigger(st, trigger_config, model_margin(model))
         
-        # 第3步：提取震相拾取结果
-        picks_result = []
-        if hasattr(output, 'picks') and output.picks:
-            for pick in output.picks:
-                pick_info = {}
-                
-                # 安全提取震相类型
-                if hasattr(pick, 'phase'):
-                    pick_info["phase"] = pick.phase
-                elif hasattr(pick, 'phase_hint'):
-                    pick_info["phase"] = pick.phase_hint
-                else:
-                    # 如果无法确定相位，尝试推断
-                    if hasattr(pick, 'trace_id'):
-                        trace_id = pick.trace_id
-                        if 'Z' in trace_id:
-                            pick_info["phase"] = 'P'
-                        elif 'N' in trace_id or 'E' in trace_id:
-                            pick_info["phase"] = 'S'
-                        else:
-                            pick_info["phase"] = 'Unknown'
-                    else:
-                        pick_info["phase"] = 'Unknown'
-                
-                # 安全提取时间
-                if hasattr(pick, 'peak_time'):
-                    pick_info["time"] = pick.peak_time.isoformat()
-                elif hasattr(pick, 'time'):
-                    pick_info["time"] = pick.time.isoformat()
-                elif hasattr(pick, 'start_time'):
-                    pick_info["time"] = pick.start_time.isoformat()
-                
-                # 安全提取通道信息
-                if hasattr(pick, 'waveform_id'):
-                    waveform_id = pick.waveform_id
-                    if hasattr(waveform_id, 'network_code'):
-                        pick_info["network"] = waveform_id.network_code
-                    if hasattr(waveform_id, 'station_code'):
-                        pick_info["station"] = waveform_id.station_code
-                    if hasattr(waveform_id, 'channel_code'):
-                        pick_info["channel"] = waveform_id.channel_code
-                    if hasattr(waveform_id, 'location_code'):
-                        pick_info["location"] = waveform_id.location_code
-                elif hasattr(pick, 'trace_id'):
-                    pick_info["trace_id"] = pick.trace_id
-                
-                # 安全提取概率
-                if hasattr(pick, 'probability'):
-                    pick_info["probability"] = float(pick.probability)
-                elif hasattr(pick, 'peak_value'):
-                    pick_info["probability"] = float(pick.peak_value)
-                
-                picks_result.append(pick_info)
+        # 相同波形、模型、权重、预处理和预触发参数的概率曲线已缓存时不再运行模型
+        input_fingerprint = "|".join(f for f in (pipeline.fingerprint if pipeline else "",
+                                                 pretrigger_fingerprint(trigger_config)) if f) or None
+        annotations, cache_hit = Stream(), False
+        if len(model_st):
+            annotations, cache_hit = annotate_cached(model, model_name, model_st, waveform_hash,
+                                                     input_fingerprint, variant)
+        output = None
+        if inference_mode == "classify" and len(model_st):
+            output = model.classify(model_st, P_threshold=p_threshold, S_threshold=s_threshold)
         
-        # 提取事件检测结果
-        detections_result = []
-        if hasattr(output, 'detections') and output.detections:
-            for detection in output.detections:
-                det_result = {}
-                
-                # 安全提取开始时间
-                if hasattr(detection, 'start_time'):
-                    det_result["start_time"] = detection.start_time.isoformat()
-                elif hasattr(detection, 'time'):
-                    det_result["start_time"] = detection.time.isoformat()
-                else:
-                    # 尝试从字符串中提取时间
-                    detection_str = str(detection)
-                    time_matches = re.findall(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}', detection_str)
-                    if time_matches and len(time_matches) > 0:
-                        det_result["start_time"] = time_matches[0]
-                
-                # 安全提取结束时间
-                if hasattr(detection, 'end_time'):
-                    det_result["end_time"] = detection.end_time.isoformat()
-                elif "start_time" in det_result:
-                    # 如果只有开始时间，假设持续30秒
-                    start = UTCDateTime(det_result["start_time"])
-                    det_result["end_time"] = (start + 30).isoformat()
-                
-                # 安全提取概率
-                if hasattr(detection, 'peak_value'):
-                    det_result["probability"] = float(detection.peak_value)
-                
-                # 安全提取trace_id
-                if hasattr(detection, 'trace_id'):
-                    det_result["trace_id"] = detection.trace_id
-                
-                detections_result.append(det_result)
+        # 第3步：提取震相拾取与事件检测结果
+        if inference_mode == "classify":
+            picks_result = table_records(classify_pick_table(output))
+            detections_result = table_records(classify_detection_table(output))
+        else:
+            # 单次推理：直接从概率曲线提取，避免 classify 再次运行模型
+            picks_result = extract_picks(annotations, {"P": p_threshold, "S": s_threshold})
+            detections_result = extract_detections(annotations, detection_threshold)
         
-        # 提取最大概率值
+        # 提取最大概率值（多台站时取所有台站的最大值）
         probabilities = {}
         try:
-            # 提取P波和S波最大概率
-            if annotations.select(channel="*P"):
-                p_probs = annotations.select(channel="*P")[0].data
-                p_max = np.max(p_probs)
-                probabilities["p_max_probability"] = float(p_max)
-            
-            if annotations.select(channel="*S"):
-                s_probs = annotations.select(channel="*S")[0].data
-                s_max = np.max(s_probs)
-                probabilities["s_max_probability"] = float(s_max)
-            
-            # 提取事件检测最大概率
-            if annotations.select(channel="*D"):
-                det_probs = annotations.select(channel="*D")[0].data
-                det_max = np.max(det_probs)
-                probabilities["detection_max_probability"] = float(det_max)
-            elif annotations.select(channel="*N"):
-                noise_probs = annotations.select(channel="*N")[0].data
-                det_probs = 1.0 - noise_probs
-                det_max = np.max(det_probs)
-                probabilities["detection_max_probability"] = float(det_max)
+            p_traces = select_label(annotations, "P")
+            if p_traces:
+                probabilities["p_max_probability"] = float(max(np.max(tr.data) for tr in p_traces))
+            
+            s_traces = select_label(annotations, "S")
+            if s_traces:
+                probabilities["s_max_probability"] = float(max(np.max(tr.data) for tr in s_traces))
+            
+            # 提取事件检测最大概率：有 Detection 道时直接取其最大值，否则由噪声道换算
+            det_traces = select_label(annotations, "Detection")
+            noise_traces = select_label(annotations, "N")
+            if det_traces:
+                probabilities["detection_max_probability"] = float(max(np.max(tr.data) for tr in det_traces))
+            elif noise_traces:
+                probabilities["detection_max_probability"] = float(max(1.0 - np.min(tr.data) for tr in noise_traces))
         except Exception as e:
             logger.error(f"提取概率值出错: {e}")
         
+        # 所有台站在一次 annotate 中完成推理，拾取按台站分组返回；图中只显示第一个台站
+        picks_by_station = group_by_trace_id(picks_result)
+        stations = sorted(group_by_station(st))
+        plot_station = station_key(st[0])
+        plot_st = Stream([tr for tr in st if station_key(tr) == plot_station])
+        plot_annotations = Stream([tr for tr in annotations if station_key(tr) == plot_station])
+        plot_picks = [p for p in picks_result if p.get("trace_id", plot_station) == plot_station]
+        plot_detections = [d for d in detections_result if d.get("trace_id", plot_station) == plot_station]
+        
         # 第4步：绘制结果
         # 创建图形
         if show_probability:
             # 创建带有多个子图的图形 - 动态确定子图数量
             n_subplots = 2  # 默认：波形 + 震相概率
-            if annotations.select(channel="*Detection"):
+            if select_label(plot_annotations, "Detection"):
                 n_subplots = 3  # 添加检测概率图
             
             fig, axs = plt.subplots(n_subplots, 1, figsize=(15, 4*n_subplots), sharex=True)
@@ -258,20 +482,20 @@ def detect_and_plot_phases(
                 axs = [axs]
             
             # 1. 绘制波形
-            offset = annotations[0].stats.starttime - st[0].stats.starttime
-            for i in range(min(3, len(st))):
-                axs[0].plot(st[i].times(), st[i].data, label=st[i].stats.channel)
-            axs[0].set_title("Seismic Waveforms")
+            for i in range(min(3, len(plot_st))):
+                axs[0].plot(*decimate_trace(plot_st[i]), label=plot_st[i].stats.channel)
+            axs[0].set_title(f"Seismic Waveforms ({plot_station})")
             axs[0].legend()
             
-            # 2. 绘制P波和S波概率
-            if annotations.select(channel="*P"):
-                p_probs = annotations.select(channel="*P")[0].data
-                axs[1].plot(annotations.select(channel="*P")[0].times() + offset, p_probs, 'r-', label="P-wave Probability")
+            def plot_curves(ax, traces, style, label):
+                """绘制概率曲线；预触发时每个触发段是一条单独的道"""
+                for j, tr in enumerate(traces):
+                    offset = tr.stats.starttime - plot_st[0].stats.starttime
+                    ax.plot(*decimate_trace(tr, offset), style, label=label if j == 0 else None)
             
-            if annotations.select(channel="*S"):
-                s_probs = annotations.select(channel="*S")[0].data
-                axs[1].plot(annotations.select(channel="*S")[0].times() + offset, s_probs, 'g-', label="S-wave Probability")
+            # 2. 绘制P波和S波概率
+            plot_curves(axs[1], select_label(plot_annotations, "P"), 'r-', "P-wave Probability")
+            plot_curves(axs[1], select_label(plot_annotations, "S"), 'g-', "S-wave Probability")
             
             axs[1].set_title("Phase Probabilities")
             axs[1].axhline(p_threshold, color='red', linestyle='--', alpha=0.5)
@@ -280,134 +504,82 @@ def detect_and_plot_phases(
             
             # 3. 绘制事件检测概率(如果有)
             if n_subplots > 2:
-                if annotations.select(channel="*Detection"):
-                    det_probs = annotations.select(channel="*Detection")[0].data
-                    axs[2].plot(annotations.select(channel="*Detection")[0].times() + offset, det_probs, 'b-', label="Event Detection Probability")
-                elif annotations.select(channel="*N"):
-                    noise_probs = annotations.select(channel="*N")[0].data
-                    det_probs = 1.0 - noise_probs
-                    axs[2].plot(annotations.select(channel="*N")[0].times() + offset, det_probs, 'b-', label="Event Detection Probability")
+                plot_curves(axs[2], select_label(plot_annotations, "Detection"), 'b-', "Event Detection Probability")
                 
                 axs[2].set_title("Event Detection Probability")
                 axs[2].axhline(detection_threshold, color='blue', linestyle='--', alpha=0.5)
                 axs[2].legend()
             
-            # 标记震相拾取和事件检测结果
-            if hasattr(output, 'picks') and output.picks:
-                for pick in output.picks:
-                    # 安全获取时间和相位
-                    pick_time = None
-                    phase = None
-                    
-                    # 获取时间
-                    if hasattr(pick, 'peak_time'):
-                        pick_time = pick.peak_time
-                    elif hasattr(pick, 'time'):
-                        pick_time = pick.time
-                    elif hasattr(pick, 'start_time'):
-                        pick_time = pick.start_time
-                        
-                    # 获取相位
-                    if hasattr(pick, 'phase'):
-                        phase = pick.phase
-                    elif hasattr(pick, 'phase_hint'):
-                        phase = pick.phase_hint
-                        
-                    if pick_time is not None:
-                        rel_time = (pick_time - st[0].stats.starttime)
-                        color = 'red' if phase == 'P' else 'green'
-                        
-                        for ax in axs:
-                            ax.axvline(rel_time, color=color, linestyle='--')
-                            # 在顶部添加标签
-                            ylim = ax.get_ylim()
-                            ax.text(rel_time, ylim[1]*0.95, phase, color=color, 
-                                   horizontalalignment='center', verticalalignment='top')
+            # 标记震相拾取结果
+            for pick in plot_picks:
+                if "time" not in pick:
+                    continue
+                phase = pick.get("phase")
+                rel_time = UTCDateTime(pick["time"]) - plot_st[0].stats.starttime
+                color = 'red' if phase == 'P' else 'green'
+                
+                for ax in axs:
+                    ax.axvline(rel_time, color=color, linestyle='--')
+                    # 在顶部添加标签
+                    ylim = ax.get_ylim()
+                    ax.text(rel_time, ylim[1]*0.95, phase, color=color, 
+                           horizontalalignment='center', verticalalignment='top')
             
             # 标记事件检测结果
-            if hasattr(output, 'detections') and output.detections:
-                for detection in output.detections:
-                    start_time = None
-                    end_time = None
-                    
-                    # 获取开始时间
-                    if hasattr(detection, 'start_time'):
-                        start_time = detection.start_time
-                    elif hasattr(detection, 'time'):
-                        start_time = detection.time
-                        
-                    # 获取结束时间
-                    if hasattr(detection, 'end_time'):
-                        end_time = detection.end_time
-                    elif start_time is not None:
-                        if hasattr(detection, 'duration'):
-                            end_time = start_time + detection.duration
-                        else:
-                            # 假设30秒的持续时间
-                            end_time = start_time + 30
-                    
-                    if start_time is not None and end_time is not None:
-                        start_rel = (start_time - st[0].stats.starttime)
-                        end_rel = (end_time - st[0].stats.starttime)
-                        
-                        for ax in axs:
-                            ax.axvspan(start_rel, end_rel, color='blue', alpha=0.1)
+            for detection in plot_detections:
+                if "start_time" not in detection or "end_time" not in detection:
+                    continue
+                start_rel = UTCDateTime(detection["start_time"]) - plot_st[0].stats.starttime
+                end_rel = UTCDateTime(detection["end_time"]) - plot_st[0].stats.starttime
+                
+                for ax in axs:
+                    ax.axvspan(start_rel, end_rel, color='blue', alpha=0.1)
         else:
             # 简单绘制，只包含波形和震相标记
             fig = plt.figure(figsize=(15, 5))
             ax = fig.add_subplot(111)
             
-            for i in range(min(3, len(st))):
-                ax.plot(st[i].times(), st[i].data, label=st[i].stats.channel)
+            for i in range(min(3, len(plot_st))):
+                ax.plot(*decimate_trace(plot_st[i]), label=plot_st[i].stats.channel)
             
             # 标记震相拾取
-            if hasattr(output, 'picks') and output.picks:
-                for pick in output.picks:
-                    pick_time = None
-                    phase = None
-                    
-                    # 获取时间
-                    if hasattr(pick, 'peak_time'):
-                        pick_time = pick.peak_time
-                    elif hasattr(pick, 'time'):
-                        pick_time = pick.time
-                    elif hasattr(pick, 'start_time'):
-                        pick_time = pick.start_time
-                        
-                    # 获取相位
-                    if hasattr(pick, 'phase'):
-                        phase = pick.phase
-                    elif hasattr(pick, 'phase_hint'):
-                        phase = pick.phase_hint
-                    
-                    if pick_time is not None:
-                        rel_time = (pick_time - st[0].stats.starttime)
-                        color = 'red' if phase == 'P' else 'green'
-                        label = f"{phase if phase else '未知'}波 ({pick_time.isoformat()})"
-                        ax.axvline(rel_time, color=color, linestyle='--', label=label)
+            for pick in plot_picks:
+                if "time" not in pick:
+                    continue
+                phase = pick.get("phase")
+                rel_time = UTCDateTime(pick["time"]) - plot_st[0].stats.starttime
+                color = 'red' if phase == 'P' else 'green'
+                label = f"{phase if phase else '未知'}波 ({pick['time']})"
+                ax.axvline(rel_time, color=color, linestyle='--', label=label)
             
             ax.legend()
-            ax.set_title("地震波形与震相拾取结果")
+            ax.set_title(f"地震波形与震相拾取结果 ({plot_station})")
         
-        # 保存图片
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as f:
-            plt.tight_layout()
-            fig.savefig(f.name, dpi=300, bbox_inches='tight')
-            img_path = f.name
-            
-            # 在Windows下打开图片
-            if os.name == 'nt':
-                try:
-                    os.startfile(img_path)
-                except:
-                    logger.warning(f"无法自动打开图像: {img_path}")
+        # 保存缩略图，全分辨率图按需或后台渲染
+        plt.tight_layout()
+        rendered = figure_renderer.save(fig, full_resolution)
+        img_path = rendered["plot_path"]
+        
+        # 在Windows下打开图片
+        if os.name == 'nt':
+            try:
+                os.startfile(img_path)
+            except:
+                logger.warning(f"无法自动打开图像: {img_path}")
         
-        # 保存数据供后续使用（如评估质量）
+        # 保存概率曲线与拾取结果供后续使用（如评估质量），不保存波形
         import uuid
         detection_id = str(uuid.uuid4())
-        with tempfile.NamedTemporaryFile(suffix=".pkl", delete=False) as f:
-            pickle.dump({"annotations": annotations, "output": output, "stream": st}, f)
-            data_cache_path = f.name
+        data_cache_path = save_detection_result(
+            annotations,
+            detection_id=detection_id,
+            model=model_name,
+            waveform_file=waveform_file,
+            picks=convert_numpy_types(picks_result),
+            detections=convert_numpy_types(detections_result),
+        )
+        catalog_run_id = pick_catalog.record("DetectAndPlotPhases", picks_result, model_name,
+                                             validate_precision(precision), validate_backend(backend), waveform_file)
 
         # 格式化震相时间信息
         p_picks = [p for p in picks_result if p.get("phase") == "P"]
@@ -424,24 +596,37 @@ def detect_and_plot_phases(
                 event_end_str = f"至 {detections_result[0]['end_time']}"
 
         # 创建详细消息
-        detailed_message = f"""使用{model_name}成功完成震相拾取与绘图，找到{len(picks_result)}个震相和{len(detections_result)}个事件
+        detailed_message = f"""使用{model_name}成功完成震相拾取与绘图，{len(stations)}个台站共找到{len(picks_result)}个震相和{len(detections_result)}个事件
         震相时间信息:
         - P波到达时间: {p_time_str}
         - S波到达时间: {s_time_str}
         - 事件时间: {event_time_str} {event_end_str}"""
+        if trigger_report is not None:
+            detailed_message += (f"\n        - STA/LTA 预触发: 保留 {trigger_report['segments']} 段，"
+                                 f"跳过 {trigger_report['skipped_fraction']:.1%} 的数据")
         
         # 第5步：整合结果
         result = {
             "status": "success",
             "detection_id": detection_id,
             "model": model_name,
+            "inference_mode": inference_mode,
+            "precision": validate_precision(precision),
+            "backend": validate_backend(backend),
+            "annotation_cache": "hit" if cache_hit else "miss",
             "picks_count": len(picks_result),
             "detections_count": len(detections_result),
             "picks": picks_result,
             "detections": detections_result,
+            "stations": stations,
+            "plot_station": plot_station,
+            "picks_by_station": picks_by_station,
+            "pretrigger": trigger_report,
             "probabilities": probabilities,
-            "plot_path": img_path,
+            **rendered,
             "data_cache": data_cache_path,
+            "catalog_run_id": catalog_run_id,
+            "preprocessing": pipeline.to_spec() if pipeline else None,
             "message": detailed_message
         }
         
@@ -454,11 +639,26 @@ def detect_and_plot_phases(
         import traceback
         logger.error(traceback.format_exc())
         return {"status": "error", "message": f"震相拾取与绘图失败: {str(e)}"}
+    finally:
+        if model is not None:
+            model_manager.release(model_name.lower(), precision, backend)
+
+
+def grade_probability(value: float) -> str:
+    """按最大概率评估拾取/检测质量"""
+    if value > 0.9:
+        return "极好"
+    if value > 0.7:
+        return "良好"
+    if value > 0.5:
+        return "一般"
+    return "较差"
+
 def evaluate_detection_quality(detection_result: str) -> Dict[str, Any]:
     """评估震相拾取和事件检测质量
     
     Args:
-        detection_result: 检测结果标识符
+        detection_result: 检测结果目录（DetectAndPlotPhases 返回的 data_cache）
         
     Returns:
         包含评估结果的字典
@@ -475,13 +675,8 @@ def evaluate_detection_quality(detection_result: str) -> Dict[str, Any]:
     logger.info(f"评估检测质量: {detection_result}")
     
     try:
-        # 加载缓存的数据
-        import pickle
-        with open(detection_result, "rb") as f:
-            data = pickle.load(f)
-        
-        annotations = data["annotations"]
-        output = data["output"]
+        # 只读取结果头信息，概率通道按需内存映射
+        result = DetectionResult(detection_result)
         
         # 提取震相概率
         probabilities = {}
@@ -489,64 +684,24 @@ def evaluate_detection_quality(detection_result: str) -> Dict[str, Any]:
         s_quality = "未知"
         event_quality = "未知"
         
-        if annotations.select(channel="*P"):
-            p_probs = annotations.select(channel="*P")[0].data
-            p_max = float(np.max(p_probs))
+        p_max = result.max_probability("P")
+        if p_max is not None:
             probabilities["p_max"] = p_max
-            
-            # 评估P波拾取质量
-            if p_max > 0.9:
-                p_quality = "极好"
-            elif p_max > 0.7:
-                p_quality = "良好"
-            elif p_max > 0.5:
-                p_quality = "一般"
-            else:
-                p_quality = "较差"
+            p_quality = grade_probability(p_max)
         
-        if annotations.select(channel="*S"):
-            s_probs = annotations.select(channel="*S")[0].data
-            s_max = float(np.max(s_probs))
+        s_max = result.max_probability("S")
+        if s_max is not None:
             probabilities["s_max"] = s_max
-            
-            # 评估S波拾取质量
-            if s_max > 0.9:
-                s_quality = "极好"
-            elif s_max > 0.7:
-                s_quality = "良好"
-            elif s_max > 0.5:
-                s_quality = "一般"
-            else:
-                s_quality = "较差"
+            s_quality = grade_probability(s_max)
         
-        # 评估事件检测质量
-        if annotations.select(channel="*D"):
-            det_probs = annotations.select(channel="*D")[0].data
-            det_max = float(np.max(det_probs))
+        # 评估事件检测质量：优先使用检测通道，否则用 1 - 噪声概率
+        det_max = result.max_probability("Detection")
+        if det_max is None:
+            noise_min = result.min_probability("N")
+            det_max = None if noise_min is None else 1.0 - noise_min
+        if det_max is not None:
             probabilities["det_max"] = det_max
-            
-            if det_max > 0.9:
-                event_quality = "极好"
-            elif det_max > 0.7:
-                event_quality = "良好"
-            elif det_max > 0.5:
-                event_quality = "一般"
-            else:
-                event_quality = "较差"
-        elif annotations.select(channel="*N"):
-            noise_probs = annotations.select(channel="*N")[0].data
-            det_probs = 1.0 - noise_probs
-            det_max = float(np.max(det_probs))
-            probabilities["det_max"] = det_max
-            
-            if det_max > 0.9:
-                event_quality = "极好"
-            elif det_max > 0.7:
-                event_quality = "良好"
-            elif det_max > 0.5:
-                event_quality = "一般"
-            else:
-                event_quality = "较差"
+            event_quality = grade_probability(det_max)
         
         # 返回评估结果
         return {
@@ -588,21 +743,47 @@ def list_available_models() -> Dict[str, Any]:
             }
         }
         
+        # 附加模型加载状态，warm 表示已在内存中，可直接使用
+        for display_name, info in models_info.items():
+            name = display_name.lower()
+            info["load_status"] = model_manager.status(name)
+            if name in model_manager.load_seconds:
+                info["load_seconds"] = round(model_manager.load_seconds[name], 3)
+            if name in model_manager.footprints:
+                info["memory_mb"] = round(model_manager.footprints[name] / 1024 / 1024, 1)
+            if name in model_manager.errors:
+                info["load_error"] = model_manager.errors[name]
+        warm_models = [model_manager.available_models[name] for name in model_manager.warm_models()]
+        
         return {
             "status": "success",
             "available_models": list(models_info.keys()),
+            "warm_models": warm_models,
+            "warm_variants": model_manager.warm_variants(),
+            "precisions": {p: precision_supported(p) for p in PRECISIONS},
+            "backends": {"torch": True, "onnx": onnx_available()},
+            "model_cache": model_manager.cache_stats(),
+            "annotation_cache": annotation_cache.cache_stats(),
             "models_info": models_info,
-            "message": "成功获取可用模型列表"
+            "message": f"成功获取可用模型列表，已预热模型: {', '.join(warm_models) if warm_models else '无'}"
         }
     except Exception as e:
         return {"status": "error", "message": f"获取模型列表失败: {str(e)}"}
 
-def compare_models(waveform_file: str, models: List[str] = None) -> Dict[str, Any]:
+def compare_models(waveform_file: str, models: Optional[List[str]] = None, full_resolution: str = "lazy",
+                   preprocessing: Optional[List[Dict[str, Any]]] = None,
+                   inference_mode: str = "single_pass",
+                   parallel: bool = True) -> Dict[str, Any]:
     """比较多个模型的震相拾取结果，将结果绘制到一张图上
     
     Args:
         waveform_file: 波形数据文件路径
         models: 要比较的模型列表，默认为所有可用模型
+        full_resolution: 全分辨率图渲染方式，可选值：lazy, background, immediate
+        preprocessing: 可选的预处理步骤列表，在送入模型前执行
+        inference_mode: single_pass(每个模型只推理一次) 或 classify(沿用 model.classify)
+        parallel: 是否多线程并行执行各模型，总耗时接近最慢的单个模型；并行期间 torch 算子内部
+            线程数按模型数均分（进程级设置，见 parallel_torch_threads）
         
     Returns:
         包含比较结果的字典
@@ -623,51 +804,69 @@ def compare_models(waveform_file: str, models: List[str] = None) -> Dict[str, An
         models = ["PhaseNet", "EQTransformer", "BasicPhaseAE", "GPD"]
 
     try:
-        # 第1步：读取波形数据
+        inference_mode = validate_inference_mode(inference_mode)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+
+    try:
+        # 第1步：读取波形数据并执行预处理(如果指定)
+        pipeline = PreprocessingPipeline.from_spec(preprocessing)
         st = read(waveform_file)
+        waveform_hash = stream_fingerprint(st)
+        if pipeline is not None:
+            st = pipeline.run_cached(st, source_key=waveform_hash)
         
-        # 检查并处理单通道情况
-        if len(st) == 1:
-            logger.info(f"检测到单通道数据，进行通道扩展处理")
-            original_trace = st[0]
-            
-            # 通道复制
-            from obspy import Stream
-            new_st = Stream()
-            new_st += original_trace
-            
-            # 复制两个通道并修改通道名
-            for suffix in ['N', 'E']:
-                trace_copy = original_trace.copy()
-                # 尝试保留原始通道名格式
-                if len(original_trace.stats.channel) >= 3:
-                    trace_copy.stats.channel = original_trace.stats.channel[:-1] + suffix
-                else:
-                    trace_copy.stats.channel = original_trace.stats.channel + suffix
-                new_st += trace_copy
-            
-            st = new_st
-            logger.info(f"扩展后通道: {[tr.stats.channel for tr in st]}")
+        # 合并间断/重叠的通道；单通道补齐三分量在共享输入转换为 float32 之后进行，补出的分量共享同一数组
+        st = merge_channels(st)
         
         # 第2步：执行各模型并收集结果
+        # 同一采样率的模型共享一次重采样和 float32 转换的结果，各自拿到零拷贝视图
+        input_key = f"{waveform_hash}|{pipeline.fingerprint if pipeline else ''}"
+        
+        def run_model(model_name):
+            logger.info(f"加载模型: {model_name}")
+            start = time.perf_counter()
+            with model_manager.lease(model_name.lower()) as model:
+                model_input = shared_model_input.get(st, input_key, model.sampling_rate)
+                
+                # 获取模型注释，并从中(或 classify 输出中)提取拾取
+                annotations, _ = annotate_cached(model, model_name, model_input, waveform_hash,
+                                                 pipeline.fingerprint if pipeline else None)
+                if inference_mode == "classify":
+                    output = model.classify(model_input, P_threshold=0.5, S_threshold=0.5)
+                    picks_list = table_records(classify_pick_table(output))
+                else:
+                    picks_list = extract_picks(annotations, {"P": 0.5, "S": 0.5})
+            return annotations, picks_list, time.perf_counter() - start
+        
+        outcomes = {}
+        wall_start = time.perf_counter()
+        if parallel and len(models) > 1:
+            # 多线程并行执行，按线程数均分 torch 算子内部线程，避免超额订阅CPU
+            workers = min(len(models), os.cpu_count() or 1)
+            with parallel_torch_threads(max(1, (os.cpu_count() or 1) // workers)):
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="compare-models") as executor:
+                    futures = {name: executor.submit(run_model, name) for name in models}
+                    for name, future in futures.items():
+                        try:
+                            outcomes[name] = future.result()
+                        except Exception as e:
+                            logger.error(f"模型 {name} 处理失败: {e}")
+        else:
+            for name in models:
+                try:
+                    outcomes[name] = run_model(name)
+                except Exception as e:
+                    logger.error(f"模型 {name} 处理失败: {e}")
+        wall_seconds = time.perf_counter() - wall_start
+        
         model_results = {}
         model_annotations = {}
-        
+        model_seconds = {}
         for model_name in models:
-            try:
-                logger.info(f"加载模型: {model_name}")
-                model = model_manager.get_model(model_name.lower())
-                
-                # 获取模型注释和输出
-                annotations = model.annotate(st)
-                output = model.classify(st, P_threshold=0.5, S_threshold=0.5)
-                
-                model_results[model_name] = output
-                model_annotations[model_name] = annotations
-                
-                logger.info(f"模型 {model_name} 处理完成")
-            except Exception as e:
-                logger.error(f"模型 {model_name} 处理失败: {e}")
+            if model_name in outcomes:
+                model_annotations[model_name], model_results[model_name], model_seconds[model_name] = outcomes[model_name]
+                logger.info(f"模型 {model_name} 处理完成，用时 {model_seconds[model_name]:.2f}s")
         
         # 第3步：创建比较图 - 与detect_and_plot_phases保持一致的样式
         # 创建包含多个子图的大图 - 4个模型，每个模型2行子图（波形+概率）
@@ -689,7 +888,7 @@ def compare_models(waveform_file: str, models: List[str] = None) -> Dict[str, An
             if model_name not in model_annotations:
                 continue
             
-            output = model_results[model_name]
+            picks_list = model_results[model_name]
             annotations = model_annotations[model_name]
             
             # 计算时间偏移
@@ -701,7 +900,7 @@ def compare_models(waveform_file: str, models: List[str] = None) -> Dict[str, An
             
             # 绘制波形
             for j in range(min(3, len(st))):
-                ax_wave.plot(st[j].times(), st[j].data, label=st[j].stats.channel)
+                ax_wave.plot(*decimate_trace(st[j]), label=st[j].stats.channel)
             
             ax_wave.set_title(f"{model_name} - Seismic Waveforms", fontsize=12)
             ax_wave.legend(loc='upper right')
@@ -711,13 +910,12 @@ def compare_models(waveform_file: str, models: List[str] = None) -> Dict[str, An
             axs.append(ax_prob)
             
             # 绘制P波和S波概率
-            if annotations.select(channel="*P"):
-                p_probs = annotations.select(channel="*P")[0].data
-                ax_prob.plot(annotations.select(channel="*P")[0].times() + offset, p_probs, 'r-', label="P-wave Probability")
+            p_traces, s_traces = select_label(annotations, "P"), select_label(annotations, "S")
+            if p_traces:
+                ax_prob.plot(*decimate_trace(p_traces[0], offset), 'r-', label="P-wave Probability")
             
-            if annotations.select(channel="*S"):
-                s_probs = annotations.select(channel="*S")[0].data
-                ax_prob.plot(annotations.select(channel="*S")[0].times() + offset, s_probs, 'g-', label="S-wave Probability")
+            if s_traces:
+                ax_prob.plot(*decimate_trace(s_traces[0], offset), 'g-', label="S-wave Probability")
             
             ax_prob.set_title(f"{model_name} - Phase Probabilities", fontsize=12)
             ax_prob.axhline(0.5, color='red', linestyle='--', alpha=0.5)
@@ -729,111 +927,54 @@ def compare_models(waveform_file: str, models: List[str] = None) -> Dict[str, An
                 ax_prob.set_xlabel("Time (seconds)")
             
             # 标记震相拾取结果
-            if hasattr(output, 'picks') and output.picks:
-                for pick in output.picks:
-                    # 安全获取时间和相位
-                    pick_time = None
-                    phase = None
-                    
-                    # 获取时间
-                    if hasattr(pick, 'peak_time'):
-                        pick_time = pick.peak_time
-                    elif hasattr(pick, 'time'):
-                        pick_time = pick.time
-                    elif hasattr(pick, 'start_time'):
-                        pick_time = pick.start_time
-                        
-                    # 获取相位
-                    if hasattr(pick, 'phase'):
-                        phase = pick.phase
-                    elif hasattr(pick, 'phase_hint'):
-                        phase = pick.phase_hint
-                        
-                    if pick_time is not None:
-                        rel_time = (pick_time - st[0].stats.starttime)
-                        color = 'red' if phase == 'P' else 'green'
-                        
-                        # 在两个子图上都标记震相线
-                        for ax in [ax_wave, ax_prob]:
-                            ax.axvline(rel_time, color=color, linestyle='--')
-                            # 在顶部添加标签
-                            ylim = ax.get_ylim()
-                            ax.text(rel_time, ylim[1]*0.95, phase, color=color, 
-                                    horizontalalignment='center', verticalalignment='top')
+            for pick in picks_list:
+                if "time" not in pick:
+                    continue
+                phase = pick.get("phase")
+                rel_time = UTCDateTime(pick["time"]) - st[0].stats.starttime
+                color = 'red' if phase == 'P' else 'green'
+                
+                # 在两个子图上都标记震相线
+                for ax in [ax_wave, ax_prob]:
+                    ax.axvline(rel_time, color=color, linestyle='--')
+                    # 在顶部添加标签
+                    ylim = ax.get_ylim()
+                    ax.text(rel_time, ylim[1]*0.95, phase, color=color, 
+                            horizontalalignment='center', verticalalignment='top')
         
         # 调整布局
         plt.tight_layout()
         fig.subplots_adjust(top=0.95)  # 为总标题留出空间
         
-        # 保存图片
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as f:
-            fig.savefig(f.name, dpi=300, bbox_inches='tight')
-            img_path = f.name
-            
-            # 在Windows下打开图片
-            if os.name == 'nt':
-                try:
-                    os.startfile(img_path)
-                except:
-                    logger.warning(f"无法自动打开图像: {img_path}")
+        # 保存缩略图，全分辨率图按需或后台渲染
+        rendered = figure_renderer.save(fig, full_resolution)
+        img_path = rendered["plot_path"]
+        
+        # 在Windows下打开图片
+        if os.name == 'nt':
+            try:
+                os.startfile(img_path)
+            except:
+                logger.warning(f"无法自动打开图像: {img_path}")
         
         # 收集各模型的震相拾取结果用于返回
         comparison_results = {}
         for model_name in model_results:
-            output = model_results[model_name]
+            picks_list = model_results[model_name]
             annotations = model_annotations[model_name]
             
-            # 提取震相拾取结果
-            picks_list = []
-            if hasattr(output, 'picks') and output.picks:
-                for pick in output.picks:
-                    pick_info = {}
-                    
-                    # 安全提取震相类型
-                    if hasattr(pick, 'phase'):
-                        pick_info["phase"] = pick.phase
-                    elif hasattr(pick, 'phase_hint'):
-                        pick_info["phase"] = pick.phase_hint
-                    else:
-                        # 如果无法确定相位，尝试推断
-                        if hasattr(pick, 'trace_id'):
-                            trace_id = pick.trace_id
-                            if 'Z' in trace_id:
-                                pick_info["phase"] = 'P'
-                            elif 'N' in trace_id or 'E' in trace_id:
-                                pick_info["phase"] = 'S'
-                            else:
-                                pick_info["phase"] = 'Unknown'
-                        else:
-                            pick_info["phase"] = 'Unknown'
-                    
-                    # 安全提取时间
-                    if hasattr(pick, 'peak_time'):
-                        pick_info["time"] = pick.peak_time.isoformat()
-                    elif hasattr(pick, 'time'):
-                        pick_info["time"] = pick.time.isoformat()
-                    elif hasattr(pick, 'start_time'):
-                        pick_info["time"] = pick.start_time.isoformat()
-                    
-                    # 安全提取概率
-                    if hasattr(pick, 'probability'):
-                        pick_info["probability"] = float(pick.probability)
-                    elif hasattr(pick, 'peak_value'):
-                        pick_info["probability"] = float(pick.peak_value)
-                    
-                    picks_list.append(pick_info)
-            
             # 提取最大概率值
             probabilities = {}
             try:
                 # 提取P波和S波最大概率
-                if annotations.select(channel="*P"):
-                    p_probs = annotations.select(channel="*P")[0].data
+                p_traces, s_traces = select_label(annotations, "P"), select_label(annotations, "S")
+                if p_traces:
+                    p_probs = p_traces[0].data
                     p_max = np.max(p_probs)
                     probabilities["p_max_probability"] = float(p_max)
                 
-                if annotations.select(channel="*S"):
-                    s_probs = annotations.select(channel="*S")[0].data
+                if s_traces:
+                    s_probs = s_traces[0].data
                     s_max = np.max(s_probs)
                     probabilities["s_max_probability"] = float(s_max)
             except Exception as e:
@@ -841,6 +982,7 @@ def compare_models(waveform_file: str, models: List[str] = None) -> Dict[str, An
             
             # 将此模型的结果添加到比较结果中
             comparison_results[model_name] = {
+                "elapsed_seconds": round(model_seconds[model_name], 3),
                 "picks_count": len(picks_list),
                 "picks": picks_list,
                 "probabilities": probabilities
@@ -871,14 +1013,710 @@ def compare_models(waveform_file: str, models: List[str] = None) -> Dict[str, An
         # 返回结果
         return {
             "status": "success",
-            "plot_path": img_path,
+            **rendered,
             "comparison_results": comparison_results,
             "summary": "\n".join(summary),
             "message": f"Successfully compared phase picking results from {len(model_results)} models",
-            "waveform_file": waveform_file
+            "waveform_file": waveform_file,
+            "inference_mode": inference_mode,
+            "parallel": parallel,
+            "wall_seconds": round(wall_seconds, 3),
+            "preprocessing": pipeline.to_spec() if pipeline else None
         }
     except Exception as e:
         logger.error(f"比较模型结果失败: {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
-        return {"status": "error", "message": f"比较模型结果失败: {str(e)}"}
\ No newline at end of file
+        return {"status": "error", "message": f"比较模型结果失败: {str(e)}"}
+
+
+def detect_phases_batch(
+    waveform_files: Union[str, List[str]],
+    model_name: str = "PhaseNet",
+    p_threshold: float = 0.5,
+    s_threshold: float = 0.5,
+    detection_threshold: float = 0.3,
+    preprocessing: Optional[List[Dict[str, Any]]] = None,
+    output_file: Optional[str] = None,
+    batch_size: int = 256,
+    plot: bool = False,
+    full_resolution: str = "lazy",
+    precision: str = "fp32",
+    backend: str = "torch"
+) -> Dict[str, Any]:
+    """对多个波形文件批量进行震相拾取，结果写入一个汇总拾取表(CSV)
+    
+    多个文件、多个台站的波形合并后一次调用 annotate，所有台站的窗口在模型前向计算中
+    共享批次；同一台站不同分量的文件合并为一个台站组，同一通道时间段重叠的文件会分到
+    不同批次。返回结果包含各台站的拾取数。默认不绘图。
+    
+    Args:
+        waveform_files: 文件路径列表、逗号分隔的路径或通配符模式(如 "/data/*.mseed")
+        model_name: 模型名称
+        p_threshold: P波概率阈值
+        s_threshold: S波概率阈值
+        detection_threshold: 事件检测阈值
+        preprocessing: 可选的预处理步骤列表，对每个文件分别执行
+        output_file: 拾取表输出路径，默认写入临时文件
+        batch_size: 模型推理的窗口批大小
+        plot: 是否绘制各文件拾取时间分布的汇总图
+        full_resolution: 全分辨率图渲染方式，可选值：lazy, background, immediate
+        precision: 推理精度 fp32、bf16 或 int8
+        backend: 推理后端 torch 或 onnx
+        
+    Returns:
+        包含拾取表路径和统计信息的字典
+    """
+    params = {"waveform_files": waveform_files}
+    missing = check_required_params(params, ["waveform_files"])
+    if missing:
+        return {
+            "clarification_needed": True,
+            "missing_params": missing,
+            "output": f"缺少参数：{', '.join(missing)}，请补充。"
+        }
+    
+    files, unmatched = resolve_waveform_files(waveform_files)
+    if not files:
+        return {"status": "error", "message": f"没有找到波形文件: {waveform_files}"}
+    
+    try:
+        pipeline = PreprocessingPipeline.from_spec(preprocessing)
+        model = model_manager.acquire(model_name.lower(), precision, backend)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    logger.info(f"使用{model_name}批量拾取 {len(files)} 个文件")
+    
+    try:
+        rows = []
+        failed = [{"file": entry, "error": "未找到文件"} for entry in unmatched]
+        detections_count = 0
+        batches = 0
+        stations = set()
+        thresholds = {"P": p_threshold, "S": s_threshold}
+        source = waveform_files if isinstance(waveform_files, str) else ",".join(waveform_files)
+        catalog_run_id = pick_catalog.start_run("DetectPhasesBatch", model_name, validate_precision(precision),
+                                                validate_backend(backend), source)
+        
+        def run_batch(batch):
+            nonlocal detections_count, batches
+            # 间断合并与单通道扩展在批次合并后按通道/台站进行，分量分别存放在不同文件的台站不会被误扩展
+            annotations = model.annotate(normalize_stream(batch.stream), batch_size=batch_size)
+            batches += 1
+            stations.update(batch.stations)
+            picks = extract_picks(annotations, thresholds)
+            for pick in picks:
+                pick["file"] = batch.source_file(pick["trace_id"], UTCDateTime(pick["time"]).timestamp)
+            rows.extend(picks)
+            pick_catalog.add_picks(catalog_run_id, picks, model_name)
+            detections_count += len(extract_detections(annotations, detection_threshold))
+        
+        batch = PickBatch()
+        for path in files:
+            try:
+                st = read(path)
+                if pipeline is not None:
+                    st = pipeline.run(st)
+            except Exception as e:
+                logger.error(f"读取波形文件失败 {path}: {e}")
+                failed.append({"file": path, "error": str(e)})
+                continue
+            
+            spans = channel_spans(st)
+            if not batch.can_add(st, spans):
+                run_batch(batch)
+                batch = PickBatch()
+            batch.add(path, st, spans)
+        if len(batch):
+            run_batch(batch)
+        
+        # 写出汇总拾取表
+        rows.sort(key=lambda r: (r["file"], r["time"]))
+        if output_file is None:
+            with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as f:
+                output_file = f.name
+        write_pick_table(rows, output_file)
+        
+        processed = len(files) - len([f for f in failed if f["file"] in files])
+        files_with_picks = len({r["file"] for r in rows})
+        picks_by_station = {
+            trace_id: {"P": sum(1 for r in station_rows if r["phase"] == "P"),
+                       "S": sum(1 for r in station_rows if r["phase"] == "S")}
+            for trace_id, station_rows in group_by_trace_id(rows).items()
+        }
+        result = {
+            "status": "success",
+            "model": model_name,
+            "precision": validate_precision(precision),
+            "backend": validate_backend(backend),
+            "files_count": len(files),
+            "processed_files": processed,
+            "failed_files": failed,
+            "batches": batches,
+            "picks_count": len(rows),
+            "p_picks_count": sum(1 for r in rows if r["phase"] == "P"),
+            "s_picks_count": sum(1 for r in rows if r["phase"] == "S"),
+            "detections_count": detections_count,
+            "files_with_picks": files_with_picks,
+            "stations_count": len(stations),
+            "picks_by_station": picks_by_station,
+            "pick_table": output_file,
+            "catalog_run_id": catalog_run_id,
+            "preprocessing": pipeline.to_spec() if pipeline else None,
+            "message": f"使用{model_name}完成 {processed} 个文件、{len(stations)} 个台站的批量拾取（{batches} 次推理），"
+                       f"共 {len(rows)} 个震相，拾取表: {output_file}"
+        }
+        
+        if plot and rows:
+            file_index = {path: i for i, path in enumerate(files)}
+            fig, ax = plt.subplots(figsize=(12, max(3, 0.25 * len(files))))
+            for phase, color in (("P", "red"), ("S", "green")):
+                phase_rows = [r for r in rows if r["phase"] == phase and r["file"] in file_index]
+                ax.scatter([UTCDateTime(r["time"]).datetime for r in phase_rows],
+                           [file_index[r["file"]] for r in phase_rows],
+                           c=color, s=12, label=f"{phase} picks")
+            ax.set_yticks(range(len(files)))
+            ax.set_yticklabels([os.path.basename(p) for p in files], fontsize=6)
+            ax.set_title(f"{model_name} batch picks")
+            ax.legend(loc='upper right')
+            plt.tight_layout()
+            result.update(figure_renderer.save(fig, full_resolution))
+        
+        return result
+    except Exception as e:
+        logger.error(f"批量震相拾取失败: {str(e)}")
+        import traceback
+        logger.error(traceback.format_exc())
+        return {"status": "error", "message": f"批量震相拾取失败: {str(e)}"}
+    finally:
+        model_manager.release(model_name.lower(), precision, backend)
+
+def detect_phases_continuous(
+    waveform_file: str,
+    model_name: str = "PhaseNet",
+    p_threshold: float = 0.5,
+    s_threshold: float = 0.5,
+    detection_threshold: float = 0.3,
+    chunk_seconds: float = DEFAULT_CHUNK_SECONDS,
+    preprocessing: Optional[List[Dict[str, Any]]] = None,
+    output_file: Optional[str] = None,
+    batch_size: int = 256,
+    precision: str = "fp32",
+    backend: str = "torch",
+    pretrigger: Union[bool, Dict[str, Any]] = False
+) -> Dict[str, Any]:
+    """对长时间连续波形分块进行震相拾取，拾取结果逐块写入拾取表(CSV)
+    
+    文件按时间分块读取，相邻分块重叠一个模型窗口长度，只保留峰值落在
+    分块核心区间的拾取；概率曲线处理完即释放。MiniSEED 按时间窗读取，内存占用与记录
+    长度无关；其他格式整体读入一次后切片，波形本身常驻内存。
+    
+    Args:
+        waveform_file: 连续波形文件路径
+        model_name: 模型名称
+        p_threshold: P波概率阈值
+        s_threshold: S波概率阈值
+        detection_threshold: 事件检测阈值
+        chunk_seconds: 每个分块的时长(秒)
+        preprocessing: 可选的预处理步骤列表，对每个分块执行
+        output_file: 拾取表输出路径，默认写入临时文件
+        batch_size: 模型推理的窗口批大小
+        precision: 推理精度 fp32、bf16 或 int8
+        backend: 推理后端 torch 或 onnx
+        pretrigger: 是否先做 STA/LTA 预触发，只把触发段送入模型；可传参数字典(sta, lta, on, off, pad)
+        
+    Returns:
+        包含拾取表路径和统计信息的字典
+    """
+    params = {"waveform_file": waveform_file}
+    missing = check_required_params(params, ["waveform_file"])
+    if missing:
+        return {
+            "clarification_needed": True,
+            "missing_params": missing,
+            "output": f"缺少参数：{', '.join(missing)}，请补充。"
+        }
+    
+    try:
+        pipeline = PreprocessingPipeline.from_spec(preprocessing)
+        if chunk_seconds <= 0:
+            raise ValueError("chunk_seconds 必须大于0")
+        trigger_config = pretrigger_config(pretrigger)
+        model = model_manager.acquire(model_name.lower(), precision, backend)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    
+    logger.info(f"使用{model_name}分块拾取连续波形: {waveform_file}, 分块 {chunk_seconds}s")
+    
+    try:
+        if output_file is None:
+            with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as f:
+                output_file = f.name
+        
+        thresholds = {"P": p_threshold, "S": s_threshold}
+        margin = model_margin(model)
+        chunks = 0
+        phase_counts = {"P": 0, "S": 0}
+        detections_count = 0
+        max_probabilities = {}
+        first_picks = []
+        trigger_reports = []
+        catalog_run_id = pick_catalog.start_run("DetectPhasesContinuous", model_name, validate_precision(precision),
+                                                validate_backend(backend), waveform_file)
+        
+        with PickTableWriter(output_file) as writer:
+            for core_start, core_end, is_last, st in iter_chunks(waveform_file, chunk_seconds, margin):
+                if pipeline is not None:
+                    st = pipeline.run(st)
+                st = normalize_stream(st)
+                if trigger_config is not None:
+                    st, report = apply_pretrigger(st, trigger_config, margin)
+                    trigger_reports.append(report)
+                chunks += 1
+                if not len(st):
+                    continue
+                annotations = model.annotate(st, batch_size=batch_size)
+                
+                # 只保留峰值落在核心区间的拾取，避免重叠区重复
+                picks = [p for p in extract_picks(annotations, thresholds)
+                         if in_core(p["time"], core_start, core_end, is_last)]
+                for pick in picks:
+                    pick["file"] = waveform_file
+                    phase_counts[pick["phase"]] += 1
+                writer.write(picks)
+                pick_catalog.add_picks(catalog_run_id, picks, model_name)
+                if len(first_picks) < 20:
+                    first_picks.extend(picks[:20 - len(first_picks)])
+                
+                detections_count += sum(
+                    1 for d in extract_detections(annotations, detection_threshold)
+                    if in_core(d["start_time"], core_start, core_end, is_last)
+                )
+                for trace in annotations:
+                    label = annotation_label(trace)
+                    if trace.stats.npts:
+                        max_probabilities[label] = max(max_probabilities.get(label, 0.0), float(trace.data.max()))
+                logger.info(f"分块 {chunks} ({core_start} - {core_end}) 完成，拾取 {len(picks)} 个震相")
+        
+        return {
+            "status": "success",
+            "model": model_name,
+            "precision": validate_precision(precision),
+            "backend": validate_backend(backend),
+            "waveform_file": waveform_file,
+            "chunks": chunks,
+            "chunk_seconds": chunk_seconds,
+            "overlap_seconds": margin,
+            "picks_count": writer.rows_written,
+            "p_picks_count": phase_counts["P"],
+            "s_picks_count": phase_counts["S"],
+            "detections_count": detections_count,
+            "max_probabilities": max_probabilities,
+            "first_picks": first_picks,
+            "pretrigger": merge_reports(trigger_reports),
+            "pick_table": output_file,
+            "catalog_run_id": catalog_run_id,
+            "preprocessing": pipeline.to_spec() if pipeline else None,
+            "message": f"使用{model_name}完成 {chunks} 个分块的连续拾取，共 {writer.rows_written} 个震相，拾取表: {output_file}"
+        }
+    except Exception as e:
+        logger.error(f"连续波形震相拾取失败: {str(e)}")
+        import traceback
+        logger.error(traceback.format_exc())
+        return {"status": "error", "message": f"连续波形震相拾取失败: {str(e)}"}
+    finally:
+        model_manager.release(model_name.lower(), precision, backend)
+
+def compare_precisions(
+    waveform_file: str,
+    model_name: str = "PhaseNet",
+    precisions: Optional[List[str]] = None,
+    p_threshold: float = 0.5,
+    s_threshold: float = 0.5,
+    preprocessing: Optional[List[Dict[str, Any]]] = None,
+    repeats: int = 3,
+    tolerance: float = 0.1
+) -> Dict[str, Any]:
+    """比较同一模型不同推理精度(fp32/bf16/int8)及 ONNX 后端的速度与精度
+    
+    每种变体在同一波形上运行 annotate repeats 次，取最短用时作为延迟；
+    以 fp32 结果为参考，统计概率曲线误差和拾取一致性(到时误差不超过 tolerance 秒视为匹配)。
+    
+    Args:
+        waveform_file: 波形文件路径
+        model_name: 模型名称
+        precisions: 要比较的推理变体列表(fp32, bf16, int8, onnx)，默认全部精度；
+            当前环境不支持的变体会标记为 unsupported
+        p_threshold: P波概率阈值
+        s_threshold: S波概率阈值
+        preprocessing: 可选的预处理步骤列表
+        repeats: 每种精度的计时次数
+        tolerance: 拾取匹配的到时容差(秒)
+        
+    Returns:
+        各精度的延迟、吞吐量、加速比与精度指标
+    """
+    params = {"waveform_file": waveform_file}
+    missing = check_required_params(params, ["waveform_file"])
+    if missing:
+        return {
+            "clarification_needed": True,
+            "missing_params": missing,
+            "output": f"缺少参数：{', '.join(missing)}，请补充。"
+        }
+    
+    try:
+        precisions = [p.lower() if p and p.lower() == "onnx" else validate_precision(p)
+                      for p in (precisions or PRECISIONS)]
+        # fp32 为参考，始终最先运行
+        precisions = ["fp32"] + [p for p in dict.fromkeys(precisions) if p != "fp32"]
+        pipeline = PreprocessingPipeline.from_spec(preprocessing)
+        if repeats < 1:
+            raise ValueError("repeats 必须大于0")
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    
+    try:
+        st = read(waveform_file)
+        if pipeline is not None:
+            st = pipeline.run_cached(st)
+        st = normalize_stream(st)
+        samples = sum(tr.stats.npts for tr in st)
+        thresholds = {"P": p_threshold, "S": s_threshold}
+        
+        results = {}
+        reference = None
+        for precision in precisions:
+            backend = "onnx" if precision == "onnx" else "torch"
+            supported = onnx_available() if backend == "onnx" else precision_supported(precision)
+            if not supported:
+                results[precision] = {"status": "unsupported"}
+                continue
+            try:
+                timings = []
+                with model_manager.lease(model_name.lower(), "fp32" if backend == "onnx" else precision,
+                                         backend) as model:
+                    for _ in range(repeats):
+                        start = time.perf_counter()
+                        annotations = model.annotate(st)
+                        timings.append(time.perf_counter() - start)
+            except Exception as e:
+                logger.error(f"{model_name} {precision} 推理失败: {e}")
+                results[precision] = {"status": "failed", "error": str(e)}
+                continue
+            
+            picks = extract_picks(annotations, thresholds)
+            latency = min(timings)
+            entry = {
+                "status": "success",
+                "latency_seconds": round(latency, 4),
+                "mean_seconds": round(float(np.mean(timings)), 4),
+                "samples_per_second": round(samples / latency, 1) if latency > 0 else None,
+                "memory_mb": round(model_footprint(model) / 1024 / 1024, 1),
+                "picks_count": len(picks),
+            }
+            if precision == "fp32":
+                reference = {"annotations": annotations, "picks": picks, "latency": latency}
+            elif reference is not None:
+                entry["speedup"] = round(reference["latency"] / latency, 2) if latency > 0 else None
+                entry["probability_error"] = probability_differences(reference["annotations"], annotations)
+                entry["pick_agreement"] = pick_agreement(reference["picks"], picks, tolerance)
+            results[precision] = entry
+        
+        if reference is None:
+            return {"status": "error", "message": f"{model_name} fp32 参考推理失败: {results.get('fp32')}"}
+        
+        summary = ", ".join(
+            f"{p}: {r['latency_seconds']}s" + (f" (x{r['speedup']}, 拾取召回 {r['pick_agreement']['recall']})"
+                                               if "speedup" in r else "")
+            for p, r in results.items() if r.get("status") == "success"
+        )
+        return {
+            "status": "success",
+            "model": model_name,
+            "waveform_file": waveform_file,
+            "samples": samples,
+            "repeats": repeats,
+            "results": results,
+            "preprocessing": pipeline.to_spec() if pipeline else None,
+            "message": f"{model_name} 推理精度对比完成: {summary}"
+        }
+    except Exception as e:
+        logger.error(f"推理精度对比失败: {str(e)}")
+        import traceback
+        logger.error(traceback.format_exc())
+        return {"status": "error", "message": f"推理精度对比失败: {str(e)}"}
+
+
+def associate_phases(
+    pick_tables: Union[str, List[str]],
+    inventory: str,
+    vp: float = DEFAULT_VP,
+    vs: float = DEFAULT_VS,
+    grid_spacing_km: float = 5.0,
+    depths_km: Optional[List[float]] = None,
+    tolerance: float = 1.0,
+    min_picks: int = 4,
+    min_stations: int = 3,
+    output_file: Optional[str] = None
+) -> Dict[str, Any]:
+    """把多个台站的拾取表关联为地震事件
+    
+    读取 DetectPhasesBatch / DetectPhasesContinuous 输出的拾取表，结合台站清单中的坐标，
+    在均匀速度模型的走时表网格上搜索同一发震时刻和位置能解释的拾取组合。
+    
+    Args:
+        pick_tables: 拾取表(CSV)路径列表、逗号分隔的路径或通配符模式
+        inventory: 台站清单文件路径(StationXML等)，用于获取台站坐标
+        vp: P波速度(km/s)
+        vs: S波速度(km/s)
+        grid_spacing_km: 搜索网格水平间距(km)，台站范围较大时自动放大
+        depths_km: 搜索深度列表(km)
+        tolerance: 走时残差容差(秒)
+        min_picks: 一个事件至少包含的拾取数
+        min_stations: 一个事件至少包含的台站数
+        output_file: 事件表(CSV)输出路径，默认写入临时文件；拾取归属表写入同目录的 *_picks.csv
+        
+    Returns:
+        包含事件表路径、事件摘要和统计信息的字典
+    """
+    params = {"pick_tables": pick_tables, "inventory": inventory}
+    missing = check_required_params(params, ["pick_tables", "inventory"])
+    if missing:
+        return {
+            "clarification_needed": True,
+            "missing_params": missing,
+            "output": f"缺少参数：{', '.join(missing)}，请补充。"
+        }
+    
+    files, unmatched = resolve_waveform_files(pick_tables)
+    if not files:
+        return {"status": "error", "message": f"没有找到拾取表: {pick_tables}"}
+    
+    try:
+        picks = read_pick_tables(files)
+        coords = station_coordinates(response_remover.load_inventory(inventory))
+        start = time.perf_counter()
+        events, stats = associate_picks(picks, coords, vp=vp, vs=vs, grid_spacing_km=grid_spacing_km,
+                                        depths_km=depths_km, tolerance=tolerance, min_picks=min_picks,
+                                        min_stations=min_stations)
+        elapsed = time.perf_counter() - start
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    except Exception as e:
+        logger.error(f"震相关联失败: {str(e)}")
+        import traceback
+        logger.error(traceback.format_exc())
+        return {"status": "error", "message": f"震相关联失败: {str(e)}"}
+    
+    if output_file is None:
+        with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as f:
+            output_file = f.name
+    picks_file = os.path.splitext(output_file)[0] + "_picks.csv"
+    write_event_tables(events, output_file, picks_file)
+    
+    return {
+        "status": "success",
+        "pick_tables": files,
+        "missing_tables": unmatched,
+        "events_count": len(events),
+        "events": [{k: v for k, v in e.items() if k != "picks"} for e in events[:20]],
+        "statistics": stats,
+        "elapsed_seconds": round(elapsed, 3),
+        "event_table": output_file,
+        "event_picks_table": picks_file,
+        "message": f"从 {stats['input_picks']} 个拾取中关联出 {len(events)} 个事件"
+                   f"（{stats.get('associated_picks', 0)} 个拾取已归属），事件表: {output_file}"
+    }
+
+def query_picks(
+    station: Optional[str] = None,
+    phase: Optional[str] = None,
+    start_time: Optional[str] = None,
+    end_time: Optional[str] = None,
+    min_probability: Optional[float] = None,
+    model_name: Optional[str] = None,
+    precision: Optional[str] = None,
+    backend: Optional[str] = None,
+    limit: int = 100,
+    output_file: Optional[str] = None
+) -> Dict[str, Any]:
+    """查询拾取目录中历次检测保存的拾取，不读取波形、不运行模型
+    
+    DetectAndPlotPhases、DetectPhasesBatch、DetectPhasesContinuous 的拾取都会写入拾取目录
+    (SQLite)，可按台站、震相、时间范围、概率、模型、推理精度和后端筛选。同一模型不同精度或
+    后端的拾取分别保存。
+    
+    Args:
+        station: 台站，如 "IU.ANMO"、"IU.ANMO.00" 或 "ANMO"
+        phase: 震相 P 或 S
+        start_time: 起始时间(ISO格式)
+        end_time: 结束时间(ISO格式)
+        min_probability: 最小拾取概率
+        model_name: 拾取所用模型
+        precision: 拾取所用推理精度（fp32、bf16、int8），不指定时不限
+        backend: 拾取所用推理后端（torch、onnx），不指定时不限
+        limit: 返回的拾取条数上限，统计信息覆盖全部匹配的拾取
+        output_file: 把全部匹配的拾取导出为 CSV 拾取表（可用于 AssociatePhases）
+        
+    Returns:
+        包含匹配总数、各台站统计和拾取列表的字典
+    """
+    filters = {"station": station, "phase": phase, "start_time": start_time, "end_time": end_time,
+               "min_probability": min_probability, "model": model_name}
+    try:
+        if phase and phase.upper() not in ("P", "S"):
+            raise ValueError(f"不支持的震相: {phase}, 可用震相: P, S")
+        filters["precision"] = validate_precision(precision) if precision else None
+        filters["backend"] = validate_backend(backend) if backend else None
+        summary = pick_catalog.summary(**filters)
+        picks = pick_catalog.query(limit=limit, **filters)
+        exported = pick_catalog.export(output_file, **filters) if output_file else None
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    except Exception as e:
+        logger.error(f"查询拾取目录失败: {str(e)}")
+        return {"status": "error", "message": f"查询拾取目录失败: {str(e)}"}
+    
+    message = f"拾取目录中共有 {summary['total']} 个匹配的拾取"
+    if summary["total"]:
+        message += f"（{summary['first_time']} 至 {summary['last_time']}，{len(summary['by_station'])} 个台站）"
+    if exported is not None:
+        message += f"，已导出拾取表: {output_file}"
+    return {
+        "status": "success",
+        "catalog": pick_catalog.path,
+        "filters": {k: v for k, v in filters.items() if v is not None},
+        "picks_count": summary["total"],
+        "first_time": summary["first_time"],
+        "last_time": summary["last_time"],
+        "picks_by_station": summary["by_station"],
+        "picks": picks,
+        "truncated": summary["total"] > len(picks),
+        "pick_table": output_file if exported is not None else None,
+        "message": message
+    }
+
+def detect_by_template_matching(
+    waveform_file: str,
+    template_picks: Optional[Union[str, List[str]]] = None,
+    template_waveforms: Optional[Union[str, List[str]]] = None,
+    template_bank: Optional[str] = None,
+    freqmin: float = DEFAULT_FREQMIN,
+    freqmax: float = DEFAULT_FREQMAX,
+    pre_pick: float = DEFAULT_PRE_PICK,
+    template_length: float = DEFAULT_TEMPLATE_LENGTH,
+    threshold: float = DEFAULT_MAD_THRESHOLD,
+    min_channels: int = 1,
+    chunk_seconds: float = DEFAULT_CHUNK_SECONDS,
+    output_file: Optional[str] = None
+) -> Dict[str, Any]:
+    """模板匹配（匹配滤波）检测：用已知事件的波形在连续数据中搜索相似事件
+    
+    模板从拾取表和对应的模板波形中截取（AssociatePhases 的拾取归属表按事件组成多台站模板），
+    或直接加载以前保存的模板库。连续数据分块读取，与全部模板做基于 FFT 的归一化互相关，
+    各通道结果按时移叠加后超过 threshold 倍 MAD 即为一次检测，同一模板一个模板长度内只保留最高的一次。
+    
+    Args:
+        waveform_file: 连续波形文件路径
+        template_picks: 模板拾取表(CSV)路径列表或通配符模式
+        template_waveforms: 包含模板事件的波形文件路径列表或通配符模式
+        template_bank: 模板库文件(NPZ)；文件存在时直接加载，否则新建的模板库保存到该路径
+        freqmin: 带通滤波下限(Hz)
+        freqmax: 带通滤波上限(Hz)
+        pre_pick: 模板起点相对拾取的提前量(秒)
+        template_length: 模板长度(秒)
+        threshold: 检测阈值（网络平均互相关的 MAD 倍数）
+        min_channels: 参与检测的模板至少需要的通道数
+        chunk_seconds: 连续数据分块时长(秒)
+        output_file: 检测表(CSV)输出路径，默认写入临时文件
+        
+    Returns:
+        包含检测表路径、检测摘要和统计信息的字典
+    """
+    params = {"waveform_file": waveform_file, "template_picks": template_picks,
+              "template_waveforms": template_waveforms}
+    bank_exists = bool(template_bank) and os.path.exists(template_bank)
+    required = ["waveform_file"]
+    if not bank_exists:
+        required += ["template_picks", "template_waveforms"]
+    missing = check_required_params(params, required)
+    if missing:
+        return {
+            "clarification_needed": True,
+            "missing_params": missing,
+            "output": f"缺少参数：{', '.join(missing)}，请补充。"
+        }
+    if not os.path.exists(waveform_file):
+        return {"status": "error", "message": f"波形文件不存在: {waveform_file}"}
+    
+    try:
+        start = time.perf_counter()
+        sampling_rate = read(waveform_file, headonly=True)[0].stats.sampling_rate
+        if bank_exists:
+            bank = TemplateBank.load(template_bank)
+            if bank.sampling_rate != sampling_rate:
+                raise ValueError(f"模板库采样率 {bank.sampling_rate}Hz 与连续数据 {sampling_rate}Hz 不一致")
+        else:
+            pick_files, _ = resolve_waveform_files(template_picks)
+            waveform_files, _ = resolve_waveform_files(template_waveforms)
+            if not pick_files or not waveform_files:
+                raise ValueError(f"没有找到模板拾取表或模板波形: {template_picks}, {template_waveforms}")
+            template_st = Stream()
+            for path in waveform_files:
+                template_st += read(path)
+            template_preprocess(template_st, freqmin, freqmax, sampling_rate)
+            bank = build_templates(read_pick_tables(pick_files), template_st, pre_pick, template_length,
+                                   (freqmin, freqmax))
+            del template_st
+        freqmin, freqmax = bank.bandpass or (freqmin, freqmax)
+        
+        if output_file is None:
+            with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as f:
+                output_file = f.name
+        if not bank_exists:
+            template_bank = template_bank or os.path.splitext(output_file)[0] + "_templates.npz"
+            if not template_bank.endswith(".npz"):
+                template_bank += ".npz"
+            bank.save(template_bank)
+        
+        # 分块两侧补充模板覆盖时长，另加滤波边缘效应的余量
+        margin = bank.duration + 10.0 / freqmin
+        detections = []
+        chunks = 0
+        for core_start, core_end, is_last, st in iter_chunks(waveform_file, chunk_seconds, margin):
+            template_preprocess(st, freqmin, freqmax)
+            chunk_detections, _ = match_templates(bank, st, threshold, min_channels)
+            detections.extend(d for d in chunk_detections if in_core(d["time"], core_start, core_end, is_last))
+            chunks += 1
+            logger.info(f"分块 {chunks} ({core_start} - {core_end}) 完成，检测到 {len(chunk_detections)} 次匹配")
+        # 跨分块边界的同一次匹配可能在相邻分块各留下一个峰值，按模板长度再去重一次
+        detections = decluster_detections(detections, bank.length / bank.sampling_rate)
+        write_match_table(detections, output_file)
+        elapsed = time.perf_counter() - start
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    except Exception as e:
+        logger.error(f"模板匹配检测失败: {str(e)}")
+        import traceback
+        logger.error(traceback.format_exc())
+        return {"status": "error", "message": f"模板匹配检测失败: {str(e)}"}
+    
+    by_template = {}
+    for d in detections:
+        by_template[d["template"]] = by_template.get(d["template"], 0) + 1
+    return {
+        "status": "success",
+        "waveform_file": waveform_file,
+        "templates_count": len(bank),
+        "template_channels": bank.entries,
+        "template_bank": template_bank,
+        "bandpass": [freqmin, freqmax],
+        "chunks": chunks,
+        "detections_count": len(detections),
+        "detections": detections[:20],
+        "detections_by_template": dict(sorted(by_template.items(), key=lambda kv: -kv[1])[:20]),
+        "elapsed_seconds": round(elapsed, 3),
+        "match_table": output_file,
+        "message": f"使用 {len(bank)} 个模板在 {chunks} 个分块中检测到 {len(detections)} 次匹配，检测表: {output_file}"
+    }
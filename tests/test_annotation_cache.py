@@ -0,0 +1,47 @@
+import numpy as np
+from obspy import Stream, Trace, UTCDateTime
+
+from phase_detection.annotation_cache import AnnotationCache, load_annotations, save_annotations
+
+
+def _annotations(value=0.5):
+    return Stream([Trace(data=np.full(100, value, dtype=np.float32),
+                         header={"network": "XX", "station": "ABC", "channel": "PhaseNet_P",
+                                 "sampling_rate": 100.0, "starttime": UTCDateTime(2024, 1, 1)})])
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    path = str(tmp_path / "a.npz")
+    save_annotations(_annotations(), path)
+    loaded = load_annotations(path)
+    assert loaded[0].stats.channel == "PhaseNet_P"
+    assert loaded[0].stats.starttime == UTCDateTime(2024, 1, 1)
+    np.testing.assert_array_equal(loaded[0].data, _annotations()[0].data)
+
+
+def test_memory_lru_and_disk_reuse(tmp_path):
+    cache = AnnotationCache(max_entries=1, cache_dir=str(tmp_path))
+    key_a = cache.make_key("hash-a", "PhaseNet", "stead:1")
+    key_b = cache.make_key("hash-b", "PhaseNet", "stead:1")
+    assert key_a != cache.make_key("hash-a", "PhaseNet", "stead:1", preprocessing="bandpass")
+    cache.put(key_a, _annotations(0.1))
+    cache.put(key_b, _annotations(0.2))
+    assert cache.get(key_b)[0].data[0] == np.float32(0.2)
+    # key_a 已被挤出内存，从磁盘读取
+    assert cache.get(key_a)[0].data[0] == np.float32(0.1)
+    assert cache.cache_stats()["memory_hits"] == 1 and cache.cache_stats()["disk_hits"] == 1
+
+    # 新实例（相当于进程重启）从磁盘复用
+    assert AnnotationCache(cache_dir=str(tmp_path)).get(key_b) is not None
+    assert cache.get(cache.make_key("missing", "PhaseNet", "stead:1")) is None
+
+
+def test_disk_budget(tmp_path):
+    cache = AnnotationCache(cache_dir=str(tmp_path))
+    cache.put(cache.make_key("hash-0", "PhaseNet", "stead:1"), _annotations())
+    size = next(tmp_path.glob("*.npz")).stat().st_size
+    # 预算只够两个条目，超出后删除最早写入的
+    cache.disk_budget = int(2.5 * size)
+    for i in range(1, 4):
+        cache.put(cache.make_key(f"hash-{i}", "PhaseNet", "stead:1"), _annotations())
+    assert len(list(tmp_path.glob("*.npz"))) == 2
@@ -0,0 +1,77 @@
+import time
+
+import numpy as np
+
+from phase_detection.association import associate_picks, DEFAULT_VP, DEFAULT_VS, KM_PER_DEGREE
+
+START = np.datetime64("2024-01-01T00:00:00", "us")
+
+
+def synthetic_picks(n_stations, n_events, noise=0.1, seed=0):
+    """1°x1° 区域内随机台站与事件的 P/S 拾取（均匀速度模型，带高斯噪声）
+
+    Returns:
+        (拾取列表, 台站坐标, 按时间排序的真实发震时刻(秒))
+    """
+    rng = np.random.default_rng(seed)
+    station_lat = 35 + rng.uniform(0, 1, n_stations)
+    station_lon = -117 + rng.uniform(0, 1, n_stations)
+    ids = [f"XX.S{i:03d}." for i in range(n_stations)]
+    coords = {key: (float(la), float(lo), 0.0) for key, la, lo in zip(ids, station_lat, station_lon)}
+
+    origins = rng.uniform(0, 86400, n_events)
+    lat = 35 + rng.uniform(0.1, 0.9, n_events)
+    lon = -117 + rng.uniform(0.1, 0.9, n_events)
+    depth = rng.uniform(0, 20, n_events)
+    dx = (station_lon[None, :] - lon[:, None]) * KM_PER_DEGREE * np.cos(np.radians(35.5))
+    dy = (station_lat[None, :] - lat[:, None]) * KM_PER_DEGREE
+    dist = np.sqrt(dx ** 2 + dy ** 2 + depth[:, None] ** 2)
+
+    picks = []
+    for phase, v in (("P", DEFAULT_VP), ("S", DEFAULT_VS)):
+        arrivals = origins[:, None] + dist / v + rng.normal(0, noise, dist.shape)
+        stamps = np.datetime_as_string(START + (arrivals * 1e6).astype("timedelta64[us]"))
+        for e in range(n_events):
+            picks.extend({"trace_id": key, "phase": phase, "time": str(t), "probability": "0.9"}
+                         for key, t in zip(ids, stamps[e]))
+    return picks, coords, np.sort(origins)
+
+
+def matched_events(events, origins, tolerance=2.0):
+    """与真实发震时刻相差不超过 tolerance 秒的事件数"""
+    if not events:
+        return 0
+    found = np.sort([np.datetime64(e["origin_time"].rstrip("Z"), "us") for e in events])
+    found = (found - START).astype(np.float64) / 1e6
+    pos = np.clip(np.searchsorted(found, origins), 1, len(found) - 1)
+    nearest = np.minimum(np.abs(found[pos - 1] - origins), np.abs(found[pos] - origins))
+    return int((nearest <= tolerance).sum())
+
+
+def test_recovers_synthetic_events():
+    picks, coords, origins = synthetic_picks(n_stations=12, n_events=40)
+    events, stats = associate_picks(picks, coords)
+    assert matched_events(events, origins) == len(origins)
+    assert len(events) <= len(origins) * 1.05
+    assert stats["stations"] == 12
+    for event in events:
+        assert event["stations_count"] >= 3
+        assert all(abs(p["residual"]) <= 1.0 for p in event["picks"])
+
+
+def test_empty_and_sparse_picks():
+    picks, coords, _ = synthetic_picks(n_stations=2, n_events=5)
+    events, _ = associate_picks(picks, coords)
+    assert events == []
+
+
+def test_day_of_picks_in_seconds():
+    """50 个台站、2000 个事件共 20 万拾取，应在数秒内关联完成"""
+    picks, coords, origins = synthetic_picks(n_stations=50, n_events=2000)
+    assert len(picks) == 200000
+    start = time.perf_counter()
+    events, _ = associate_picks(picks, coords)
+    elapsed = time.perf_counter() - start
+    assert matched_events(events, origins) >= 0.99 * len(origins)
+    assert len(events) <= len(origins) * 1.05
+    assert elapsed < 30, f"关联 20 万拾取耗时 {elapsed:.1f}s"
@@ -0,0 +1,38 @@
+import numpy as np
+from obspy import Stream, Trace
+
+from common.filters import FilterEngine, normalize_filter
+
+
+def _stream(n_traces=3, npts=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    return Stream([Trace(data=rng.normal(size=npts), header={"station": f"S{i}", "sampling_rate": 100.0})
+                   for i in range(n_traces)])
+
+
+def test_normalize_filter():
+    assert normalize_filter("bandpass", 1, 5) == ("bandpass", (1.0, 5.0))
+    assert normalize_filter("bandpass", 0, 5) is None
+    assert normalize_filter("lowpass", freqmax=5) == ("lowpass", (5.0,))
+    assert normalize_filter("none", 1, 5) is None
+
+
+def test_batched_filter_matches_obspy():
+    engine = FilterEngine()
+    st = _stream()
+    expected = st.copy().filter("bandpass", freqmin=1.0, freqmax=10.0, corners=4, zerophase=True)
+    engine.apply(st, "bandpass", (1.0, 10.0))
+    for tr, ref in zip(st, expected):
+        np.testing.assert_allclose(tr.data, ref.data, atol=1e-10)
+    assert engine.stats["design_misses"] == 1
+
+
+def test_design_and_product_cache():
+    engine = FilterEngine(max_products=1)
+    engine.design("lowpass", (5.0,), 100.0)
+    engine.design("lowpass", (5.0,), 100.0)
+    assert engine.stats["design_hits"] == 1
+    engine.put_product("a", ("lowpass", (5.0,)), "first")
+    engine.put_product("b", ("lowpass", (5.0,)), "second")
+    assert engine.get_product("a", ("lowpass", (5.0,))) is None
+    assert engine.get_product("b", ("lowpass", (5.0,))) == "second"
@@ -0,0 +1,110 @@
+import csv
+import sqlite3
+
+from phase_detection.pick_catalog import PickCatalog
+
+
+def _picks(probability=0.8):
+    return [
+        {"trace_id": "IU.ANMO.00", "phase": "P", "time": "2024-01-01T00:00:10.000000",
+         "probability": probability, "start_time": "2024-01-01T00:00:09.900000",
+         "end_time": "2024-01-01T00:00:10.100000"},
+        {"trace_id": "IU.ANMO.00", "phase": "S", "time": "2024-01-01T00:00:15.500000", "probability": 0.6},
+        {"trace_id": "IU.COLA.", "phase": "P", "time": "2024-01-01T00:01:00.000000", "probability": 0.9},
+    ]
+
+
+def test_rerun_replaces_picks(tmp_path):
+    catalog = PickCatalog(str(tmp_path / "picks.sqlite"))
+    catalog.record("DetectPhases", _picks(0.8), "PhaseNet")
+    run_id = catalog.record("DetectPhases", _picks(0.95), "phasenet")
+    picks = catalog.query()
+    assert len(picks) == 3
+    first = picks[0]
+    assert first["probability"] == 0.95 and first["run_id"] == run_id
+    assert first["time"] == "2024-01-01T00:00:10.000000"
+    assert first["start_time"] == "2024-01-01T00:00:09.900000"
+    assert picks[1]["start_time"] is None
+
+    # 不同模型的拾取分别保存
+    catalog.record("DetectPhases", _picks(), "EQTransformer")
+    assert len(catalog.query()) == 6
+
+
+def test_query_filters_and_summary(tmp_path):
+    catalog = PickCatalog(str(tmp_path / "picks.sqlite"))
+    catalog.record("DetectPhases", _picks(), "PhaseNet", source="day.mseed")
+
+    assert [p["phase"] for p in catalog.query(station="IU.ANMO")] == ["P", "S"]
+    assert len(catalog.query(station="ANMO", phase="s")) == 1
+    assert len(catalog.query(station="IU.COLA.")) == 1
+    assert len(catalog.query(min_probability=0.7)) == 2
+    assert len(catalog.query(start_time="2024-01-01T00:00:12", end_time="2024-01-01T00:00:30")) == 1
+    assert len(catalog.query(limit=1)) == 1
+    assert catalog.query(model="phasenet")[0]["file"] == "day.mseed"
+
+    summary = catalog.summary()
+    assert summary["total"] == 3
+    assert summary["first_time"] == "2024-01-01T00:00:10.000000"
+    assert summary["by_station"]["IU.ANMO.00"] == {"P": 1, "S": 1}
+
+
+def test_export_writes_pick_table(tmp_path):
+    catalog = PickCatalog(str(tmp_path / "picks.sqlite"))
+    catalog.record("DetectPhases", _picks(), "PhaseNet")
+    path = tmp_path / "picks.csv"
+    assert catalog.export(str(path), phase="P") == 2
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [r["trace_id"] for r in rows] == ["IU.ANMO.00", "IU.COLA."]
+
+
+def test_precision_and_backend_variants_kept_apart(tmp_path):
+    catalog = PickCatalog(str(tmp_path / "picks.sqlite"))
+    catalog.record("DetectPhases", _picks(0.8), "PhaseNet", precision="fp32", backend="torch")
+    catalog.record("DetectPhases", _picks(0.7), "PhaseNet", precision="int8", backend="torch")
+    catalog.record("DetectPhases", _picks(0.75), "PhaseNet", precision="fp32", backend="onnx")
+    assert len(catalog.query()) == 9
+    fp32 = catalog.query(precision="fp32", backend="torch")
+    assert [p["probability"] for p in fp32][:1] == [0.8]
+    assert catalog.query(precision="int8")[0]["probability"] == 0.7
+    # 同一变体重新拾取时覆盖
+    catalog.record("DetectPhases", _picks(0.9), "PhaseNet", precision="int8", backend="torch")
+    assert len(catalog.query()) == 9
+    assert catalog.query(precision="int8")[0]["probability"] == 0.9
+
+
+def test_migrates_legacy_catalog(tmp_path):
+    path = str(tmp_path / "picks.sqlite")
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.execute("INSERT INTO runs (id, created_at, tool, model, precision, backend) "
+                 "VALUES (1, 0, 'DetectPhases', 'PhaseNet', 'int8', 'torch')")
+    conn.execute("INSERT INTO picks (run_id, network, station, location, phase, time, model) "
+                 "VALUES (1, 'IU', 'ANMO', '00', 'P', 1704067210.0, 'PhaseNet')")
+    conn.commit()
+    conn.close()
+
+    catalog = PickCatalog(path)
+    picks = catalog.query()
+    assert len(picks) == 1 and picks[0]["precision"] == "int8" and picks[0]["backend"] == "torch"
+    catalog.record("DetectPhases", _picks(), "PhaseNet", precision="fp32", backend="torch")
+    assert len(catalog.query(station="IU.ANMO.00", phase="P")) == 2
+    assert len(catalog.query(station="IU.ANMO", precision="fp32")) == 2
+
+
+LEGACY_SCHEMA = """
+CREATE TABLE runs (
+    id INTEGER PRIMARY KEY, created_at REAL NOT NULL, tool TEXT NOT NULL, model TEXT, precision TEXT,
+    backend TEXT, source TEXT, picks_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE picks (
+    id INTEGER PRIMARY KEY, run_id INTEGER NOT NULL REFERENCES runs(id), network TEXT NOT NULL,
+    station TEXT NOT NULL, location TEXT NOT NULL, phase TEXT NOT NULL, time REAL NOT NULL, probability REAL,
+    start_time REAL, end_time REAL, model TEXT NOT NULL COLLATE NOCASE, source_file TEXT,
+    UNIQUE (network, station, location, phase, time, model)
+);
+CREATE INDEX idx_picks_station ON picks (station, network, phase, time);
+CREATE INDEX idx_picks_time ON picks (time);
+CREATE INDEX idx_picks_probability ON picks (probability);
+"""
@@ -0,0 +1,48 @@
+import numpy as np
+from obspy import Stream, Trace, UTCDateTime
+
+from phase_detection.picking import pick_table, select_label, threshold_runs
+
+
+def test_threshold_runs_empty_and_below():
+    for data in (np.array([]), np.zeros(10)):
+        starts, ends, peaks = threshold_runs(data, 0.5)
+        assert len(starts) == len(ends) == len(peaks) == 0
+
+
+def test_threshold_runs_edges():
+    data = np.array([0.9, 0.8, 0.1, 0.6, 0.1, 0.7, 0.9])
+    starts, ends, peaks = threshold_runs(data, 0.5)
+    assert starts.tolist() == [0, 3, 5]
+    assert ends.tolist() == [1, 3, 6]
+    assert peaks.tolist() == [0, 3, 6]
+
+
+def test_threshold_runs_all_above_and_ties():
+    data = np.array([0.6, 0.9, 0.9, 0.7])
+    starts, ends, peaks = threshold_runs(data, 0.5)
+    assert starts.tolist() == [0] and ends.tolist() == [3]
+    # 相同峰值取最早的样本
+    assert peaks.tolist() == [1]
+
+
+def test_threshold_is_strict():
+    starts, _, _ = threshold_runs(np.array([0.5, 0.5]), 0.5)
+    assert len(starts) == 0
+
+
+def _annotation(label, data):
+    return Trace(data=np.asarray(data, dtype=np.float32),
+                 header={"network": "XX", "station": "ABC", "channel": f"PhaseNet_{label}",
+                         "sampling_rate": 10.0, "starttime": UTCDateTime(2024, 1, 1)})
+
+
+def test_pick_table_and_select_label():
+    annotations = Stream([_annotation("P", [0, 0.8, 0.2, 0, 0]), _annotation("S", [0, 0, 0, 0.9, 0]),
+                          _annotation("N", [1, 1, 1, 1, 1]), _annotation("Detection", [0, 1, 1, 1, 0])])
+    table = pick_table(annotations, {"P": 0.5, "S": 0.5})
+    assert table["phase"].tolist() == ["P", "S"]
+    assert str(table["time"][0]) == "2024-01-01T00:00:00.100000000"
+    assert table["trace_id"][0] == "XX.ABC."
+    # "N" 只匹配噪声道，不会匹配 *_Detection
+    assert [tr.stats.channel for tr in select_label(annotations, "N")] == ["PhaseNet_N"]
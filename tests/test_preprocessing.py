@@ -0,0 +1,33 @@
+import numpy as np
+from obspy import Stream, Trace
+
+from common.preprocessing import PreprocessingPipeline, stream_nbytes
+
+
+def _stream(seed, npts=1000):
+    data = np.random.default_rng(seed).normal(size=npts)
+    return Stream([Trace(data=data, header={"station": f"S{seed}", "sampling_rate": 100.0})])
+
+
+def test_cache_hit_returns_processed_stream():
+    pipeline = PreprocessingPipeline([{"op": "detrend", "type": "demean"}])
+    first = pipeline.run_cached(_stream(0))
+    assert abs(first[0].data.mean()) < 1e-12
+    assert pipeline.run_cached(_stream(0)) is first
+
+
+def test_cache_respects_byte_budget(monkeypatch):
+    monkeypatch.setattr(PreprocessingPipeline, "_cache", type(PreprocessingPipeline._cache)())
+    monkeypatch.setattr(PreprocessingPipeline, "_cache_bytes", {})
+    nbytes = stream_nbytes(_stream(0))
+    monkeypatch.setattr(PreprocessingPipeline, "max_cache_bytes", int(2.5 * nbytes))
+    pipeline = PreprocessingPipeline([{"op": "taper", "max_percentage": 0.1}])
+    for seed in range(4):
+        pipeline.run_cached(_stream(seed), source_key=f"s{seed}")
+    assert pipeline.lookup("s0") is None and pipeline.lookup("s1") is None
+    assert pipeline.lookup("s3") is not None
+    assert PreprocessingPipeline.cache_stats()["entries"] == 2
+
+    # 单个超过预算的结果不缓存
+    pipeline.run_cached(_stream(9, npts=10000), source_key="large")
+    assert pipeline.lookup("large") is None
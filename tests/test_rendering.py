@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from common.rendering import FigureRenderer, minmax_indices
+
+
+def test_minmax_short_series_unchanged():
+    data = np.arange(10.0)
+    assert np.array_equal(minmax_indices(data, 100), np.arange(10))
+
+
+def test_minmax_keeps_peaks():
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=100003)
+    data[12345] = 50.0
+    data[99999] = -50.0
+    idx = minmax_indices(data, 1000)
+    assert len(idx) <= 1000 + 4
+    assert np.all(np.diff(idx) > 0)
+    assert idx[0] == 0 and idx[-1] == len(data) - 1
+    assert 12345 in idx and 99999 in idx
+    # 每一段的最小值和最大值都保留
+    assert data[idx].max() == data.max() and data[idx].min() == data.min()
+
+
+def test_minmax_keeps_peak_in_tail():
+    data = np.zeros(1001)
+    data[1000] = 1.0
+    data[999] = -1.0
+    idx = minmax_indices(data, 100)
+    assert 999 in idx and 1000 in idx
+
+
+def test_renderer_closes_pyplot_figure_and_renders_full(tmp_path):
+    renderer = FigureRenderer(max_entries=2)
+    fig, ax = plt.subplots()
+    ax.plot([0, 1], [0, 1])
+    result = renderer.save(fig, "background")
+    assert plt.get_fignums() == []
+    assert os.path.exists(result["plot_path"])
+    full = renderer.render_full(result["render_id"])
+    assert full["full_resolution_status"] == "ready"
+    assert os.path.exists(full["full_plot_path"])
+
+
+def test_renderer_evicts_least_recent_entries():
+    renderer = FigureRenderer(max_entries=2)
+    ids = []
+    for _ in range(3):
+        fig, ax = plt.subplots()
+        ax.plot([0, 1])
+        ids.append(renderer.save(fig)["render_id"])
+    assert renderer.status(ids[0]) == "unknown"
+    assert renderer.status(ids[1]) == "pending"
+    assert renderer.render_full(ids[0])["status"] == "error"
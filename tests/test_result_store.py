@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from obspy import Stream, Trace, UTCDateTime
+
+from phase_detection.result_store import DetectionResult, save_detection_result
+
+
+def _annotations(npts):
+    rng = np.random.default_rng(0)
+    data = rng.uniform(0, 0.2, npts).astype(np.float32)
+    data[npts // 3] = 0.97
+    header = {"network": "XX", "station": "ABC", "sampling_rate": 100.0, "starttime": UTCDateTime(2024, 1, 1)}
+    return Stream([Trace(data=data, header=dict(header, channel="PhaseNet_P")),
+                   Trace(data=data[::-1].copy(), header=dict(header, channel="PhaseNet_Detection"))])
+
+
+def test_roundtrip_with_metadata(tmp_path):
+    path = save_detection_result(_annotations(1000), str(tmp_path / "result"), picks=[{"phase": "P"}])
+    result = DetectionResult(path)
+    assert result.labels() == ["Detection", "P"]
+    assert result.get("picks") == [{"phase": "P"}]
+    assert result.arrays("P")[0].dtype == np.float16
+    assert result.max_probability("P") == pytest.approx(0.97, abs=1e-3)
+    assert result.max_probability("S") is None
+
+
+def test_decimated_curves_keep_peaks(tmp_path):
+    npts = 100000
+    path = save_detection_result(_annotations(npts), str(tmp_path / "result"), dtype="float32", max_points=1000)
+    curve = DetectionResult(path).curves("P")[0]
+    assert len(curve["values"]) <= 1004
+    peak = int(np.argmax(curve["values"]))
+    assert curve["values"][peak] == np.float32(0.97)
+    assert curve["times"][peak] == pytest.approx((npts // 3) / 100.0)
+
+
+def test_rejects_unknown_dtype(tmp_path):
+    with pytest.raises(ValueError):
+        save_detection_result(_annotations(10), str(tmp_path / "result"), dtype="int8")
+    with pytest.raises(FileNotFoundError):
+        DetectionResult(str(tmp_path / "missing"))
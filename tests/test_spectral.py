@@ -0,0 +1,40 @@
+import numpy as np
+from obspy import Stream, Trace
+
+from common.spectral import SpectralAnalyzer, band_mask, empty_band_message, to_db
+
+
+def _sine_stream(frequency=5.0, sampling_rate=100.0, seconds=120):
+    t = np.arange(int(seconds * sampling_rate)) / sampling_rate
+    return Stream([Trace(data=np.sin(2 * np.pi * frequency * t), header={"sampling_rate": sampling_rate})])
+
+
+def test_welch_peak_and_cache():
+    analyzer = SpectralAnalyzer()
+    st = _sine_stream()
+    result = analyzer.compute(st, "sine", "welch")
+    trace = result["traces"][0]
+    assert abs(trace["freqs"][np.argmax(trace["power"])] - 5.0) < 0.1
+    assert analyzer.compute(st, "sine", "welch") is result
+    assert analyzer.stats == {"hits": 1, "misses": 1}
+
+
+def test_spectrogram_shape():
+    result = SpectralAnalyzer().compute(_sine_stream(), "sine", "spectrogram", segment_length=2.0)
+    trace = result["traces"][0]
+    assert trace["power"].shape == (len(trace["freqs"]), len(trace["times"]))
+
+
+def test_band_mask_and_db():
+    freqs = np.arange(0, 50, 0.5)
+    mask = band_mask(freqs, 1.0, 10.0)
+    assert freqs[mask].min() == 1.0 and freqs[mask].max() == 10.0
+    assert band_mask(freqs).all()
+    assert np.isfinite(to_db(np.zeros(3))).all()
+
+
+def test_empty_band_is_reported():
+    freqs = np.arange(0, 50.5, 0.5)
+    assert not band_mask(freqs, 60.0, 70.0).any()
+    message = empty_band_message("XX.ABC..HHZ", freqs, 60.0, 70.0)
+    assert "60.0-70.0" in message and "0-50" in message
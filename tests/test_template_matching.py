@@ -0,0 +1,46 @@
+import numpy as np
+from obspy import Stream, Trace, UTCDateTime
+
+from phase_detection.template_matching import build_templates, match_templates, preprocess
+
+START = UTCDateTime(2024, 1, 1)
+SAMPLING_RATE = 50.0
+EVENT_TIMES = (100.0, 700.0, 1300.0, 1750.0)
+
+
+def synthetic_stream(seed=0):
+    """3 个通道的噪声记录，在 EVENT_TIMES 处叠加相同波形的事件"""
+    rng = np.random.default_rng(seed)
+    n = int(1800 * SAMPLING_RATE)
+    t = np.arange(int(3 * SAMPLING_RATE)) / SAMPLING_RATE
+    wavelet = np.sin(2 * np.pi * 5 * t) * np.exp(-t)
+    traces = []
+    for i, channel in enumerate(("HHZ", "HHN", "HHE")):
+        data = rng.normal(0, 0.2, n)
+        for event in EVENT_TIMES:
+            i0 = int((event + 0.2 * i) * SAMPLING_RATE)
+            data[i0:i0 + len(wavelet)] += wavelet
+        traces.append(Trace(data=data, header={"network": "XX", "station": "ABC", "channel": channel,
+                                               "sampling_rate": SAMPLING_RATE, "starttime": START}))
+    return preprocess(Stream(traces))
+
+
+def test_detects_repeating_events_for_any_memory_budget():
+    st = synthetic_stream()
+    picks = [{"trace_id": "XX.ABC.", "phase": "P", "time": (START + EVENT_TIMES[0]).isoformat()},
+             {"trace_id": "XX.ABC.", "phase": "S", "time": (START + EVENT_TIMES[0] + 0.2).isoformat()}]
+    picks = [dict(p, event_id="1") for p in picks]
+    bank = build_templates(picks, st, bandpass=(2.0, 8.0))
+
+    results = [match_templates(bank, st, memory_mb=memory_mb) for memory_mb in (1024, 1, 0.05)]
+    detections, stats = results[0]
+    assert len(detections) == len(EVENT_TIMES)
+    for d, t in zip(detections, EVENT_TIMES):
+        assert abs(UTCDateTime(d["time"]) - START - t) <= 1 / SAMPLING_RATE
+    assert detections[0]["cc"] > 0.99
+    # 结果与分段长度（内存预算）无关
+    assert results[-1][1]["segments"] > stats["segments"]
+    for other, _ in results[1:]:
+        assert [d["time"] for d in other] == [d["time"] for d in detections]
+        assert [d["mad"] for d in other] == [d["mad"] for d in detections]
+        np.testing.assert_allclose([d["cc"] for d in other], [d["cc"] for d in detections], atol=1e-3)